@@ -0,0 +1,93 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from .database import (
+    DB_HOST, DB_NAME, DB_USER, DB_PASS, DB_PORT, DB_POOL_MAX, DB_POOL_TIMEOUT, WORKER_CONNECTION_BUDGET,
+)
+
+# Pool assíncrono usado pelos handlers 'async def': as consultas não bloqueiam
+# o event loop do uvicorn. Os handlers síncronos continuam no pool psycopg2
+# (database.py), rodando no threadpool do FastAPI.
+# Por padrão, o que sobra do orçamento de conexões do worker depois do pool psycopg2
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", str(max(1, WORKER_CONNECTION_BUDGET - DB_POOL_MAX))))
+ASYNC_DB_POOL_MIN = min(int(os.getenv("ASYNC_DB_POOL_MIN", "2")), ASYNC_DB_POOL_MAX)
+
+async_pool = None
+_timeouts = 0
+
+
+async def init_async_pool():
+    """Cria o pool asyncpg (chamado no evento de startup)."""
+    global async_pool
+    if async_pool is not None:
+        return async_pool
+    try:
+        async_pool = await asyncpg.create_pool(
+            host=DB_HOST,
+            database=DB_NAME,
+            user=DB_USER,
+            password=DB_PASS,
+            port=int(DB_PORT),
+            min_size=ASYNC_DB_POOL_MIN,
+            max_size=ASYNC_DB_POOL_MAX,
+        )
+        print(f"Pool assíncrono criado (min={ASYNC_DB_POOL_MIN}, max={ASYNC_DB_POOL_MAX}).")
+        if DB_POOL_MAX + ASYNC_DB_POOL_MAX > WORKER_CONNECTION_BUDGET:
+            print(f"Aviso: DB_POOL_MAX + ASYNC_DB_POOL_MAX = {DB_POOL_MAX + ASYNC_DB_POOL_MAX} passa do "
+                  f"orçamento de {WORKER_CONNECTION_BUDGET} conexões por worker (DB_MAX_CONNECTIONS / WEB_CONCURRENCY).")
+    except (OSError, asyncpg.PostgresError) as e:
+        print(f"Erro ao criar o pool assíncrono: {e}")
+        async_pool = None
+    return async_pool
+
+
+async def close_async_pool():
+    """Fecha o pool asyncpg (chamado no evento de shutdown)."""
+    global async_pool
+    if async_pool is not None:
+        await async_pool.close()
+        async_pool = None
+        print("Pool assíncrono fechado.")
+
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Empresta uma conexão do pool assíncrono durante o bloco 'async with'.
+    Entrega None se o banco estiver indisponível ou o pool esgotado.
+    """
+    global _timeouts
+    pool = async_pool or await init_async_pool()
+    if pool is None:
+        yield None
+        return
+    try:
+        conn = await pool.acquire(timeout=DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        _timeouts += 1
+        print(f"Pool assíncrono esgotado (timeout de {DB_POOL_TIMEOUT}s).")
+        yield None
+        return
+    except (OSError, asyncpg.PostgresError) as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        yield None
+        return
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+def async_pool_stats():
+    if async_pool is None:
+        return None
+    return {
+        "min_size": async_pool.get_min_size(),
+        "max_size": async_pool.get_max_size(),
+        "size": async_pool.get_size(),
+        "idle": async_pool.get_idle_size(),
+        "timeouts": _timeouts,
+    }
@@ -1,4 +1,14 @@
+import asyncio
+import hmac
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 import bcrypt
+from fastapi import Header, HTTPException
 
 def hash_password(password: str) -> str:
     """
@@ -12,4 +22,125 @@ def verify_password(password: str, hashed_password: str) -> bool:
     """
     Verifica se a senha digitada corresponde ao hash.
     """
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+# -----------------
+# Endpoints administrativos
+# -----------------
+# Token compartilhado exigido no header 'X-Admin-Token' pelos endpoints /admin
+# (troca de modelo, reconstrução de índices). Sem ADMIN_TOKEN, ficam desligados.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Dependência do FastAPI: 403 se o token não foi configurado ou não confere."""
+    if not ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Token de administração ausente ou inválido.")
+
+# -----------------
+# Pool dedicado ao bcrypt
+# -----------------
+# O bcrypt é CPU-bound e lento de propósito. Rodando no threadpool padrão do
+# FastAPI, uma rajada de logins ocupa todas as threads e trava os outros
+# endpoints; aqui ele tem seu próprio executor, com fila limitada.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+# Sugestão de espera (segundos) devolvida no Retry-After quando a fila está cheia
+PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", "1"))
+
+# Amostras mantidas para os percentis das estatísticas
+LATENCY_SAMPLES = 1000
+
+
+class PasswordHasherBusy(Exception):
+    """A fila do pool de hashing está cheia: a requisição deve ser recusada (503)."""
+
+
+class PasswordHasher:
+    """
+    Executor limitado para hash_password/verify_password.
+
+    No máximo 'workers' hashes rodam em paralelo e 'max_queue' esperam; além
+    disso a chamada falha na hora com PasswordHasherBusy em vez de enfileirar.
+    """
+
+    def __init__(self, workers, max_queue):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._hash_seconds = deque(maxlen=LATENCY_SAMPLES)
+        self._wait_seconds = deque(maxlen=LATENCY_SAMPLES)
+
+    async def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise PasswordHasherBusy()
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._wait_seconds.append(started - submitted)
+                    self._hash_seconds.append(time.perf_counter() - started)
+                    self._completed += 1
+
+        # O slot é devolvido quando o job termina (ou é cancelado ainda na fila),
+        # não quando a requisição desiste: se o cliente desconectar, o hash que
+        # continua rodando segue contando no limite da fila
+        def release(_future=None):
+            with self._lock:
+                self._pending -= 1
+            self._slots.release()
+
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(job)
+        except RuntimeError:
+            release()  # executor já desligado (shutdown): o job nunca vai rodar
+            raise
+        future.add_done_callback(release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password):
+        return await self._run(hash_password, password)
+
+    async def verify(self, password, hashed_password):
+        return await self._run(verify_password, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    @staticmethod
+    def _summary_ms(samples):
+        if not samples:
+            return {"avg": 0.0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+
+        def percentile(q):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000
+
+        return {"avg": sum(ordered) / len(ordered) * 1000, "p50": percentile(0.5), "p99": percentile(0.99),
+                "max": ordered[-1] * 1000}
+
+    def stats(self):
+        with self._lock:
+            hash_seconds, wait_seconds = list(self._hash_seconds), list(self._wait_seconds)
+            counters = {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+        return {**counters, "hash_ms": self._summary_ms(hash_seconds), "queue_wait_ms": self._summary_ms(wait_seconds)}
@@ -0,0 +1,113 @@
+import threading
+import time
+
+from .search_index import normalize
+
+# Prefixos mais longos que isso caem no último nó (o Top-K já é bem específico aí)
+MAX_PREFIX_LEN = 24
+
+
+class PrefixTrie:
+    """
+    Trie de prefixos sobre os títulos normalizados, com o Top-K de cada nó
+    pré-calculado (score DESC, rank ASC). A consulta é O(len(prefixo)) e não
+    ordena nada em tempo de requisição.
+
+    Cada palavra do título vira uma chave (o sufixo do título a partir dela),
+    então "kyo" e "no kyo" encontram "Shingeki no Kyojin".
+    """
+
+    def __init__(self, rows, k=5):
+        self.k = k
+        self._root = [{}, []]   # nó = [filhos (char -> nó), top-k (mal_ids)]
+        self._entries = {}
+        self.built_at = time.time()
+
+        # Inserindo na ordem final do ranking, o Top-K de cada nó sai pronto:
+        # basta guardar os K primeiros animes que passam por ele.
+        ranked = sorted(
+            (row for row in rows if row["score"] is not None),
+            key=lambda r: (-r["score"], r["rank"] if r["rank"] is not None else float("inf")),
+        )
+        for row in ranked:
+            mal_id = row["mal_id"]
+            self._entries[mal_id] = {"mal_id": mal_id, "title": row["title"], "image_url": row["image_url"]}
+            for key in self._keys(row):
+                self._insert(key, mal_id)
+
+        self._freeze(self._root)
+
+    @staticmethod
+    def _keys(row):
+        keys = set()
+        for field in (normalize(row["title"]), normalize(row["title_japanese"])):
+            if not field:
+                continue
+            words = field.split(" ")
+            for i in range(len(words)):
+                keys.add(" ".join(words[i:])[:MAX_PREFIX_LEN])
+        return keys
+
+    def _insert(self, key, mal_id):
+        node = self._root
+        for ch in key:
+            children = node[0]
+            child = children.get(ch)
+            if child is None:
+                child = children[ch] = [{}, []]
+            node = child
+            top = node[1]
+            if len(top) < self.k and mal_id not in top:
+                top.append(mal_id)
+
+    def _freeze(self, root):
+        """Troca as listas por tuplas (menos memória e imutáveis depois do build)."""
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node[1] = tuple(node[1])
+            stack.extend(node[0].values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, prefix, limit=None):
+        node = self._root
+        for ch in normalize(prefix)[:MAX_PREFIX_LEN]:
+            node = node[0].get(ch)
+            if node is None:
+                return []
+        ids = node[1] if limit is None else node[1][:limit]
+        return [self._entries[mal_id] for mal_id in ids]
+
+
+class AutocompleteService:
+    """
+    Mantém a trie ativa. Reconstruções rodam fora da thread da requisição e a
+    troca é uma única atribuição de referência (atômica), então consultas em
+    andamento continuam usando a trie antiga até terminarem.
+    """
+
+    def __init__(self, k=5):
+        self.k = k
+        self.trie = None
+        self._build_lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.trie is not None
+
+    def rebuild(self, rows):
+        with self._build_lock:
+            start = time.perf_counter()
+            trie = PrefixTrie(rows, k=self.k)
+            self.trie = trie
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"[AUTOCOMPLETE] Trie reconstruída: {len(trie)} animes ({elapsed:.0f} ms).")
+
+    def rebuild_in_background(self, rows):
+        threading.Thread(target=self.rebuild, args=(rows,), name="autocomplete-rebuild", daemon=True).start()
+
+    def lookup(self, prefix, limit=None):
+        trie = self.trie
+        return trie.lookup(prefix, limit) if trie is not None else []
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def _approx_size(value):
+    """Tamanho aproximado (bytes) de um valor serializável em JSON."""
+    return len(json.dumps(value, default=str))
+
+
+class LRUTTLCache:
+    """
+    Cache em memória com política LRU + TTL, limitado por número de entradas
+    e por tamanho aproximado em bytes. Seguro para uso entre threads.
+    """
+
+    def __init__(self, max_entries=10000, ttl=600, max_bytes=None, sizeof=_approx_size):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()  # key -> (expira_em, tamanho, valor)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Retorna o valor em cache ou None (expirado/ausente)."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, size=None):
+        if size is None:
+            size = self.sizeof(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while self._data and (
+                len(self._data) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+        self._on_remove(key)
+
+    def _on_remove(self, key):
+        """Gancho para subclasses manterem índices secundários."""
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class RecommendationCache(LRUTTLCache):
+    """
+    Cache das listas de recomendação, chaveado por (user_id, faixa de limite, versão do modelo).
+
+    O limite pedido é arredondado para uma faixa (20, 50, 100, ...) para que
+    ?limit=10 e ?limit=20 reaproveitem a mesma entrada. Mantém um índice
+    user_id -> chaves para invalidar tudo de um usuário quando ele avalia algo.
+
+    Uma geração por usuário (em faixas fixas de contadores, para não crescer com
+    o número de usuários) evita que um cálculo iniciado antes de uma avaliação
+    grave a lista antiga depois da invalidação: quem calcula lê a geração antes
+    e set_for_user descarta o resultado se ela mudou.
+    """
+
+    LIMIT_BUCKETS = (20, 50, 100, 200)
+    GENERATION_STRIPES = 65536
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._keys_by_user = {}
+        self._generations = [0] * self.GENERATION_STRIPES
+        self.stale_sets = 0
+
+    @classmethod
+    def bucket_for(cls, limit):
+        for bucket in cls.LIMIT_BUCKETS:
+            if limit <= bucket:
+                return bucket
+        return limit
+
+    def get_for_user(self, user_id, limit, model_version):
+        return self.get((user_id, self.bucket_for(limit), model_version))
+
+    def generation_for(self, user_id):
+        """Ler antes de calcular as recomendações e passar para set_for_user."""
+        return self._generations[hash(user_id) % self.GENERATION_STRIPES]
+
+    def set_for_user(self, user_id, limit, model_version, recommendations, generation=None):
+        key = (user_id, self.bucket_for(limit), model_version)
+        self.set(key, recommendations)
+        with self._lock:
+            if generation is not None and generation != self.generation_for(user_id):
+                # O usuário avaliou algo durante o cálculo: a lista já nasceu velha
+                if key in self._data:
+                    self._remove(key)
+                self.stale_sets += 1
+                return
+            if key in self._data:
+                self._keys_by_user.setdefault(user_id, set()).add(key)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generations[hash(user_id) % self.GENERATION_STRIPES] += 1
+            for key in list(self._keys_by_user.get(user_id, ())):
+                if key in self._data:
+                    self._remove(key)
+                    self.invalidations += 1
+            self._keys_by_user.pop(user_id, None)
+
+    def clear(self):
+        super().clear()
+        with self._lock:
+            self._keys_by_user.clear()
+
+    def stats(self):
+        return {**super().stats(), "stale_sets": self.stale_sets}
+
+    def _on_remove(self, key):
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+class DocumentCache(LRUTTLCache):
+    """
+    Documentos de detalhe (anime, personagem, dublador) chaveados por (tipo, mal_id).
+
+    Compartilhado pelos endpoints de detalhe e pelo /batch: um documento
+    carregado por um deles é servido da memória para o outro.
+    """
+
+    def get_many(self, kind, ids):
+        """Retorna ({mal_id: documento} dos que estão em cache, [mal_ids ausentes])."""
+        found, missing = {}, []
+        for mal_id in ids:
+            document = self.get((kind, mal_id))
+            if document is None:
+                missing.append(mal_id)
+            else:
+                found[mal_id] = document
+        return found, missing
+
+    def set_many(self, kind, documents):
+        for mal_id, document in documents.items():
+            self.set((kind, mal_id), document)
@@ -1,5 +1,8 @@
 import psycopg2
+import psycopg2.extensions
 import os
+import threading
+import time
 
 # Credenciais lidas de variáveis de ambiente.
 # 'db' é o nome do serviço do PostgreSQL no docker-compose.yml.
@@ -9,19 +12,224 @@ DB_USER = os.getenv("DB_USER", "user")
 DB_PASS = os.getenv("DB_PASS", "password")
 DB_PORT = os.getenv("DB_PORT", "5432")
 
-def get_db_connection():
+# -----------------
+# Configurações do Pool de Conexões
+# -----------------
+# Orçamento de conexões do deployment inteiro, dividido entre os workers do
+# uvicorn (WEB_CONCURRENCY, a mesma variável que o uvicorn usa para --workers)
+# e, em cada worker, entre este pool (handlers síncronos e threads de fundo) e o
+# pool asyncpg (async_db.py). Deve ficar abaixo do max_connections do Postgres
+# (100 por padrão), com folga para migrações, scripts e psql.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "40"))
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+WORKER_CONNECTION_BUDGET = max(2, DB_MAX_CONNECTIONS // WEB_CONCURRENCY)
+
+# DB_POOL_MAX / ASYNC_DB_POOL_MAX explícitos sobrescrevem a divisão (metade para cada)
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", str(WORKER_CONNECTION_BUDGET // 2)))
+DB_POOL_MIN = min(int(os.getenv("DB_POOL_MIN", "2")), DB_POOL_MAX)
+# Tempo máximo (segundos) que uma requisição espera por uma conexão livre
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Conexões ociosas há mais tempo que isso recebem um 'SELECT 1' antes de serem entregues
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+class ConnectionPool:
     """
-    Tenta estabelecer e retornar uma conexão com o banco de dados.
+    Pool de conexões limitado, compartilhado por todos os endpoints.
+
+    Um semáforo limita o total a 'maxconn' e faz a requisição esperar até
+    'timeout' segundos por uma conexão livre. As conexões devolvidas ficam
+    ociosas no pool (até 'maxconn', não só 'minconn' como no
+    ThreadedConnectionPool do psycopg2, que fecha as excedentes), e as ociosas
+    há muito tempo passam por um health check antes de serem entregues.
     """
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_idle, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._connect_kwargs = connect_kwargs
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        # Pilha de (conexão, instante em que foi devolvida); a mais recente sai primeiro
+        self._idle = []
+        self._closed = False
+
+        # Estatísticas
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._lock:
+            self._opened += 1
+        return conn
+
+    def getconn(self):
+        """Retira uma conexão do pool. Retorna None se o timeout estourar."""
+        start = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waiting -= 1
+            if not acquired:
+                self._timeouts += 1
+                return None
+
+        try:
+            conn = self._checkout_healthy()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def _checkout_healthy(self):
+        """Entrega uma conexão ociosa viva ou, se não houver, abre uma nova."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn, returned_at = self._idle.pop()
+            if not conn.closed and time.monotonic() - returned_at < self.healthcheck_idle:
+                return conn
+            if not conn.closed:
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1;")
+                    conn.rollback()
+                    return conn
+                except psycopg2.Error:
+                    pass
+            # Conexão morta: descarta e tenta a próxima ociosa
+            with self._lock:
+                self._discarded += 1
+            self._close_quietly(conn)
+        return self._connect()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def putconn(self, conn):
+        """Devolve a conexão ao pool, desfazendo uma transação que tenha ficado aberta."""
+        try:
+            keep = not conn.closed and not self._closed
+            if keep and conn.status != psycopg2.extensions.STATUS_READY:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    keep = False
+            if keep:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+            else:
+                self._close_quietly(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "opened_connections": self._opened,
+                "discarded_connections": self._discarded,
+                "avg_checkout_ms": (self._wait_total / self._checkouts * 1000) if self._checkouts else 0.0,
+                "max_checkout_ms": self._wait_max * 1000,
+            }
+
+
+# Pool global, criado no startup da aplicação e fechado no shutdown
+db_pool = None
+
+
+def init_db_pool():
+    """Cria o pool de conexões (chamado no evento de startup)."""
+    global db_pool
+    if db_pool is not None:
+        return db_pool
     try:
-        conn = psycopg2.connect(
+        db_pool = ConnectionPool(
+            DB_POOL_MIN,
+            DB_POOL_MAX,
+            DB_POOL_TIMEOUT,
+            DB_POOL_HEALTHCHECK_IDLE,
             host=DB_HOST,
             database=DB_NAME,
             user=DB_USER,
             password=DB_PASS,
             port=DB_PORT
         )
+        print(f"Pool de conexões criado (min={DB_POOL_MIN}, max={DB_POOL_MAX}).")
+    except psycopg2.DatabaseError as e:
+        print(f"Erro ao criar o pool de conexões: {e}")
+        db_pool = None
+    return db_pool
+
+
+def close_db_pool():
+    """Fecha todas as conexões do pool (chamado no evento de shutdown)."""
+    global db_pool
+    if db_pool is not None:
+        db_pool.closeall()
+        db_pool = None
+        print("Pool de conexões fechado.")
+
+
+def get_db_connection():
+    """
+    Retira uma conexão do pool. Deve ser devolvida com release_db_connection().
+    Retorna None se o banco estiver indisponível ou o pool esgotado.
+    """
+    pool = db_pool or init_db_pool()
+    if pool is None:
+        return None
+    try:
+        conn = pool.getconn()
+        if conn is None:
+            print(f"Pool de conexões esgotado (timeout de {pool.timeout}s).")
         return conn
     except psycopg2.DatabaseError as e:
         print(f"Erro ao conectar ao banco de dados: {e}")
-        return None
\ No newline at end of file
+        return None
+
+
+def release_db_connection(conn):
+    """Devolve ao pool uma conexão obtida com get_db_connection()."""
+    if conn is not None and db_pool is not None:
+        db_pool.putconn(conn)
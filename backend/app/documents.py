@@ -0,0 +1,157 @@
+# Documentos aninhados (anime, personagem, dublador) montados pelo próprio Postgres
+# com jsonb_build_object/jsonb_agg em subconsultas LATERAL: uma única ida ao banco
+# por consulta, seja para um ID ou para vários (WHERE ... = ANY(%s)).
+
+ANIME_DOCUMENTS_SQL = """
+    SELECT a.mal_id, jsonb_build_object(
+        'mal_id', a.mal_id,
+        'title', a.title,
+        'title_japanese', a.title_japanese,
+        'synopsis', a.synopsis,
+        'episodes', a.episodes,
+        'status', a.status,
+        'rank', a.rank,
+        'score', a.score,
+        'season', a.season,
+        'year', a.year,
+        'image_url', a.image_url,
+        'trailer_embed_url', a.trailer_embed_url,
+        'type', a.type,
+        'source', a.source,
+        'duration', a.duration,
+        'favorites', a.favorites,
+        'genres', COALESCE(g.genres, '[]'::jsonb),
+        'studios', COALESCE(s.studios, '[]'::jsonb),
+        'streaming', COALESCE(st.streaming, '[]'::jsonb),
+        'characters', COALESCE(ch.characters, '[]'::jsonb)
+    ) AS document
+    FROM animes a
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(g.name) AS genres
+        FROM animes_genres ag
+        JOIN genres g ON ag.genre_mal_id = g.mal_id
+        WHERE ag.anime_mal_id = a.mal_id
+    ) g ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(s.name) AS studios
+        FROM animes_studios ast
+        JOIN studios s ON ast.studio_mal_id = s.mal_id
+        WHERE ast.anime_mal_id = a.mal_id
+    ) s ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object('name', ss.name, 'url', ss.url)) AS streaming
+        FROM animes_streaming a_s
+        JOIN streaming_services ss ON a_s.service_id = ss.id
+        WHERE a_s.anime_mal_id = a.mal_id
+    ) st ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+            'mal_id', c.mal_id,
+            'name', c.name,
+            'image_url', c.image_url,
+            'voice_actors', COALESCE(v.voice_actors, '[]'::jsonb)
+        )) AS characters
+        FROM animes_characters ac
+        JOIN characters c ON ac.character_mal_id = c.mal_id
+        LEFT JOIN LATERAL (
+            SELECT jsonb_agg(jsonb_build_object(
+                'mal_id', va.mal_id,
+                'name', va.name,
+                'image_url', va.image_url,
+                'language', va.language
+            )) AS voice_actors
+            FROM characters_voice_actors cva
+            JOIN voice_actors va ON cva.voice_actor_mal_id = va.mal_id
+            WHERE cva.character_mal_id = c.mal_id
+        ) v ON TRUE
+        WHERE ac.anime_mal_id = a.mal_id
+    ) ch ON TRUE
+    WHERE a.mal_id = ANY(%s);
+"""
+
+CHARACTER_DOCUMENTS_SQL = """
+    SELECT c.mal_id, jsonb_build_object(
+        'mal_id', c.mal_id,
+        'name', c.name,
+        'name_kanji', c.name_kanji,
+        'nicknames', c.nicknames,
+        'favorites', c.favorites,
+        'about', c.about,
+        'image_url', c.image_url,
+        'pictures', COALESCE(p.pictures, '[]'::jsonb),
+        'voice_actors', COALESCE(v.voice_actors, '[]'::jsonb)
+    ) AS document
+    FROM characters c
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(cp.image_url) AS pictures
+        FROM character_pictures cp
+        WHERE cp.character_mal_id = c.mal_id
+    ) p ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+            'mal_id', va.mal_id,
+            'name', va.name,
+            'image_url', va.image_url,
+            'birthday', va.birthday,
+            'about', va.about,
+            'language', va.language
+        )) AS voice_actors
+        FROM characters_voice_actors cva
+        JOIN voice_actors va ON cva.voice_actor_mal_id = va.mal_id
+        WHERE cva.character_mal_id = c.mal_id
+    ) v ON TRUE
+    WHERE c.mal_id = ANY(%s);
+"""
+
+VOICE_ACTOR_DOCUMENTS_SQL = """
+    SELECT va.mal_id, jsonb_build_object(
+        'mal_id', va.mal_id,
+        'name', va.name,
+        'image_url', va.image_url,
+        'birthday', va.birthday,
+        'about', va.about,
+        'language', va.language,
+        'characters', COALESCE(ch.characters, '[]'::jsonb)
+    ) AS document
+    FROM voice_actors va
+    LEFT JOIN LATERAL (
+        SELECT jsonb_agg(jsonb_build_object(
+            'mal_id', c.mal_id,
+            'name', c.name,
+            'image_url', c.image_url
+        )) AS characters
+        FROM characters_voice_actors cva
+        JOIN characters c ON cva.character_mal_id = c.mal_id
+        WHERE cva.voice_actor_mal_id = va.mal_id
+    ) ch ON TRUE
+    WHERE va.mal_id = ANY(%s);
+"""
+
+
+def _fetch_documents(cursor, sql, ids):
+    """Executa a consulta de documentos e devolve {mal_id: documento}."""
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        return {}
+    cursor.execute(sql, (ids,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def fetch_anime_documents(cursor, ids):
+    return _fetch_documents(cursor, ANIME_DOCUMENTS_SQL, ids)
+
+
+def fetch_character_documents(cursor, ids):
+    return _fetch_documents(cursor, CHARACTER_DOCUMENTS_SQL, ids)
+
+
+def fetch_voice_actor_documents(cursor, ids):
+    return _fetch_documents(cursor, VOICE_ACTOR_DOCUMENTS_SQL, ids)
+
+
+# Tipo de entidade -> função que busca vários documentos numa consulta
+DOCUMENT_FETCHERS = {
+    "anime": fetch_anime_documents,
+    "character": fetch_character_documents,
+    "voice_actor": fetch_voice_actor_documents,
+}
@@ -0,0 +1,242 @@
+import html
+import json
+import math
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+from psycopg2.extras import DictCursor
+
+from .search_index import normalize
+
+# Tipos de documento indexados (o código vai para o array doc_types)
+DOC_TYPES = ("anime", "character", "voice_actor")
+
+# Parâmetros padrão do BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Os textos do MyAnimeList são em inglês; alguns termos em português por via das dúvidas
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been before but by can could did do does
+during each for from had has have he her hers him his how i if in into is it its just
+more most no not of on once only or other our out over own s same she should so some
+such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you
+your de da do das dos e o os as um uma que em no na nos nas para por com
+""".split())
+
+MIN_TOKEN_LEN = 2
+
+# Versões publicadas que ficam em disco além da atual (workers que ainda não
+# recarregaram continuam lendo a anterior)
+KEEP_PREVIOUS_VERSIONS = 1
+
+
+def tokenize(text):
+    return [t for t in normalize(text).split(" ") if len(t) >= MIN_TOKEN_LEN and t not in STOPWORDS]
+
+
+class FullTextIndex:
+    """
+    Índice invertido com ranking BM25 sobre sinopses de animes e biografias de
+    personagens e dubladores.
+
+    As posting lists ficam concatenadas em arrays NumPy compactos:
+        offsets[t]:offsets[t+1] -> trecho de doc_ids/tfs do termo t
+    e o índice é salvo em disco como .npy, para que cada worker o abra com
+    np.load(mmap_mode='r') em vez de reconstruí-lo no startup.
+    """
+
+    def __init__(self, vocab, offsets, doc_ids, tfs, doc_lengths, doc_types, doc_entity_ids,
+                 k1=BM25_K1, b=BM25_B):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.doc_types = doc_types
+        self.doc_entity_ids = doc_entity_ids
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(doc_lengths)
+        self.avg_doc_length = float(np.mean(doc_lengths)) if self.n_docs else 0.0
+        # Parte do denominador do BM25 que só depende do tamanho do documento
+        self._length_norm = (k1 * (1 - b + b * np.asarray(doc_lengths) / (self.avg_doc_length or 1))).astype(np.float32)
+
+    @classmethod
+    def build(cls, documents):
+        """'documents' = iterável de (tipo, mal_id, texto)."""
+        postings = {}
+        doc_lengths, doc_types, doc_entity_ids = [], [], []
+
+        for doc_index, (doc_type, entity_id, text) in enumerate(documents):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            doc_types.append(DOC_TYPES.index(doc_type))
+            doc_entity_ids.append(entity_id)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_index, tf))
+
+        terms = sorted(postings)
+        vocab = {term: i for i, term in enumerate(terms)}
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+
+        doc_ids = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = [d for d, _ in entries]
+            tfs[offsets[i]:offsets[i + 1]] = [min(tf, 65535) for _, tf in entries]
+
+        return cls(
+            vocab, offsets, doc_ids, tfs,
+            np.asarray(doc_lengths, dtype=np.int32),
+            np.asarray(doc_types, dtype=np.int8),
+            np.asarray(doc_entity_ids, dtype=np.int32),
+        )
+
+    def save(self, directory, catalog_generation=None):
+        """
+        Grava uma versão nova em '<directory>.versions/<rótulo>/' e publica
+        trocando o symlink 'directory' de forma atômica: leitores e workers
+        concorrentes nunca veem meio índice nem disputam o mesmo diretório.
+        """
+        versions_dir = f"{directory}.versions"
+        # Rótulo em ordem cronológica e único mesmo para dois saves no mesmo segundo
+        label = f"{time.time_ns()}-{os.getpid()}"
+        version_dir = os.path.join(versions_dir, label)
+        tmp_dir = os.path.join(versions_dir, f".{label}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name in ("offsets", "doc_ids", "tfs", "doc_lengths", "doc_types", "doc_entity_ids"):
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(self, name))
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump(terms, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({"n_docs": self.n_docs, "n_terms": len(terms), "k1": self.k1, "b": self.b,
+                       "catalog_generation": catalog_generation, "built_at": time.time()}, f)
+        os.rename(tmp_dir, version_dir)
+
+        # Índices gravados antes do symlink eram um diretório comum no mesmo caminho
+        if os.path.isdir(directory) and not os.path.islink(directory):
+            shutil.rmtree(directory)
+        tmp_link = f"{directory}.link-{os.getpid()}"
+        if os.path.lexists(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(os.path.relpath(version_dir, os.path.dirname(os.path.abspath(directory))), tmp_link)
+        os.replace(tmp_link, directory)
+
+        current = os.path.basename(os.path.realpath(directory))
+        old_versions = sorted(name for name in os.listdir(versions_dir)
+                              if not name.startswith(".") and name != current)
+        for name in old_versions[:-KEEP_PREVIOUS_VERSIONS or None]:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+    @staticmethod
+    def published_generation(directory):
+        """Geração do catálogo com que a versão publicada foi construída (None se não houver)."""
+        try:
+            with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f).get("catalog_generation")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        mode = "r" if mmap else None
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode)
+            for name in ("offsets", "doc_ids", "tfs", "doc_lengths", "doc_types", "doc_entity_ids")
+        }
+        with open(os.path.join(directory, "vocab.json"), "r", encoding="utf-8") as f:
+            vocab = {term: i for i, term in enumerate(json.load(f))}
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        return cls(vocab, k1=manifest["k1"], b=manifest["b"], **arrays)
+
+    def search(self, q, limit=20, types=None):
+        """
+        Retorna ([(tipo, mal_id, score_bm25), ...], termos_usados), com os hits
+        ordenados por relevância e os termos da consulta que existem no vocabulário.
+        """
+        terms = [t for t in dict.fromkeys(tokenize(q)) if t in self.vocab]
+        if not terms or not self.n_docs:
+            return [], terms
+
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in terms:
+            t = self.vocab[term]
+            start, end = self.offsets[t], self.offsets[t + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            # Cada doc aparece no máximo uma vez por termo, então o += indexado é seguro
+            scores[ids] += idf * tf * (self.k1 + 1) / (tf + self._length_norm[ids])
+
+        if types:
+            allowed = np.isin(self.doc_types, [DOC_TYPES.index(t) for t in types])
+            scores[~allowed] = 0
+
+        n_hits = int(np.count_nonzero(scores))
+        n = min(limit, n_hits)
+        if n == 0:
+            return [], terms
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [
+            (DOC_TYPES[self.doc_types[i]], int(self.doc_entity_ids[i]), float(scores[i]))
+            for i in top
+        ], terms
+
+
+def load_fulltext_documents(conn):
+    """Lê os textos indexados: título + sinopse, nome + biografia."""
+    cur = conn.cursor(cursor_factory=DictCursor)
+    try:
+        cur.execute("SELECT mal_id, title, synopsis FROM animes;")
+        for row in cur.fetchall():
+            yield "anime", row["mal_id"], f"{row['title']} {row['synopsis'] or ''}"
+        cur.execute("SELECT mal_id, name, about FROM characters;")
+        for row in cur.fetchall():
+            yield "character", row["mal_id"], f"{row['name']} {row['about'] or ''}"
+        cur.execute("SELECT mal_id, name, about FROM voice_actors;")
+        for row in cur.fetchall():
+            yield "voice_actor", row["mal_id"], f"{row['name']} {row['about'] or ''}"
+    finally:
+        cur.close()
+
+
+SNIPPET_CHARS = 200
+
+
+def make_snippet(text, terms, width=SNIPPET_CHARS):
+    """
+    Trecho em volta do primeiro termo encontrado, com os termos marcados por
+    <mark>. O texto é escapado (HTML), então o trecho pode ser renderizado como markup.
+    """
+    if not text:
+        return ""
+    if not terms:
+        return html.escape(text[:width])
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - width // 3) if match else 0
+    end = min(len(text), start + width)
+    window = text[start:end]
+
+    parts, last = [], 0
+    for m in pattern.finditer(window):
+        parts.append(html.escape(window[last:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group(0))}</mark>")
+        last = m.end()
+    parts.append(html.escape(window[last:]))
+    return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text) else "")
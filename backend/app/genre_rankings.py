@@ -0,0 +1,124 @@
+import threading
+import time
+
+import numpy as np
+from psycopg2.extras import DictCursor
+
+from .database import get_db_connection, release_db_connection
+
+# Mesma ordem das listagens (/animes/top, /animes/genre): score DESC, mal_id DESC
+GLOBAL_RANKING_SQL = """
+    SELECT mal_id, title, image_url, score
+    FROM animes
+    WHERE score IS NOT NULL
+    ORDER BY score DESC, mal_id DESC;
+"""
+# Rankings por gênero já prontos na view materializada (migração 0006)
+GENRE_RANKING_SQL = """
+    SELECT genre_name, mal_id
+    FROM genre_anime_rankings
+    ORDER BY genre_name, score DESC, mal_id DESC;
+"""
+
+class GenreRankings:
+    """
+    Rankings imutáveis do catálogo: o global e um por gênero, como arrays de
+    mal_id já ordenados por score. Escolher os melhores ainda não vistos é só
+    percorrer o começo do array, sem consultar o banco.
+    """
+
+    def __init__(self, anime_rows, genre_rows):
+        self.built_at = time.time()
+        self._entries = {
+            row["mal_id"]: {"mal_id": row["mal_id"], "title": row["title"],
+                            "image_url": row["image_url"], "score": row["score"]}
+            for row in anime_rows
+        }
+        by_genre = {}
+        for row in genre_rows:
+            # A view pode estar um pouco atrás do catálogo; ignora animes que não estão no ranking global
+            if row["mal_id"] in self._entries:
+                by_genre.setdefault(row["genre_name"], []).append(row["mal_id"])
+        # As linhas já vêm na ordem do ranking, então cada lista sai ordenada
+        self.global_ids = np.fromiter(self._entries, dtype=np.int32, count=len(self._entries))
+        self.by_genre = {genre: np.asarray(ids, dtype=np.int32) for genre, ids in by_genre.items()}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def top_unseen(self, genre, count, seen):
+        """
+        Os 'count' melhores animes do gênero (ou do ranking global, com genre=None)
+        fora de 'seen'. Acrescenta os escolhidos a 'seen'.
+        """
+        ids = self.global_ids if genre is None else self.by_genre.get(genre)
+        if ids is None or count <= 0:
+            return []
+        # No máximo len(seen) candidatos são pulados, então basta olhar esse prefixo
+        picked = []
+        for mal_id in ids[:count + len(seen)].tolist():
+            if mal_id not in seen:
+                picked.append(dict(self._entries[mal_id]))
+                seen.add(mal_id)
+                if len(picked) >= count:
+                    break
+        return picked
+
+    def status(self):
+        return {
+            "animes": len(self),
+            "genres": len(self.by_genre),
+            "bytes": int(self.global_ids.nbytes + sum(ids.nbytes for ids in self.by_genre.values())),
+            "built_at": self.built_at,
+        }
+
+
+class GenreRankingService:
+    """
+    Mantém os rankings ativos. Construídos no startup e depois de cada ingestão;
+    a troca é uma única atribuição, como na trie do autocomplete.
+    """
+
+    def __init__(self):
+        self.rankings = None
+        self._build_lock = threading.Lock()
+
+    def rebuild(self, conn=None):
+        own_conn = conn is None
+        if own_conn:
+            conn = get_db_connection()
+            if not conn:
+                print("[RANKINGS] Banco indisponível; rankings por gênero não construídos.")
+                return None
+        try:
+            with self._build_lock:
+                start = time.perf_counter()
+                cur = conn.cursor(cursor_factory=DictCursor)
+                cur.execute(GLOBAL_RANKING_SQL)
+                anime_rows = cur.fetchall()
+                cur.execute(GENRE_RANKING_SQL)
+                rankings = GenreRankings(anime_rows, cur.fetchall())
+                self.rankings = rankings
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[RANKINGS] Rankings reconstruídos: {len(rankings)} animes, "
+                      f"{len(rankings.by_genre)} gêneros ({elapsed:.0f} ms).")
+                return rankings
+        except Exception as e:
+            conn.rollback()
+            print(f"[RANKINGS] Erro ao construir os rankings por gênero: {e}")
+            return None
+        finally:
+            if own_conn:
+                release_db_connection(conn)
+
+    def rebuild_in_background(self):
+        threading.Thread(target=self.rebuild, name="genre-rankings-rebuild", daemon=True).start()
+
+    def get(self, conn):
+        """Rankings atuais; se ainda não existirem (startup em andamento), constrói com 'conn'."""
+        rankings = self.rankings
+        return rankings if rankings is not None else self.rebuild(conn)
+
+    def status(self):
+        rankings = self.rankings
+        return rankings.status() if rankings is not None else None
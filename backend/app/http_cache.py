@@ -0,0 +1,129 @@
+import hashlib
+import re
+import threading
+
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from .cache import LRUTTLCache
+from .database import get_db_connection, release_db_connection
+
+
+class CatalogGeneration:
+    """
+    Acompanha o contador 'catalog_state.generation', que o populate_db.py
+    incrementa ao final de cada ingestão. Quando ele muda, os listeners são
+    chamados (limpar caches, reconstruir índices de busca).
+    """
+
+    def __init__(self, poll_interval, listeners=()):
+        self.poll_interval = poll_interval
+        self.listeners = list(listeners)
+        self.value = 0
+        self._warned = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        conn = get_db_connection()
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT generation FROM catalog_state;")
+                row = cur.fetchone()
+        except Exception as e:
+            if not self._warned:
+                print(f"[CACHE] Não foi possível ler a geração do catálogo: {e}")
+                self._warned = True
+            return
+        finally:
+            release_db_connection(conn)
+
+        generation = row[0] if row else 0
+        if generation != self.value:
+            first_read = self.value == 0
+            self.value = generation
+            if not first_read:
+                print(f"[CACHE] Catálogo mudou (geração {generation}); invalidando caches.")
+                for listener in self.listeners:
+                    listener()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="catalog-generation", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class ResponseCache(LRUTTLCache):
+    """Corpos de resposta serializados + ETag forte, chaveados por (geração, URL)."""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("sizeof", lambda entry: len(entry[0]))
+        super().__init__(*args, **kwargs)
+
+
+def strong_etag(body):
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+class ResponseCacheMiddleware(BaseHTTPMiddleware):
+    """
+    Cache HTTP para os endpoints de catálogo (dados que só mudam na ingestão).
+
+    - GETs em 'paths' (regex) são servidos da memória após a primeira vez;
+    - If-None-Match com a ETag atual responde 304 sem corpo;
+    - Cache-Control informa ao navegador por quanto tempo reutilizar.
+    """
+
+    def __init__(self, app, cache, generation, paths, max_age):
+        super().__init__(app)
+        self.cache = cache
+        self.generation = generation
+        self.paths = [re.compile(p) for p in paths]
+        self.cache_control = f"public, max-age={max_age}"
+
+    def _cacheable(self, request):
+        return request.method == "GET" and any(p.match(request.url.path) for p in self.paths)
+
+    def _respond(self, request, body, etag, media_type, x_cache):
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "X-Cache": x_cache}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    async def dispatch(self, request, call_next):
+        if not self._cacheable(request):
+            return await call_next(request)
+
+        key = (self.generation.value, request.url.path, request.url.query)
+        entry = self.cache.get(key)
+        if entry is not None:
+            body, etag, media_type = entry
+            return self._respond(request, body, etag, media_type, "HIT")
+
+        response = await call_next(request)
+        if response.status_code != 200:
+            return response
+
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = strong_etag(body)
+        media_type = response.headers.get("content-type", "application/json")
+        self.cache.set(key, (body, etag, media_type))
+        return self._respond(request, body, etag, media_type, "MISS")
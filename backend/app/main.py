@@ -1,17 +1,41 @@
+import asyncpg
 import psycopg2
 import threading
+import time
 import os
-from fastapi import FastAPI, HTTPException, status, Query, Path
+from fastapi import Depends, FastAPI, HTTPException, status, Query, Path, Response
 from fastapi.middleware.cors import CORSMiddleware
-from surprise import dump
 from typing import Optional
 
 from pydantic import BaseModel
 from typing import List, Dict
 
-from .auth import hash_password, verify_password
+from .auth import PasswordHasher, PasswordHasherBusy, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE, PASSWORD_HASH_RETRY_AFTER
+from .auth import require_admin_token
+from .database import get_db_connection, release_db_connection, init_db_pool, close_db_pool
+from .async_db import async_connection, init_async_pool, close_async_pool, async_pool_stats
+from . import database
 from .models import UserCreate, UserLogin
-from psycopg2.extras import DictCursor, DictRow
+from .model_registry import ModelRegistry
+from .cache import RecommendationCache, DocumentCache
+from .search_index import TrigramIndex, IndexRefresher
+from .autocomplete import AutocompleteService
+from .pagination import InvalidCursor, clamp_limit, decode_cursor, encode_cursor, make_page
+from .http_cache import CatalogGeneration, ResponseCache, ResponseCacheMiddleware
+from .documents import DOCUMENT_FETCHERS
+from .genre_rankings import GenreRankingService
+from .write_behind import (
+    DELETED, WRITE_BEHIND_INTERVAL_MS, WRITE_BEHIND_MAX_BACKOFF_MS, WRITE_BEHIND_MAX_BATCH,
+    WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_MODE, WriteBehindFull, WriteBehindQueue,
+)
+from .materialized_views import MaterializedViewRefresher
+from .rating_events import DELETE_RATING_SQL, UPSERT_RATING_SQL, RatingEventWatcher, list_consumers
+from .metrics import (
+    InstrumentedCursor, MetricsMiddleware, MODEL_PREDICTION_LATENCY, RECOMMENDATION_FALLBACKS,
+    RECOMMENDATIONS_SERVED, mark_worker_dead, render_metrics, timed,
+)
+from .fulltext import FullTextIndex, DOC_TYPES, load_fulltext_documents, make_snippet
+from psycopg2.extras import DictRow
 
 app = FastAPI()
 
@@ -32,100 +56,163 @@ class UserLogin(BaseModel):
 # FIM DAS VERSÕES SIMPLES
 # -----------------
 
-# -----------------
-# Configurações do Banco de Dados
-# -----------------
-DB_NAME = os.getenv("DB_NAME", "animesearch")
-DB_USER = os.getenv("DB_USER", "user")
-DB_PASSWORD = os.getenv("DB_PASS", "password")
-DB_HOST = os.getenv("DB_HOST", "db")
+# Modelo de recomendação ativo (scorer vetorizado + índice de similares), trocado a
+# quente quando o train_model.py publica uma versão nova em model_machine_learning/versions/
+model_registry = ModelRegistry(
+    os.getenv("MODEL_DIR", "model_machine_learning"),
+    poll_interval=float(os.getenv("MODEL_POLL_INTERVAL", "60")),
+    exact_threshold=int(os.getenv("SIMILAR_EXACT_THRESHOLD", "20000")),
+    use_mmap=os.getenv("MODEL_MMAP", "1") == "1",
+)
+SIMILAR_BUDGET_MS = float(os.getenv("SIMILAR_BUDGET_MS", "20"))
 
-def get_db_connection():
-    """Conecta ao banco de dados PostgreSQL."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST
-        )
-        return conn
-    except psycopg2.Error as e:
-        print(f"Erro ao conectar ao banco de dados: {e}")
-        return None
+# Cache em memória das listas de recomendação (invalidado quando o usuário avalia/edita a lista)
+recommendation_cache = RecommendationCache(
+    max_entries=int(os.getenv("REC_CACHE_MAX_ENTRIES", "10000")),
+    ttl=float(os.getenv("REC_CACHE_TTL", "600")),
+    max_bytes=int(os.getenv("REC_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# Pool dedicado ao bcrypt (login/registro), com fila limitada
+password_hasher = PasswordHasher(workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_QUEUE)
 
-# Variável para armazenar o modelo SVD carregado
-svd_model = None
+# Fila write-behind das notas e da lista do usuário (WRITE_BEHIND_MODE=off|async|sync)
+write_queue = WriteBehindQueue(WRITE_BEHIND_MODE, WRITE_BEHIND_INTERVAL_MS, WRITE_BEHIND_MAX_BATCH,
+                               WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_MAX_BACKOFF_MS)
+
+# Documentos de detalhe (anime, personagem, dublador), compartilhados entre /anime/{id} etc. e /batch
+document_cache = DocumentCache(
+    max_entries=int(os.getenv("DOC_CACHE_MAX_ENTRIES", "20000")),
+    ttl=float(os.getenv("DOC_CACHE_TTL", "3600")),
+    max_bytes=int(os.getenv("DOC_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+
+# Índice de trigramas dos títulos (busca e autocomplete sem LIKE no Postgres)
+title_index = TrigramIndex()
+# Trie de prefixos com Top-5 pré-calculado por nó, reconstruída quando o catálogo muda
+autocomplete_service = AutocompleteService(k=5)
+title_index_refresher = IndexRefresher(
+    title_index,
+    interval=float(os.getenv("SEARCH_INDEX_REFRESH", "300")),
+    listeners=[autocomplete_service.rebuild],
+)
+
+# Índice BM25 de sinopses/biografias, salvo em disco e aberto via mmap por cada worker
+FULLTEXT_INDEX_DIR = os.getenv("FULLTEXT_INDEX_DIR", "search_index/fulltext")
+# Advisory lock da construção: um worker constrói e publica, os outros esperam e abrem a versão publicada
+FULLTEXT_BUILD_LOCK_KEY = 724_113_004
+fulltext_index = None
+
+# Cache HTTP (ETag/304) dos endpoints de catálogo, invalidado pela geração do catálogo
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "5000")),
+    ttl=float(os.getenv("HTTP_CACHE_TTL", "3600")),
+    max_bytes=int(os.getenv("HTTP_CACHE_MAX_BYTES", str(128 * 1024 * 1024))),
+)
+catalog_generation = CatalogGeneration(poll_interval=float(os.getenv("CATALOG_GENERATION_POLL", "10")))
+CACHEABLE_PATHS = [
+    r"^/animes/top$",
+    r"^/animes/genres$",
+    r"^/animes/genre/[^/]+$",
+    r"^/anime/\d+$",
+    r"^/character/\d+$",
+    r"^/voice-actor/\d+$",
+]
+
+# Rankings global e por gênero em memória, usados pelo fallback de recomendação
+genre_rankings = GenreRankingService()
+# Views materializadas que dependem das avaliações (afinidade usuário x gênero);
+# as do catálogo são atualizadas pelo populate_db.py ao fim da ingestão
+matview_refresher = MaterializedViewRefresher(
+    get_db_connection,
+    release_db_connection,
+    interval=float(os.getenv("MATVIEW_REFRESH_INTERVAL", "300")),
+)
+# Log de mudanças de nota: invalida o cache de recomendações dos usuários que
+# avaliaram em qualquer worker e compacta os eventos já consumidos
+rating_event_watcher = RatingEventWatcher(
+    get_db_connection,
+    release_db_connection,
+    poll_interval=float(os.getenv("RATING_EVENTS_POLL", "5")),
+    compact_interval=float(os.getenv("RATING_EVENTS_COMPACT_INTERVAL", "3600")),
+    keep_seconds=float(os.getenv("RATING_EVENTS_KEEP_SECONDS", "3600")),
+)
 
-import random # Importe isso no topo do arquivo se quiser misturar a ordem final
+# Seen set e histograma de gêneros curtidos (nota >= 7) numa única ida ao banco:
+# linhas com anime_id são as avaliações; linhas com genre vêm da view de afinidade
+# (atualizada pelo matview_refresher, então avaliações muito recentes entram na próxima rodada).
+# Usuário que ainda não está na view (ex: acabou de dar as primeiras notas) tem
+# o histograma calculado na hora, que para poucas avaliações é barato.
+USER_TASTE_SQL = """
+    WITH affinity AS (
+        SELECT genre_name, likes
+        FROM user_genre_affinity
+        WHERE user_id = %(user_id)s
+    )
+    SELECT anime_id, NULL::text AS genre, NULL::bigint AS count
+    FROM ratings
+    WHERE user_id = %(user_id)s
+    UNION ALL
+    SELECT NULL, genre_name, likes
+    FROM affinity
+    UNION ALL
+    SELECT NULL, g.name, COUNT(*)
+    FROM ratings r
+    JOIN animes_genres ag ON r.anime_id = ag.anime_mal_id
+    JOIN genres g ON ag.genre_mal_id = g.mal_id
+    WHERE r.user_id = %(user_id)s AND r.rating >= 7
+      AND NOT EXISTS (SELECT 1 FROM affinity)
+    GROUP BY g.name;
+"""
 
 def get_fallback_recommendations(conn, user_id, limit):
     """
     Estratégia de Fallback Híbrida e Ponderada:
     1. Analisa os Top 3 gêneros favoritos do usuário.
     2. Calcula quantos animes de cada gênero devem ser mostrados (proporcionalmente).
-    3. Busca os melhores de cada gênero.
+    3. Pega os melhores de cada gênero dos rankings em memória.
     4. Se sobrar espaço (ou usuário novo), preenche com Top Global.
+
+    Só o que o usuário já viu e o histograma de gêneros vêm do banco (uma consulta).
+    O histograma vem da view 'user_genre_affinity', então para quem já está nela
+    as notas dadas depois da última atualização (até MATVIEW_REFRESH_INTERVAL)
+    ainda não contam; usuários novos têm o histograma calculado na hora.
     """
-    cur = conn.cursor(cursor_factory=DictCursor)
-    
-    # 1. O que o usuário JÁ VIU (para não recomendar repetido)
-    cur.execute("SELECT anime_id FROM ratings WHERE user_id = %s", (user_id,))
-    seen_ids = {row['anime_id'] for row in cur.fetchall()} 
-    
+    rankings = genre_rankings.get(conn)
+    if rankings is None:
+        return []
+
+    cur = conn.cursor(cursor_factory=InstrumentedCursor)
+    cur.execute(USER_TASTE_SQL, {"user_id": user_id}, name="fallback_user_taste")
+
+    # 1. O que o usuário JÁ VIU (para não recomendar repetido) e os gêneros curtidos
+    seen_ids, genre_counts = set(), []
+    for row in cur.fetchall():
+        if row['anime_id'] is not None:
+            seen_ids.add(row['anime_id'])
+        else:
+            genre_counts.append({'name': row['genre'], 'count': row['count']})
+
+    # 2. Top 3 Gêneros (com notas >= 7) e suas contagens
+    top_genres = sorted(genre_counts, key=lambda g: (-g['count'], g['name']))[:3]
+
     recommendations = []
-    
-    # 2. Busca os Top 3 Gêneros (com notas >= 7) e suas contagens
-    cur.execute("""
-        SELECT g.name, COUNT(*) as count
-        FROM ratings r
-        JOIN animes_genres ag ON r.anime_id = ag.anime_mal_id
-        JOIN genres g ON ag.genre_mal_id = g.mal_id
-        WHERE r.user_id = %s AND r.rating >= 7
-        GROUP BY g.name
-        ORDER BY count DESC
-        LIMIT 3;
-    """, (user_id,))
-    
-    top_genres = [dict(row) for row in cur.fetchall()]
-    
+
     # Se houver gêneros favoritos, calculamos a proporção
     if top_genres:
         total_likes = sum(g['count'] for g in top_genres)
-        
+
         print(f"Fallback Ponderado para User {user_id}: Gêneros {top_genres}")
-        
+
         for genre in top_genres:
             # Regra de 3: (Likes do Gênero / Total de Likes) * Limite Total
             # Ex: (10 / 20) * 20 = 10 animes
             slots = int((genre['count'] / total_likes) * limit)
-            
-            if slots < 1: 
-                continue
-                
-            # Busca os melhores desse gênero específico
-            cur.execute("""
-                SELECT a.mal_id, a.title, a.image_url, a.score
-                FROM animes a
-                JOIN animes_genres ag ON a.mal_id = ag.anime_mal_id
-                JOIN genres g ON ag.genre_mal_id = g.mal_id
-                WHERE g.name = %s
-                AND a.score IS NOT NULL
-                ORDER BY a.score DESC
-                LIMIT %s;
-            """, (genre['name'], slots + 10)) # Busca sobra para garantir filtro
-            
-            candidates = cur.fetchall()
-            
-            count_added = 0
-            for anime in candidates:
-                if anime['mal_id'] not in seen_ids:
-                    recommendations.append(dict(anime))
-                    seen_ids.add(anime['mal_id']) # Marca como visto para não duplicar em outro gênero
-                    count_added += 1
-                    if count_added >= slots:
-                        break
-    
+
+            # Os melhores desse gênero que o usuário ainda não viu
+            # (os escolhidos entram em seen_ids para não duplicar em outro gênero)
+            recommendations += rankings.top_unseen(genre['name'], slots, seen_ids)
+
     # 3. Preenchimento (Backfill) com TOP GLOBAL
     # Isso roda se:
     # a) O usuário é novo (top_genres vazio)
@@ -134,50 +221,158 @@ def get_fallback_recommendations(conn, user_id, limit):
     if len(recommendations) < limit:
         remaining_slots = limit - len(recommendations)
         print(f"Fallback: Preenchendo {remaining_slots} slots com Top Global.")
-        
-        cur.execute("""
-            SELECT mal_id, title, image_url, score 
-            FROM animes 
-            WHERE score IS NOT NULL
-            ORDER BY score DESC 
-            LIMIT %s;
-        """, (remaining_slots + 50,)) # Margem de segurança
-        
-        global_candidates = cur.fetchall()
-        
-        for anime in global_candidates:
-            if anime['mal_id'] not in seen_ids:
-                recommendations.append(dict(anime))
-                seen_ids.add(anime['mal_id'])
-                if len(recommendations) >= limit:
-                    break
+        recommendations += rankings.top_unseen(None, remaining_slots, seen_ids)
 
     # 4. Tratamento Final
-    # Adiciona campo predicted_rating se não existir (usando score)
+    # Adiciona campo predicted_rating (usando score)
     for rec in recommendations:
-        if 'predicted_rating' not in rec:
-            rec['predicted_rating'] = rec['score'] if rec['score'] else 0
+        rec['predicted_rating'] = rec['score'] if rec['score'] else 0
 
-    # Opcional: Ordenar tudo por Score para que os melhores (independente do gênero) fiquem no topo
-    # Ou Shuffle se quiser misturar aleatoriamente
+    # Ordena tudo por Score para que os melhores (independente do gênero) fiquem no topo
     recommendations.sort(key=lambda x: x['predicted_rating'] or 0, reverse=True)
 
+    RECOMMENDATIONS_SERVED.labels("fallback").inc()
     return recommendations[:limit]
 
 @app.on_event("startup")
-def load_svd_model():
-    """Carrega o modelo SVD ao iniciar o servidor."""
-    global svd_model
+def open_db_pool():
+    """Cria o pool de conexões compartilhado ao iniciar o servidor."""
+    init_db_pool()
+
+@app.on_event("startup")
+async def open_async_db_pool():
+    """Cria o pool asyncpg usado pelos endpoints assíncronos e inicia a fila write-behind."""
+    await init_async_pool()
+    write_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_async_db_pool():
+    # Grava o que ainda está na fila write-behind antes de fechar o pool
+    await write_queue.close()
+    await close_async_pool()
+    password_hasher.shutdown()
+    mark_worker_dead()
+
+@app.on_event("shutdown")
+def shutdown_db_pool():
+    """Fecha as conexões do pool ao desligar o servidor."""
+    title_index_refresher.stop()
+    model_registry.stop()
+    catalog_generation.stop()
+    matview_refresher.stop()
+    rating_event_watcher.stop()
+    close_db_pool()
+
+@app.on_event("startup")
+def start_search_index():
+    """Constrói o índice de títulos em segundo plano e o mantém atualizado."""
+    title_index_refresher.start()
+
+@app.on_event("startup")
+def build_genre_rankings():
+    """Rankings do fallback em segundo plano; até ficarem prontos, o fallback os constrói na hora."""
+    genre_rankings.rebuild_in_background()
+
+@app.on_event("startup")
+def start_matview_refresher():
+    """Atualiza periodicamente as views materializadas que dependem das avaliações."""
+    matview_refresher.start()
+
+def on_rating_events(events):
+    """Notas que mudaram (em qualquer worker): descarta as recomendações em cache desses usuários."""
+    for user_id in {event.user_id for event in events}:
+        recommendation_cache.invalidate_user(user_id)
+
+@app.on_event("startup")
+def start_rating_event_watcher():
+    """Passa a acompanhar o log 'rating_events' a partir do fim."""
+    rating_event_watcher.listeners.append(on_rating_events)
+    rating_event_watcher.start()
+
+def build_fulltext_index():
+    """
+    Constrói o índice BM25 a partir do banco e publica a versão nova. Com
+    vários workers, só quem pega o advisory lock constrói; os demais esperam e,
+    se a versão publicada já corresponde à geração atual do catálogo, só a abrem.
+    """
+    global fulltext_index
+    conn = get_db_connection()
+    if not conn:
+        print("[FULLTEXT] Banco indisponível; índice de texto não construído.")
+        return
     try:
-        file_path = "model_machine_learning/recommendation_ml.pkl"
-        _, svd_model = dump.load(file_path)
-        print(f"Modelo SVD '{file_path}' carregado com sucesso!")
+        with conn.cursor(cursor_factory=InstrumentedCursor) as cur:
+            cur.execute("SELECT pg_advisory_lock(%s);", (FULLTEXT_BUILD_LOCK_KEY,), name="fulltext_build_lock")
+            try:
+                try:
+                    cur.execute("SELECT generation FROM catalog_state;", name="catalog_generation")
+                    row = cur.fetchone()
+                    generation = row[0] if row else None
+                except psycopg2.Error:
+                    generation = None  # banco sem a migração 0004: sempre reconstrói
+                conn.rollback()
+                if generation is None or FullTextIndex.published_generation(FULLTEXT_INDEX_DIR) != generation:
+                    start = time.perf_counter()
+                    index = FullTextIndex.build(load_fulltext_documents(conn))
+                    index.save(FULLTEXT_INDEX_DIR, catalog_generation=generation)
+                    print(f"[FULLTEXT] Índice construído: {index.n_docs} documentos, {len(index.vocab)} termos "
+                          f"({time.perf_counter() - start:.1f}s).")
+                fulltext_index = FullTextIndex.load(FULLTEXT_INDEX_DIR)
+            finally:
+                conn.rollback()
+                cur.execute("SELECT pg_advisory_unlock(%s);", (FULLTEXT_BUILD_LOCK_KEY,), name="fulltext_build_unlock")
+                conn.commit()
+    except Exception as e:
+        print(f"[FULLTEXT] Erro ao construir o índice de texto: {e}")
+    finally:
+        release_db_connection(conn)
+
+@app.on_event("startup")
+def load_fulltext_index():
+    """Abre o índice de texto salvo (mmap); se não existir, constrói em segundo plano."""
+    global fulltext_index
+    try:
+        fulltext_index = FullTextIndex.load(FULLTEXT_INDEX_DIR)
+        print(f"[FULLTEXT] Índice '{FULLTEXT_INDEX_DIR}' mapeado: {fulltext_index.n_docs} documentos.")
     except FileNotFoundError:
-        print(f"Arquivo do modelo SVD '{file_path}' não encontrado. As recomendações usarão o fallback.")
-        svd_model = None
+        print(f"[FULLTEXT] Índice '{FULLTEXT_INDEX_DIR}' não encontrado. Construindo em segundo plano.")
+        threading.Thread(target=build_fulltext_index, name="fulltext-build", daemon=True).start()
     except Exception as e:
-        print(f"Erro ao carregar o modelo SVD: {e}")
-        svd_model = None
+        print(f"[FULLTEXT] Erro ao abrir o índice de texto: {e}")
+
+def on_catalog_change():
+    """Chamado quando o populate_db.py termina uma ingestão."""
+    response_cache.clear()
+    document_cache.clear()
+    title_index_refresher.refresh_in_background()
+    genre_rankings.rebuild_in_background()
+    threading.Thread(target=build_fulltext_index, name="fulltext-build", daemon=True).start()
+
+@app.on_event("startup")
+def start_catalog_generation_watcher():
+    """Passa a acompanhar a geração do catálogo (invalidação dos caches após a ingestão)."""
+    catalog_generation.listeners.append(on_catalog_change)
+    catalog_generation.start()
+
+@app.on_event("startup")
+def load_svd_model():
+    """Carrega o modelo SVD mais recente e passa a observar o diretório por versões novas."""
+    model_registry.poll()
+    if model_registry.active is None:
+        print("Nenhum modelo SVD disponível. As recomendações usarão o fallback.")
+    model_registry.start()
+
+# -----------------
+# Cache HTTP (registrado antes do CORS para que o CORS fique por fora
+# e também adicione seus cabeçalhos às respostas servidas do cache)
+# -----------------
+app.add_middleware(
+    ResponseCacheMiddleware,
+    cache=response_cache,
+    generation=catalog_generation,
+    paths=CACHEABLE_PATHS,
+    max_age=int(os.getenv("HTTP_CACHE_MAX_AGE", "60")),
+)
 
 # -----------------
 # Configuração do CORS
@@ -201,66 +396,80 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Métricas por último: é o middleware mais externo e mede também o cache HTTP e o CORS
+app.add_middleware(MetricsMiddleware)
+
 # -----------------
 # Endpoints de Autenticação
 # -----------------
-@app.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(user: UserCreate):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+def password_hasher_busy():
+    """Fila do bcrypt cheia: recusa rápido em vez de segurar a requisição."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado, tente novamente em instantes.",
+        headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER)},
+    )
 
+@app.post("/register", status_code=status.HTTP_201_CREATED)
+async def register_user(user: UserCreate):
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+        try:
+            exists = await timed(conn, "register_check_username").fetchval(
+                "SELECT 1 FROM users WHERE username = $1;", user.username
+            )
+        except asyncpg.PostgresError as e:
+            raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
+    if exists:
+        raise HTTPException(status_code=400, detail="Usuário já registrado.")
+
+    # O hash roda no pool dedicado do bcrypt, sem segurar conexão, event loop nem threadpool
     try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM users WHERE username = %s;", (user.username,))
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Usuário já registrado.")
-        
-        hashed_password = hash_password(user.password)
-        insert_query = "INSERT INTO users (username, hashed_password) VALUES (%s, %s);"
-        cursor.execute(insert_query, (user.username, hashed_password))
-        conn.commit()
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
 
-    except psycopg2.Error as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if conn:
-            conn.close()
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+        try:
+            await timed(conn, "register_insert_user").execute(
+                "INSERT INTO users (username, hashed_password) VALUES ($1, $2);",
+                user.username, hashed_password,
+            )
+        except asyncpg.UniqueViolationError:
+            # Outro registro com o mesmo nome entrou enquanto o hash era calculado
+            raise HTTPException(status_code=400, detail="Usuário já registrado.")
+        except asyncpg.PostgresError as e:
+            raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
 
     return {"message": "Usuário registrado com sucesso!"}
 
 @app.post("/login", status_code=status.HTTP_200_OK)
-def login_user(user: UserLogin):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
-
-    try:
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT user_id, hashed_password FROM users WHERE username = %s;", (user.username,))
-        result = cursor.fetchone()
+async def login_user(user: UserLogin):
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
-        if not result:
-            raise HTTPException(status_code=401, detail="Usuário ou senha incorretos.")
-
-        user_id_db, hashed_password_db = result
+        try:
+            result = await timed(conn, "login_fetch_user").fetchrow(
+                "SELECT user_id, hashed_password FROM users WHERE username = $1;", user.username
+            )
+        except asyncpg.PostgresError as e:
+            raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
 
-        if not verify_password(user.password, hashed_password_db):
-            raise HTTPException(status_code=401, detail="Usuário ou senha incorretos.")
+    if not result:
+        raise HTTPException(status_code=401, detail="Usuário ou senha incorretos.")
 
-    except psycopg2.Error as e:
-        raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if conn:
-            conn.close()
+    try:
+        password_ok = await password_hasher.verify(user.password, result["hashed_password"])
+    except PasswordHasherBusy:
+        raise password_hasher_busy()
+    if not password_ok:
+        raise HTTPException(status_code=401, detail="Usuário ou senha incorretos.")
 
-    return {"message": "Login bem-sucedido!", "user_id": user_id_db}
+    return {"message": "Login bem-sucedido!", "user_id": result["user_id"]}
 
 # -----------------
 # Endpoints de Recomendação e Detalhes
@@ -269,30 +478,47 @@ def login_user(user: UserLogin):
 def read_root():
     return {"Hello": "Welcome to the Anime API"}
     
+def parse_cursor(cursor, kind, types):
+    """Decodifica o cursor de paginação recebido na query string (400 se inválido)."""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, kind, types)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=f"Cursor inválido: {e}")
+
 @app.get("/animes/top")
-def get_top_animes(limit: int = 20): # NOVO: Adiciona o parâmetro de limite
+def get_top_animes(limit: int = 20, cursor: Optional[str] = None):
+    """
+    Animes com melhor score, paginados por cursor (keyset em (score, mal_id)):
+    páginas profundas custam o mesmo que a primeira.
+    """
+    limit = clamp_limit(limit)
+    after = parse_cursor(cursor, "top", (float, int))
+
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
     try:
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        cursor.execute("""
-            SELECT mal_id, title, image_url
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
+        keyset = "AND (score, mal_id) < (%s, %s)" if after else ""
+        cur.execute(f"""
+            SELECT mal_id, title, image_url, score
             FROM animes
-            WHERE score IS NOT NULL
-            ORDER BY score DESC
+            WHERE score IS NOT NULL {keyset}
+            ORDER BY score DESC, mal_id DESC
             LIMIT %s;
-        """, (limit,)) # NOVO: Usa a variável 'limit'
-        animes = cursor.fetchall()
-        return [dict(row) for row in animes]
+        """, (*(after or ()), limit + 1), name="top_animes")
+        animes = [dict(row) for row in cur.fetchall()]
+        return make_page(animes, limit, "top", lambda a: (a["score"], a["mal_id"]))
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
     finally:
-        if 'cursor' in locals():
-            cursor.close()
+        if 'cur' in locals():
+            cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 # Rota para obter a lista de todos os gêneros
 @app.get("/animes/genres", response_model=List[Dict])
@@ -305,10 +531,10 @@ def get_all_genres():
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
     try:
-        cursor = conn.cursor(cursor_factory=DictCursor)
+        cursor = conn.cursor(cursor_factory=InstrumentedCursor)
         cursor.execute("""
             SELECT mal_id, name FROM genres ORDER BY name;
-        """)
+        """, name="genres")
         genres = cursor.fetchall()
         return [dict(row) for row in genres]
     except psycopg2.Error as e:
@@ -317,197 +543,364 @@ def get_all_genres():
         if 'cursor' in locals():
             cursor.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 # Rota para obter animes por gênero
-@app.get("/animes/genre/{genre_name}", response_model=List[Dict])
-def get_animes_by_genre(genre_name: str = Path(..., title="Nome do Gênero"), limit: int = 20): # NOVO
+@app.get("/animes/genre/{genre_name}")
+def get_animes_by_genre(genre_name: str = Path(..., title="Nome do Gênero"), limit: int = 20,
+                        cursor: Optional[str] = None):
     """
-    Busca os melhores animes de um gênero específico, ordenados por score.
+    Busca os melhores animes de um gênero específico, ordenados por score e
+    paginados por cursor (keyset em (score, mal_id)).
     """
+    limit = clamp_limit(limit)
+    after = parse_cursor(cursor, "genre", (float, int))
+
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
     try:
-        cursor = conn.cursor(cursor_factory=DictCursor)
-        query = """
-            SELECT a.mal_id, a.title, a.image_url, a.score
-            FROM animes a
-            JOIN animes_genres ag ON a.mal_id = ag.anime_mal_id
-            JOIN genres g ON ag.genre_mal_id = g.mal_id
-            WHERE g.name = %s
-            AND a.score IS NOT NULL
-            ORDER BY a.score DESC
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
+        # Ranking pré-ordenado na view materializada (índice em genre_name, score, mal_id)
+        keyset = "AND (score, mal_id) < (%s, %s)" if after else ""
+        query = f"""
+            SELECT mal_id, title, image_url, score
+            FROM genre_anime_rankings
+            WHERE genre_name = %s {keyset}
+            ORDER BY score DESC, mal_id DESC
             LIMIT %s;
         """
-        cursor.execute(query, (genre_name, limit)) # NOVO: Passa o limite para a query
-        animes = cursor.fetchall()
-        return [dict(row) for row in animes]
+        cur.execute(query, (genre_name, *(after or ()), limit + 1), name="animes_by_genre")
+        animes = [dict(row) for row in cur.fetchall()]
+        return make_page(animes, limit, "genre", lambda a: (a["score"], a["mal_id"]))
     except psycopg2.Error as e:
         raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
     finally:
-        if 'cursor' in locals():
-            cursor.close()
+        if 'cur' in locals():
+            cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
+
+# Segundos sugeridos ao cliente quando o cursor exige o índice que este worker ainda constrói
+SEARCH_INDEX_RETRY_AFTER = 5
 
 @app.get("/animes/search")
-def search_animes(q: str = Query(..., min_length=1), limit: int = 25):
+def search_animes(q: str = Query(..., min_length=1), limit: int = 25, cursor: Optional[str] = None):
+    """
+    Busca por título, paginada por cursor. Com o índice em memória a ordem é por
+    relevância; no fallback SQL, por (score, mal_id). O cursor guarda qual das
+    duas ordens gerou a página, para que a paginação continue na mesma.
+    """
+    limit = clamp_limit(limit)
+    sql_after = None
+    if cursor is not None:
+        try:
+            after = decode_cursor(cursor, "search", (float, float, int, int))
+        except InvalidCursor:
+            sql_after = parse_cursor(cursor, "search-sql", (float, int))
+        else:
+            # Cursor do índice em memória vindo de um worker que já tinha o índice:
+            # neste ainda não há índice, e uma página vazia encerraria a paginação
+            if not title_index.ready:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Índice de busca ainda não está disponível neste servidor.",
+                    headers={"Retry-After": str(SEARCH_INDEX_RETRY_AFTER)},
+                )
+            items, next_key = title_index.search_page(q, limit, after)
+            return {"items": items, "next_cursor": next_key and encode_cursor("search", next_key)}
+
+    # Caminho em memória; o SQL abaixo só roda enquanto o índice ainda não foi construído
+    if title_index.ready and sql_after is None:
+        items, next_key = title_index.search_page(q, limit)
+        return {"items": items, "next_cursor": next_key and encode_cursor("search", next_key)}
+
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
     try:
-        cursor = conn.cursor(cursor_factory=DictCursor)
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
         search_query = f"%{q.lower()}%"
-        cursor.execute("""
-            SELECT mal_id, title, image_url
+        keyset = "AND (COALESCE(score, 0), mal_id) < (%s, %s)" if sql_after else ""
+        cur.execute(f"""
+            SELECT mal_id, title, image_url, COALESCE(score, 0) AS score
             FROM animes
-            WHERE LOWER(title) LIKE %s
-            ORDER BY COALESCE(score, 0) DESC
+            WHERE LOWER(title) LIKE %s {keyset}
+            ORDER BY COALESCE(score, 0) DESC, mal_id DESC
             LIMIT %s;
-        """, (search_query, limit))
-        animes = cursor.fetchall()
-        return [dict(row) for row in animes]
+        """, (search_query, *(sql_after or ()), limit + 1), name="search_sql")
+        animes = [dict(row) for row in cur.fetchall()]
+        page = make_page(animes, limit, "search-sql", lambda a: (a["score"], a["mal_id"]))
+        for anime in page["items"]:
+            del anime["score"]
+        return page
     finally:
-        if 'cursor' in locals(): cursor.close()
-        if conn: conn.close()
+        if 'cur' in locals(): cur.close()
+        if conn: release_db_connection(conn)
 
 @app.get("/animes/autocomplete")
 def autocomplete_animes(q: str = Query(..., min_length=2)):
+    if autocomplete_service.ready:
+        results = autocomplete_service.lookup(q, 5)
+        # Completa com casamentos no meio do título / fuzzy se a trie não encheu os 5
+        if len(results) < 5 and title_index.ready:
+            seen = {r['mal_id'] for r in results}
+            for extra in title_index.search(q, 5, require_score=True):
+                if extra['mal_id'] not in seen:
+                    results.append(extra)
+                    if len(results) >= 5:
+                        break
+        return results
+
+    if title_index.ready:
+        return title_index.search(q, 5, require_score=True)
+
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
     try:
-        cursor = conn.cursor(cursor_factory=DictCursor)
+        cursor = conn.cursor(cursor_factory=InstrumentedCursor)
         cursor.execute("""
             SELECT mal_id, title, image_url
             FROM animes
             WHERE LOWER(title) LIKE LOWER(%s) AND score IS NOT NULL
             ORDER BY score DESC, rank ASC
             LIMIT 5;
-        """, (f"%{q}%",))
+        """, (f"%{q}%",), name="autocomplete_sql")
         results = cursor.fetchall()
         return [dict(row) for row in results]
     finally:
         if 'cursor' in locals(): cursor.close()
-        if conn: conn.close()
+        if conn: release_db_connection(conn)
+
+# Colunas exibidas por tipo de documento do índice de texto
+FULLTEXT_DETAIL_QUERIES = {
+    "anime": "SELECT mal_id, title AS name, image_url, synopsis AS text FROM animes WHERE mal_id = ANY(%s);",
+    "character": "SELECT mal_id, name, image_url, about AS text FROM characters WHERE mal_id = ANY(%s);",
+    "voice_actor": "SELECT mal_id, name, image_url, about AS text FROM voice_actors WHERE mal_id = ANY(%s);",
+}
+
+@app.get("/search/fulltext")
+def search_fulltext(q: str = Query(..., min_length=2), types: Optional[str] = None, limit: int = Query(20, ge=1, le=100)):
+    """
+    Busca textual (BM25) em sinopses de animes e biografias de personagens/dubladores.
+    'types' filtra por tipo, ex: ?types=anime,character
+    """
+    if fulltext_index is None:
+        raise HTTPException(status_code=503, detail="Índice de texto ainda não está disponível.")
+
+    type_list = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    if type_list and any(t not in DOC_TYPES for t in type_list):
+        raise HTTPException(status_code=400, detail=f"Tipos válidos: {', '.join(DOC_TYPES)}")
+
+    hits, terms = fulltext_index.search(q, limit, type_list)
+    if not hits:
+        return []
+
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+    try:
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
+        # Uma consulta por tipo presente nos resultados (no máximo três)
+        details = {}
+        for doc_type in dict.fromkeys(t for t, _, _ in hits):
+            ids = [mal_id for t, mal_id, _ in hits if t == doc_type]
+            cur.execute(FULLTEXT_DETAIL_QUERIES[doc_type], (ids,), name=f"fulltext_{doc_type}")
+            for row in cur.fetchall():
+                details[(doc_type, row['mal_id'])] = row
+
+        results = []
+        for doc_type, mal_id, score in hits:
+            row = details.get((doc_type, mal_id))
+            if row is None:
+                continue
+            results.append({
+                "type": doc_type,
+                "mal_id": mal_id,
+                "name": row['name'],
+                "image_url": row['image_url'],
+                "score": round(score, 4),
+                "snippet": make_snippet(row['text'], terms),
+            })
+        return results
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
+    finally:
+        release_db_connection(conn)
+
+def build_recommendations(conn, user_id, limit, model):
+    """
+    Gera as recomendações do usuário: pré-calculadas, SVD ao vivo ou fallback por gênero.
+    'model' é o ModelBundle lido uma vez pela requisição (ou None sem modelo).
+    """
+    # Verifica se o modelo existe
+    if model is None:
+        RECOMMENDATION_FALLBACKS.labels("no_model").inc()
+        return get_fallback_recommendations(conn, user_id, limit)
+    svd_scorer = model.scorer
+
+    # Verifica se o modelo CONHECE este usuário (estava no treino de ontem?)
+    # Usuários novos não têm vetor pu, então preferimos a recomendação por gênero.
+    if not svd_scorer.knows_user(user_id):
+        print(f"Usuário {user_id} não conhecido pelo modelo SVD (novo). Usando Fallback.")
+        RECOMMENDATION_FALLBACKS.labels("unknown_user").inc()
+        return get_fallback_recommendations(conn, user_id, limit)
+
+    cur = conn.cursor(cursor_factory=InstrumentedCursor)
+
+    # Caminho rápido: recomendações pré-calculadas pelo job batch para esta versão do modelo.
+    # Uma única busca pela chave primária, descartando o que ele avaliou depois do job.
+    cur.execute("""
+        SELECT a.mal_id, a.title, a.image_url, ur.predicted_rating
+        FROM user_recommendations ur
+        JOIN animes a ON a.mal_id = ur.anime_id
+        WHERE ur.user_id = %s AND ur.model_version = %s
+        AND NOT EXISTS (
+            SELECT 1 FROM ratings r WHERE r.user_id = ur.user_id AND r.anime_id = ur.anime_id
+        )
+        ORDER BY ur.rank
+        LIMIT %s;
+    """, (user_id, model.version, limit), name="recommendations_precomputed")
+    precomputed = [dict(row) for row in cur.fetchall()]
+    if len(precomputed) >= limit:
+        RECOMMENDATIONS_SERVED.labels("precomputed").inc()
+        return precomputed
+
+    # Sem entrada pré-calculada suficiente: pontuação ao vivo
+    # Pega o que ele já assistiu (Tempo Real) para não recomendar de novo
+    cur.execute("SELECT anime_id FROM ratings WHERE user_id = %s;", (user_id,), name="recommendations_rated")
+    rated_anime_ids = {row['anime_id'] for row in cur.fetchall()}
+
+    # Pontua o catálogo inteiro do modelo de uma vez (produto matriz-vetor).
+    # Alguns itens do modelo (Kaggle) podem não existir na tabela 'animes',
+    # então pedimos uma margem e ampliamos se faltar.
+    recommendations = []
+    n_candidates = limit + 20
+    while True:
+        with MODEL_PREDICTION_LATENCY.time():
+            top_items = svd_scorer.top_n(user_id, n_candidates, exclude_ids=rated_anime_ids)
+        if not top_items:
+            break
+
+        cur.execute(
+            "SELECT mal_id, title, image_url FROM animes WHERE mal_id = ANY(%s);",
+            ([anime_id for anime_id, _ in top_items],),
+            name="recommendations_titles"
+        )
+        animes_by_id = {row['mal_id']: row for row in cur.fetchall()}
+
+        recommendations = [
+            {
+                "mal_id": anime_id,
+                "title": animes_by_id[anime_id]['title'],
+                "image_url": animes_by_id[anime_id]['image_url'],
+                "predicted_rating": est
+            }
+            for anime_id, est in top_items
+            if anime_id in animes_by_id
+        ]
+
+        if len(recommendations) >= limit or len(top_items) < n_candidates:
+            break
+        n_candidates *= 4
+
+    # Se não sobrar nada (ex: nenhum item do modelo está no catálogo), usa fallback
+    if not recommendations:
+        RECOMMENDATION_FALLBACKS.labels("no_catalog_items").inc()
+        return get_fallback_recommendations(conn, user_id, limit)
+
+    RECOMMENDATIONS_SERVED.labels("model").inc()
+    return recommendations[:limit]
 
 @app.get("/recommendations/{user_id}")
 def get_recommendations_svd(user_id: int, limit: int = 20):
+    # Calcula sempre a faixa inteira do cache (ex: 20, 50, 100) e corta no final
+    bucket = recommendation_cache.bucket_for(limit)
+    # A mesma versão do modelo do começo ao fim, mesmo que uma troca aconteça no meio
+    model = model_registry.active
+    model_version = model.version if model else None
+    cached = recommendation_cache.get_for_user(user_id, bucket, model_version)
+    if cached is not None:
+        RECOMMENDATIONS_SERVED.labels("cache").inc()
+        return cached[:limit]
+
+    # Lida antes do cálculo: se o usuário avaliar algo no meio, o resultado não vai para o cache
+    generation = recommendation_cache.generation_for(user_id)
+    # Avaliações do usuário ainda na fila write-behind precisam estar no banco antes do cálculo
+    write_queue.flush_user_blocking(user_id)
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
     try:
-        # Verifica se o modelo existe
-        if svd_model is None:
-            return get_fallback_recommendations(conn, user_id, limit)
-
-        # Verifica se o modelo CONHECE este usuário (estava no treino de ontem?)
-        # O surprise converte IDs para strings internamente em alguns casos, 
-        # mas o método knows_user espera o "Raw ID" (o ID do seu banco)
-        try:
-            # Tenta verificar se o usuário existe no treino interno do SVD
-            # Nota: Nem sempre o objeto trainset é salvo com o dump. 
-            # Se der erro, assumimos que o usuário é desconhecido ou o modelo não suporta essa verificação.
-            if not svd_model.trainset.knows_user(str(user_id)) and not svd_model.trainset.knows_user(user_id):
-                print(f"Usuário {user_id} não conhecido pelo modelo SVD (novo). Usando Fallback.")
-                return get_fallback_recommendations(conn, user_id, limit)
-        except AttributeError:
-            # Se o modelo foi salvo sem o trainset, seguimos tentando prever.
-            # O SVD padrão retorna a média global se não conhecer o usuário,
-            # mas nós preferimos recomendação por gênero, então vamos forçar o fallback
-            # se a predição for apenas a média global ("was_impossible" no surprise).
-            pass
-
-        cur = conn.cursor(cursor_factory=DictCursor)
-
-        # Pega o que ele já assistiu (Tempo Real) para não recomendar de novo
-        cur.execute("SELECT anime_id FROM ratings WHERE user_id = %s;", (user_id,))
-        rated_anime_ids = {row['anime_id'] for row in cur.fetchall()}
-
-        # Pega lista de candidatos (Idealmente, não pegue TODOS os animes se tiver milhões)
-        # Otimização: Pegar apenas Top 500 ou 1000 animes populares para prever,
-        # ao invés da base inteira, para ser rápido.
-        cur.execute("SELECT mal_id, title, image_url FROM animes WHERE score > 6.0 ORDER BY score DESC LIMIT 1000;") 
-        candidate_animes = cur.fetchall()
-
-        recommendations = []
-        
-        for anime in candidate_animes:
-            anime_id = anime['mal_id']
-            if anime_id not in rated_anime_ids:
-                # Faz a predição
-                # O SVD do Surprise espera strings se foi treinado com strings, ou int com int.
-                # Geralmente converte-se para string para garantir.
-                prediction = svd_model.predict(str(user_id), str(anime_id))
-                
-                # Se o modelo disse que a predição foi impossível (usuário desconhecido),
-                # ele retorna a média global. Podemos filtrar isso se quisermos ser estritos.
-                if prediction.details.get('was_impossible'):
-                     continue
-
-                recommendations.append({
-                    "mal_id": anime_id,
-                    "title": anime['title'],
-                    "image_url": anime['image_url'],
-                    "predicted_rating": prediction.est
-                })
-
-        # Se após a filtragem do SVD não sobrar nada (ex: usuário 100% novo e caiu no was_impossible), usa fallback
-        if not recommendations:
-             return get_fallback_recommendations(conn, user_id, limit)
-
-        recommendations.sort(key=lambda x: x['predicted_rating'], reverse=True)
+        recommendations = build_recommendations(conn, user_id, bucket, model)
+        recommendation_cache.set_for_user(user_id, bucket, model_version, recommendations, generation)
         return recommendations[:limit]
 
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Erro na geração de recomendações: {error}")
         # Em caso de erro grave, tenta pelo menos o fallback simples
         try:
+            conn.rollback()
+            RECOMMENDATION_FALLBACKS.labels("error").inc()
             return get_fallback_recommendations(conn, user_id, limit)
         except:
             raise HTTPException(status_code=500, detail="Ocorreu um erro ao gerar as recomendações.")
     finally:
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
 class Rating(BaseModel):
     user_id: int
     anime_id: int
     rating: int
 
-@app.post("/rate-anime")
-async def rate_anime(rating_data: Rating):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
-
-    # Use o cursor com DictCursor para maior compatibilidade
-    cursor = conn.cursor(cursor_factory=DictCursor)
-    
+async def submit_write(user_id, anime_id, **fields):
+    """Enfileira a mutação na fila write-behind (no modo sync, espera o flush e traduz o erro)."""
     try:
-        # 1. Insere ou atualiza a nota na tabela 'ratings'
-        rating_query = "INSERT INTO ratings (user_id, anime_id, rating) VALUES (%s, %s, %s) ON CONFLICT (user_id, anime_id) DO UPDATE SET rating = EXCLUDED.rating"
-        cursor.execute(rating_query, (rating_data.user_id, rating_data.anime_id, rating_data.rating))
-        
-        # 2. Insere ou atualiza o anime na tabela 'anime_user' com status 'completed'
-        anime_user_query = "INSERT INTO anime_user (user_id, anime_id, status) VALUES (%s, %s, 'watching') ON CONFLICT (user_id, anime_id) DO UPDATE SET status = EXCLUDED.status"
-        cursor.execute(anime_user_query, (rating_data.user_id, rating_data.anime_id)) # Removendo 'completed'
-        
-        conn.commit()
-        
+        await write_queue.submit(user_id, anime_id, **fields)
+    except WriteBehindFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Muitas escritas pendentes, tente novamente em instantes.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except ConnectionError:
+        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
     except Exception as e:
-        conn.rollback()
-        print(f"Erro na transação de avaliação: {e}")
         raise HTTPException(status_code=400, detail=f"Erro ao processar a requisição: {e}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if conn:
-            conn.close()
-    
+
+@app.post("/rate-anime")
+async def rate_anime(rating_data: Rating):
+    if write_queue.enabled:
+        await submit_write(rating_data.user_id, rating_data.anime_id, rating=rating_data.rating, status="watching")
+        recommendation_cache.invalidate_user(rating_data.user_id)
+        return {"message": "Avaliação e status da lista salvos com sucesso!"}
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        try:
+            async with conn.transaction():
+                # 1. Insere ou atualiza a nota na tabela 'ratings' (e registra o evento)
+                await timed(conn, "rate_upsert_rating").execute(
+                    UPSERT_RATING_SQL, rating_data.user_id, rating_data.anime_id, rating_data.rating
+                )
+
+                # 2. Insere ou atualiza o anime na tabela 'anime_user' com status 'watching'
+                await timed(conn, "rate_upsert_list").execute(
+                    "INSERT INTO anime_user (user_id, anime_id, status) VALUES ($1, $2, 'watching') "
+                    "ON CONFLICT (user_id, anime_id) DO UPDATE SET status = EXCLUDED.status",
+                    rating_data.user_id, rating_data.anime_id,
+                )
+        except Exception as e:
+            print(f"Erro na transação de avaliação: {e}")
+            raise HTTPException(status_code=400, detail=f"Erro ao processar a requisição: {e}")
+
+    recommendation_cache.invalidate_user(rating_data.user_id)
     return {"message": "Avaliação e status da lista salvos com sucesso!"}
 
 @app.delete("/remove-rating/{user_id}/{anime_id}")
@@ -516,31 +909,22 @@ async def remove_rating(user_id: int, anime_id: int):
     Remove a nota de um anime para um usuário específico.
     A operação DELETE não afeta o status do anime na tabela 'anime_user'.
     """
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
-    
-    cursor = conn.cursor()
-    
-    try:
-        # Executa o comando SQL para deletar a nota
-        query = "DELETE FROM ratings WHERE user_id = %s AND anime_id = %s;"
-        cursor.execute(query, (user_id, anime_id))
-        
-        # Confirma a exclusão no banco de dados
-        conn.commit()
-        
-    except (Exception, psycopg2.DatabaseError) as error:
-        conn.rollback()
-        print(f"Erro ao remover a nota: {error}")
-        raise HTTPException(status_code=500, detail=f"Ocorreu um erro ao remover a nota: {error}")
-    
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if conn:
-            conn.close()
+    if write_queue.enabled:
+        await submit_write(user_id, anime_id, rating=DELETED)
+        recommendation_cache.invalidate_user(user_id)
+        return {"message": "Nota removida com sucesso."}
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        try:
+            await timed(conn, "remove_rating").execute(DELETE_RATING_SQL, user_id, anime_id)
+        except Exception as error:
+            print(f"Erro ao remover a nota: {error}")
+            raise HTTPException(status_code=500, detail=f"Ocorreu um erro ao remover a nota: {error}")
 
+    recommendation_cache.invalidate_user(user_id)
     return {"message": "Nota removida com sucesso."}
 
 class AnimeStatus(BaseModel):
@@ -551,271 +935,310 @@ class AnimeStatus(BaseModel):
 # Endpoint para verificar o status do anime na lista do usuário
 @app.get("/user-list-status/{user_id}/{anime_id}")
 async def get_user_list_status(user_id: int, anime_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    query = "SELECT EXISTS(SELECT 1 FROM anime_user WHERE user_id = %s AND anime_id = %s)"
-    cursor.execute(query, (user_id, anime_id))
-    is_in_list = cursor.fetchone()[0]
-    
-    conn.close()
-    
+    pending = write_queue.pending(user_id, anime_id)
+    if pending is not None and pending.status is not None:
+        return {"is_in_list": pending.status is not DELETED}
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        is_in_list = await timed(conn, "user_list_status").fetchval(
+            "SELECT EXISTS(SELECT 1 FROM anime_user WHERE user_id = $1 AND anime_id = $2)",
+            user_id, anime_id,
+        )
+
     return {"is_in_list": is_in_list}
 
 # Endpoint para adicionar o anime à lista
 @app.post("/add-to-list")
 async def add_to_list(anime_status: AnimeStatus):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        query = "INSERT INTO anime_user (user_id, anime_id, status) VALUES (%s, %s, %s)"
-        cursor.execute(query, (anime_status.user_id, anime_status.anime_id, anime_status.status))
-        conn.commit()
-        
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
-    
+    if write_queue.enabled:
+        # Na fila a inserção vira upsert: adicionar de novo só atualiza o status
+        await submit_write(anime_status.user_id, anime_status.anime_id, status=anime_status.status)
+        recommendation_cache.invalidate_user(anime_status.user_id)
+        return {"message": "Anime adicionado à lista com sucesso!"}
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        try:
+            await timed(conn, "add_to_list").execute(
+                "INSERT INTO anime_user (user_id, anime_id, status) VALUES ($1, $2, $3)",
+                anime_status.user_id, anime_status.anime_id, anime_status.status,
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    recommendation_cache.invalidate_user(anime_status.user_id)
     return {"message": "Anime adicionado à lista com sucesso!"}
 
 # Endpoint para remover o anime da lista
 @app.delete("/remove-from-list/{user_id}/{anime_id}")
 async def remove_from_list(user_id: int, anime_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        query = "DELETE FROM anime_user WHERE user_id = %s AND anime_id = %s"
-        cursor.execute(query, (user_id, anime_id))
+    if write_queue.enabled:
+        await submit_write(user_id, anime_id, rating=DELETED, status=DELETED)
+        recommendation_cache.invalidate_user(user_id)
+        return {"message": "Anime removido da lista com sucesso."}
 
-        query = "DELETE FROM ratings WHERE user_id = %s AND anime_id = %s"
-        cursor.execute(query, (user_id, anime_id))
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
-        conn.commit()
-        
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
-    
+        try:
+            async with conn.transaction():
+                await timed(conn, "remove_from_list").execute(
+                    "DELETE FROM anime_user WHERE user_id = $1 AND anime_id = $2", user_id, anime_id
+                )
+                await timed(conn, "remove_from_list_rating").execute(DELETE_RATING_SQL, user_id, anime_id)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    recommendation_cache.invalidate_user(user_id)
     return {"message": "Anime removido da lista com sucesso."}
 
 @app.get("/user-rating/{user_id}/{anime_id}")
 async def get_user_rating(user_id: int, anime_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    pending = write_queue.pending(user_id, anime_id)
+    if pending is not None and pending.rating is not None:
+        return {"rating": 0 if pending.rating is DELETED else pending.rating}
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        try:
+            # Busca a avaliação na tabela 'ratings'
+            rating = await timed(conn, "user_rating").fetchval(
+                "SELECT rating FROM ratings WHERE user_id = $1 AND anime_id = $2",
+                user_id, anime_id,
+            )
+        except Exception as e:
+            print(f"Erro ao buscar avaliação do usuário: {e}")
+            raise HTTPException(status_code=500, detail="Internal Server Error")
+
+    # Sem avaliação registrada, retorna 0
+    return {"rating": rating if rating is not None else 0}
+
+def parse_id_list(raw, name):
+    """'1,2,3' -> [1, 2, 3], sem repetições e na ordem pedida (400 se houver algo que não é inteiro)."""
+    if not raw:
+        return []
     try:
-        # Busca a avaliação na tabela 'ratings'
-        query = "SELECT rating FROM ratings WHERE user_id = %s AND anime_id = %s"
-        cursor.execute(query, (user_id, anime_id))
-        result = cursor.fetchone()
-        
-        if result:
-            # Se a avaliação for encontrada, retorna a nota
-            return {"rating": result[0]}
-        else:
-            # Se a avaliação não for encontrada, retorna 0 ou um valor indicando que não há nota
-            return {"rating": 0}
+        return list(dict.fromkeys(int(part) for part in raw.split(",") if part.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} deve ser uma lista de inteiros separados por vírgula")
 
-    except Exception as e:
-        print(f"Erro ao buscar avaliação do usuário: {e}")
-        raise HTTPException(status_code=500, detail="Internal Server Error")
-    
-    finally:
-        conn.close()
+# Teto de IDs por chamada do /user-state
+USER_STATE_MAX_IDS = int(os.getenv("USER_STATE_MAX_IDS", "200"))
+
+@app.get("/user-state/{user_id}")
+async def get_user_state(user_id: int, anime_ids: str = Query(..., description="IDs separados por vírgula")):
+    """
+    Estado do usuário (na lista, status e nota) para vários animes de uma vez,
+    em uma única consulta: substitui um par /user-list-status + /user-rating por card.
+    """
+    ids = parse_id_list(anime_ids, "anime_ids")
+    if not ids:
+        return []
+    if len(ids) > USER_STATE_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"No máximo {USER_STATE_MAX_IDS} animes por requisição")
+
+    async with async_connection() as conn:
+        if conn is None:
+            raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
+
+        # Parte dos IDs pedidos: notas sem item na lista (ex: as importadas do
+        # Kaggle, que só existem em 'ratings') também aparecem
+        rows = await timed(conn, "user_state").fetch(
+            """
+            SELECT ids.anime_id, au.user_id IS NOT NULL AS in_list, au.status, r.rating
+            FROM unnest($2::int[]) AS ids(anime_id)
+            LEFT JOIN anime_user au ON au.user_id = $1 AND au.anime_id = ids.anime_id
+            LEFT JOIN ratings r ON r.user_id = $1 AND r.anime_id = ids.anime_id
+            """,
+            user_id, ids,
+        )
+
+    state = {row["anime_id"]: dict(row) for row in rows}
+    # Escritas ainda na fila write-behind por cima do que está no banco
+    for anime_id in ids:
+        pending = write_queue.pending(user_id, anime_id)
+        if pending is None:
+            continue
+        if pending.status is not None:
+            in_list = pending.status is not DELETED
+            state[anime_id]["in_list"] = in_list
+            state[anime_id]["status"] = pending.status if in_list else None
+        if pending.rating is not None:
+            state[anime_id]["rating"] = None if pending.rating is DELETED else pending.rating
+    return [
+        {
+            "anime_id": anime_id,
+            "is_in_list": state[anime_id]["in_list"],
+            "status": state[anime_id]["status"],
+            "rating": state[anime_id]["rating"] or 0,
+        }
+        for anime_id in ids
+    ]
 
 # -----------------
 # Endpoints de Detalhes (Atualizados)
 # -----------------
 
-@app.get("/anime/{mal_id}")
-def get_anime_details(mal_id: int):
+def load_documents(requested):
+    """
+    {tipo: [mal_ids]} -> {tipo: {mal_id: documento}}. Primeiro o cache de
+    documentos; os que faltam saem de uma consulta por tipo, com uma conexão só.
+    """
+    result, missing = {}, {}
+    for kind, ids in requested.items():
+        result[kind], missing_ids = document_cache.get_many(kind, ids)
+        if missing_ids:
+            missing[kind] = missing_ids
+    if not missing:
+        return result
+
     conn = get_db_connection()
     if not conn:
-        raise HTTPException(status_code=500, detail="Database connection failed")
-
+        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
     try:
-        cur = conn.cursor(cursor_factory=DictCursor)
-        
-        # 1. Busca os dados principais do anime, incluindo os novos campos
-        cur.execute("""
-            SELECT 
-                mal_id, title, title_japanese, synopsis, episodes, status, rank, score, 
-                season, year, image_url, trailer_embed_url, type, source, duration, favorites 
-            FROM animes 
-            WHERE mal_id = %s;
-        """, (mal_id,))
-        anime = cur.fetchone()
-        
-        if not anime:
-            raise HTTPException(status_code=404, detail="Anime não encontrado.")
-
-        anime_details = dict(anime)
-
-        # 2. Busca e adiciona os gêneros
-        cur.execute("""
-            SELECT g.name FROM animes_genres ag 
-            JOIN genres g ON ag.genre_mal_id = g.mal_id 
-            WHERE ag.anime_mal_id = %s;
-        """, (mal_id,))
-        anime_details['genres'] = [row['name'] for row in cur.fetchall()]
-
-        # 3. Busca e adiciona os estúdios
-        cur.execute("""
-            SELECT s.name FROM animes_studios ast 
-            JOIN studios s ON ast.studio_mal_id = s.mal_id 
-            WHERE ast.anime_mal_id = %s;
-        """, (mal_id,))
-        anime_details['studios'] = [row['name'] for row in cur.fetchall()]
-
-        # 4. Busca e adiciona os serviços de streaming com URL
-        cur.execute("""
-            SELECT ss.name, ss.url FROM animes_streaming a_s 
-            JOIN streaming_services ss ON a_s.service_id = ss.id 
-            WHERE a_s.anime_mal_id = %s;
-        """, (mal_id,))
-        anime_details['streaming'] = [dict(row) for row in cur.fetchall()]
-
-        # 5. Busca personagens e dubladores (básico)
-        cur.execute("""
-            SELECT 
-                c.mal_id, c.name, c.image_url, 
-                va.mal_id AS va_mal_id, va.name AS va_name, va.image_url AS va_image_url, va.language AS va_language
-            FROM animes_characters ac
-            JOIN characters c ON ac.character_mal_id = c.mal_id
-            LEFT JOIN characters_voice_actors cva ON c.mal_id = cva.character_mal_id
-            LEFT JOIN voice_actors va ON cva.voice_actor_mal_id = va.mal_id
-            WHERE ac.anime_mal_id = %s;
-        """, (mal_id,))
-        
-        characters_raw = cur.fetchall()
-        characters_dict = {}
-        for row in characters_raw:
-            char_id = row['mal_id']
-            if char_id not in characters_dict:
-                characters_dict[char_id] = {
-                    'mal_id': char_id,
-                    'name': row['name'],
-                    'image_url': row['image_url'],
-                    'voice_actors': []
-                }
-            if row['va_mal_id']:
-                characters_dict[char_id]['voice_actors'].append({
-                    'mal_id': row['va_mal_id'],
-                    'name': row['va_name'],
-                    'image_url': row['va_image_url'],
-                    'language': row['va_language']
-                })
-        
-        anime_details['characters'] = list(characters_dict.values())
-        
-        return anime_details
+        with conn.cursor(cursor_factory=InstrumentedCursor) as cur:
+            for kind, ids in missing.items():
+                cur.query_name = f"documents_{kind}"
+                fetched = DOCUMENT_FETCHERS[kind](cur, ids)
+                document_cache.set_many(kind, fetched)
+                result[kind].update(fetched)
+    finally:
+        release_db_connection(conn)
+    return result
 
+@app.get("/anime/{mal_id}")
+def get_anime_details(mal_id: int):
+    try:
+        # Documento completo (gêneros, estúdios, streaming, personagens e dubladores)
+        # montado pelo Postgres numa única consulta
+        anime_details = load_documents({"anime": [mal_id]})["anime"].get(mal_id)
+    except HTTPException:
+        raise
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Erro na consulta SQL para o anime ID {mal_id}: {error}")
         raise HTTPException(status_code=500, detail="Ocorreu um erro ao buscar os detalhes do anime.")
-    finally:
-        if conn:
-            cur.close()
-            conn.close()
 
-@app.get("/character/{mal_id}")
-def get_character_details(mal_id: int):
+    if not anime_details:
+        raise HTTPException(status_code=404, detail="Anime não encontrado.")
+    return anime_details
+
+@app.get("/anime/{mal_id}/similar")
+def get_similar_animes(mal_id: int, limit: int = 10):
+    """
+    Animes parecidos segundo os fatores latentes do SVD (cosseno entre vetores qi).
+    Responde dentro de SIMILAR_BUDGET_MS quando o índice é aproximado (IVF).
+    """
+    model = model_registry.active
+    if model is None:
+        raise HTTPException(status_code=503, detail="Modelo de recomendação indisponível.")
+    index = model.similar_index
+    if mal_id not in index:
+        raise HTTPException(status_code=404, detail="Anime sem avaliações suficientes no modelo.")
+
+    # Margem para itens do modelo que não existem na tabela 'animes'
+    neighbors = index.similar_to(mal_id, limit + 10, budget_ms=SIMILAR_BUDGET_MS)
+    if not neighbors:
+        return []
+
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
-    
     try:
-        cur = conn.cursor(cursor_factory=DictCursor)
-        
-        # 1. Busca todos os dados do personagem de uma vez
-        cur.execute("""
-            SELECT mal_id, name, name_kanji, nicknames, favorites, about, image_url
-            FROM characters
-            WHERE mal_id = %s;
-        """, (mal_id,))
-        character = cur.fetchone()
-        
-        if not character:
-            raise HTTPException(status_code=404, detail="Personagem não encontrado.")
-
-        character_details = dict(character)
-
-        # 2. Busca e adiciona as fotos do personagem
-        cur.execute("""
-            SELECT image_url FROM character_pictures
-            WHERE character_mal_id = %s;
-        """, (mal_id,))
-        character_details['pictures'] = [row['image_url'] for row in cur.fetchall()]
-
-        # 3. Busca e adiciona os dubladores e seus detalhes completos
-        cur.execute("""
-            SELECT 
-                va.mal_id, va.name, va.image_url, va.birthday, va.about, va.language
-            FROM characters_voice_actors cva
-            JOIN voice_actors va ON cva.voice_actor_mal_id = va.mal_id
-            WHERE cva.character_mal_id = %s;
-        """, (mal_id,))
-        
-        voice_actors = [dict(row) for row in cur.fetchall()]
-        character_details['voice_actors'] = voice_actors
-        
-        return character_details
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
+        cur.execute(
+            "SELECT mal_id, title, image_url FROM animes WHERE mal_id = ANY(%s);",
+            ([anime_id for anime_id, _ in neighbors],),
+            name="similar_titles"
+        )
+        animes_by_id = {row['mal_id']: dict(row) for row in cur.fetchall()}
+        similar = []
+        for anime_id, similarity in neighbors:
+            if anime_id in animes_by_id:
+                similar.append({**animes_by_id[anime_id], "similarity": round(similarity, 4)})
+        return similar[:limit]
+    except psycopg2.Error as e:
+        raise HTTPException(status_code=500, detail=f"Erro no banco de dados: {e}")
+    finally:
+        release_db_connection(conn)
 
+@app.get("/character/{mal_id}")
+def get_character_details(mal_id: int):
+    try:
+        # Personagem + fotos + dubladores em uma única consulta
+        character_details = load_documents({"character": [mal_id]})["character"].get(mal_id)
+    except HTTPException:
+        raise
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Erro na consulta SQL para o personagem ID {mal_id}: {error}")
         raise HTTPException(status_code=500, detail="Ocorreu um erro ao buscar os detalhes do personagem.")
-    finally:
-        if conn:
-            cur.close()
-            conn.close()
+
+    if not character_details:
+        raise HTTPException(status_code=404, detail="Personagem não encontrado.")
+    return character_details
 
 @app.get("/voice-actor/{mal_id}")
 def get_voice_actor_details(mal_id: int):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
-    
     try:
-        cur = conn.cursor(cursor_factory=DictCursor)
-        
-        # 1. Busca todos os dados do dublador de uma vez
-        cur.execute("""
-            SELECT mal_id, name, image_url, birthday, about, language
-            FROM voice_actors
-            WHERE mal_id = %s;
-        """, (mal_id,))
-        voice_actor = cur.fetchone()
-        
-        if not voice_actor:
-            raise HTTPException(status_code=404, detail="Dublador não encontrado.")
-
-        voice_actor_details = dict(voice_actor)
-
-        # 2. Busca e adiciona os personagens dublados por ele
-        cur.execute("""
-            SELECT c.mal_id, c.name, c.image_url
-            FROM characters_voice_actors cva
-            JOIN characters c ON cva.character_mal_id = c.mal_id
-            WHERE cva.voice_actor_mal_id = %s;
-        """, (mal_id,))
-        
-        voice_actor_details['characters'] = [dict(row) for row in cur.fetchall()]
-        
-        return voice_actor_details
-
+        # Dublador + personagens dublados por ele em uma única consulta
+        voice_actor_details = load_documents({"voice_actor": [mal_id]})["voice_actor"].get(mal_id)
+    except HTTPException:
+        raise
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Erro na consulta SQL para o dublador ID {mal_id}: {error}")
         raise HTTPException(status_code=500, detail="Ocorreu um erro ao buscar os detalhes do dublador.")
-    finally:
-        if conn:
-            cur.close()
-            conn.close()
+
+    if not voice_actor_details:
+        raise HTTPException(status_code=404, detail="Dublador não encontrado.")
+    return voice_actor_details
+
+# Teto de IDs (somando os três tipos) por chamada do /batch
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "100"))
+
+@app.get("/batch")
+def get_batch(animes: Optional[str] = None, characters: Optional[str] = None, voice_actors: Optional[str] = None):
+    """
+    Vários animes, personagens e dubladores numa chamada só (IDs separados por
+    vírgula em cada parâmetro). IDs repetidos são buscados uma vez e o número de
+    consultas não depende de quantos IDs vierem: no máximo uma por tipo, só para
+    o que não estiver no cache de documentos compartilhado com /anime/{id} etc.
+    """
+    requested = {
+        kind: ids
+        for kind, ids in (
+            ("anime", parse_id_list(animes, "animes")),
+            ("character", parse_id_list(characters, "characters")),
+            ("voice_actor", parse_id_list(voice_actors, "voice_actors")),
+        )
+        if ids
+    }
+    if sum(len(ids) for ids in requested.values()) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"No máximo {BATCH_MAX_IDS} IDs por requisição")
+
+    try:
+        documents = load_documents(requested)
+    except HTTPException:
+        raise
+    except (Exception, psycopg2.DatabaseError) as error:
+        print(f"Erro na consulta em lote: {error}")
+        raise HTTPException(status_code=500, detail="Ocorreu um erro ao buscar os documentos.")
+
+    response = {"animes": [], "characters": [], "voice_actors": [], "not_found": {}}
+    for kind, field in (("anime", "animes"), ("character", "characters"), ("voice_actor", "voice_actors")):
+        found = documents.get(kind, {})
+        for mal_id in requested.get(kind, ()):
+            if mal_id in found:
+                response[field].append(found[mal_id])
+            else:
+                response["not_found"].setdefault(field, []).append(mal_id)
+    return response
 
 @app.get("/character/{mal_id}/animes")
 def get_animes_by_character(mal_id: int):
@@ -827,7 +1250,7 @@ def get_animes_by_character(mal_id: int):
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
     
     try:
-        cur = conn.cursor(cursor_factory=DictCursor)
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
         
         query = """
             SELECT a.mal_id, a.title, a.image_url
@@ -835,7 +1258,7 @@ def get_animes_by_character(mal_id: int):
             JOIN animes_characters ac ON a.mal_id = ac.anime_mal_id
             WHERE ac.character_mal_id = %s;
         """
-        cur.execute(query, (mal_id,))
+        cur.execute(query, (mal_id,), name="animes_by_character")
         animes = cur.fetchall()
         
         return [dict(row) for row in animes]
@@ -846,32 +1269,38 @@ def get_animes_by_character(mal_id: int):
     finally:
         if conn:
             cur.close()
-            conn.close()
+            release_db_connection(conn)
             
 # Seu endpoint corrigido
 @app.get("/my-animes/{user_id}")
-def get_my_animes(user_id: int):
+def get_my_animes(user_id: int, limit: int = 50, cursor: Optional[str] = None):
+    """Lista do usuário em ordem alfabética, paginada por cursor (keyset em (title, mal_id))."""
+    limit = clamp_limit(limit)
+    after = parse_cursor(cursor, "my-animes", (str, int))
+
+    write_queue.flush_user_blocking(user_id)
     conn = get_db_connection()
     if not conn:
         raise HTTPException(status_code=500, detail="Erro de conexão com o banco de dados")
 
     try:
-        cur = conn.cursor(cursor_factory=DictCursor)
+        cur = conn.cursor(cursor_factory=InstrumentedCursor)
         
-        # AQUI ESTÁ A CORREÇÃO:
-        # A consulta agora faz o JOIN com a tabela 'anime_user'
+        # A consulta faz o JOIN com a tabela 'anime_user'
         # e seleciona apenas os animes que o usuário adicionou.
-        cur.execute("""
+        keyset = "AND (a.title, a.mal_id) > (%s, %s)" if after else ""
+        cur.execute(f"""
             SELECT a.mal_id, a.title, a.image_url
             FROM animes a
             JOIN anime_user au ON a.mal_id = au.anime_id
-            WHERE au.user_id = %s
-            ORDER BY a.title ASC;
-        """, (user_id,))
+            WHERE au.user_id = %s {keyset}
+            ORDER BY a.title ASC, a.mal_id ASC
+            LIMIT %s;
+        """, (user_id, *(after or ()), limit + 1), name="my_animes")
         
-        my_animes_list = cur.fetchall()
+        my_animes_list = [dict(row) for row in cur.fetchall()]
         
-        return [dict(row) for row in my_animes_list]
+        return make_page(my_animes_list, limit, "my-animes", lambda a: (a["title"], a["mal_id"]))
 
     except (Exception, psycopg2.DatabaseError) as error:
         print(f"Erro na busca de animes do usuário: {error}")
@@ -879,4 +1308,116 @@ def get_my_animes(user_id: int):
     finally:
         if conn:
             cur.close()
-            conn.close()
\ No newline at end of file
+            release_db_connection(conn)
+
+# -----------------
+# Endpoints de Monitoramento
+# -----------------
+@app.get("/metrics")
+def get_metrics():
+    """Métricas no formato de texto do Prometheus (somando todos os workers, se configurado)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/stats/db-pool")
+def get_db_pool_stats():
+    """Estatísticas do pool de conexões (em uso, aguardando, latência de checkout)."""
+    if database.db_pool is None:
+        raise HTTPException(status_code=503, detail="Pool de conexões indisponível")
+    return database.db_pool.stats()
+
+@app.get("/stats/async-db-pool")
+def get_async_db_pool_stats():
+    """Estatísticas do pool asyncpg usado pelos endpoints assíncronos."""
+    stats = async_pool_stats()
+    if stats is None:
+        raise HTTPException(status_code=503, detail="Pool assíncrono indisponível")
+    return stats
+
+@app.get("/stats/password-hasher")
+def get_password_hasher_stats():
+    """Fila do bcrypt: em andamento, recusados (503), latência do hash e espera na fila."""
+    return password_hasher.stats()
+
+@app.get("/stats/recommendation-cache")
+def get_recommendation_cache_stats():
+    """Acertos, falhas, remoções e uso de memória do cache de recomendações."""
+    return recommendation_cache.stats()
+
+@app.post("/admin/search-index/rebuild", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin_token)])
+def rebuild_search_indexes():
+    """Relê o catálogo e troca o índice de títulos e a trie (chamar após a ingestão)."""
+    title_index_refresher.refresh_in_background()
+    return {"message": "Reconstrução dos índices de busca iniciada."}
+
+@app.post("/admin/fulltext-index/rebuild", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin_token)])
+def rebuild_fulltext_index():
+    """Reconstrói e salva o índice BM25 (chamar após a ingestão)."""
+    threading.Thread(target=build_fulltext_index, name="fulltext-build", daemon=True).start()
+    return {"message": "Reconstrução do índice de texto iniciada."}
+
+@app.get("/stats/document-cache")
+def get_document_cache_stats():
+    """Uso do cache de documentos de detalhe (compartilhado com o /batch)."""
+    return document_cache.stats()
+
+@app.get("/stats/genre-rankings")
+def get_genre_rankings_stats():
+    """Tamanho dos rankings em memória usados pelo fallback de recomendação."""
+    return {"ready": genre_rankings.rankings is not None, "rankings": genre_rankings.status()}
+
+@app.get("/stats/materialized-views")
+def get_materialized_view_stats():
+    """Última atualização das views materializadas feita por este worker."""
+    return matview_refresher.status()
+
+@app.get("/stats/rating-events")
+def get_rating_event_stats():
+    """Posição deste worker no log de notas, última compactação e offset dos consumidores duráveis."""
+    stats = rating_event_watcher.status()
+    conn = get_db_connection()
+    if not conn:
+        return stats
+    try:
+        stats["consumers"] = list_consumers(conn)
+    except psycopg2.Error as e:
+        conn.rollback()
+        stats["consumers_error"] = str(e)
+    finally:
+        release_db_connection(conn)
+    return stats
+
+@app.get("/stats/write-behind")
+def get_write_behind_stats():
+    """Fila write-behind das notas e da lista: pendentes, lotes gravados e escritas descartadas."""
+    return write_queue.stats()
+
+@app.get("/stats/response-cache")
+def get_response_cache_stats():
+    """Uso do cache HTTP dos endpoints de catálogo."""
+    return {**response_cache.stats(), "catalog_generation": catalog_generation.value}
+
+@app.get("/admin/model", dependencies=[Depends(require_admin_token)])
+def get_model_status():
+    """Versão ativa do modelo (e a anterior, para rollback), tempo de carga e memória ocupada."""
+    return model_registry.status()
+
+@app.post("/admin/model/reload", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_admin_token)])
+def reload_model(version: Optional[str] = None):
+    """
+    Carrega em segundo plano a versão pedida (e a fixa) ou, sem 'version',
+    volta a seguir a versão mais nova do diretório.
+    """
+    if version is not None and version not in model_registry.status()["available"]:
+        raise HTTPException(status_code=404, detail=f"Versão '{version}' não encontrada.")
+    threading.Thread(target=model_registry.reload, args=(version,), name="model-reload", daemon=True).start()
+    return {"message": "Carregamento do modelo iniciado.", "version": version or "mais recente"}
+
+@app.post("/admin/model/rollback", dependencies=[Depends(require_admin_token)])
+def rollback_model():
+    """Volta na hora para a versão anterior, que continua carregada em memória."""
+    try:
+        model_registry.rollback()
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.status()
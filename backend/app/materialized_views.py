@@ -0,0 +1,130 @@
+import threading
+import time
+
+import psycopg2
+
+# Views criadas pela migração 0006. O catálogo (rankings por gênero) só muda na
+# ingestão; a afinidade depende das avaliações e é atualizada periodicamente.
+CATALOG_VIEWS = ("genre_anime_rankings",)
+RATING_VIEWS = ("user_genre_affinity",)
+ALL_VIEWS = CATALOG_VIEWS + RATING_VIEWS
+
+# Advisory lock de sessão: com vários workers (e o populate_db.py) só um atualiza por vez
+REFRESH_LOCK_KEY = 724_113_002
+
+
+STALE_VIEWS_SQL = """
+    SELECT v.view_name
+    FROM unnest(%s::text[]) AS v(view_name)
+    LEFT JOIN matview_refresh_log l ON l.view_name = v.view_name
+    WHERE l.refreshed_at IS NULL OR l.refreshed_at < now() - make_interval(secs => %s);
+"""
+LOG_REFRESH_SQL = """
+    INSERT INTO matview_refresh_log (view_name, refreshed_at, duration_ms)
+    VALUES (%s, now(), %s)
+    ON CONFLICT (view_name) DO UPDATE
+    SET refreshed_at = EXCLUDED.refreshed_at, duration_ms = EXCLUDED.duration_ms;
+"""
+
+
+def refresh_materialized_views(conn, views=ALL_VIEWS, wait=True, min_age=None):
+    """
+    REFRESH MATERIALIZED VIEW CONCURRENTLY de cada view (leitores continuam
+    vendo a versão anterior até o fim). Com wait=False, desiste se outro processo
+    já estiver atualizando. Com min_age (segundos), pula as views que alguém
+    atualizou há menos tempo que isso (consultado em 'matview_refresh_log' já
+    com o lock). Retorna {view: segundos} ou None se não atualizou.
+    """
+    timings = {}
+    conn.rollback()
+    with conn.cursor() as cur:
+        if wait:
+            cur.execute("SELECT pg_advisory_lock(%s);", (REFRESH_LOCK_KEY,))
+        else:
+            cur.execute("SELECT pg_try_advisory_lock(%s);", (REFRESH_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
+        try:
+            if min_age is not None:
+                cur.execute(STALE_VIEWS_SQL, (list(views), min_age))
+                stale = {row[0] for row in cur.fetchall()}
+                conn.commit()
+                views = [view for view in views if view in stale]
+            for view in views:
+                start = time.perf_counter()
+                cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
+                timings[view] = time.perf_counter() - start
+                cur.execute(LOG_REFRESH_SQL, (view, timings[view] * 1000))
+                conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (REFRESH_LOCK_KEY,))
+            conn.commit()
+    return timings
+
+
+class MaterializedViewRefresher:
+    """
+    Agendador da API: mantém as views que dependem das avaliações com no máximo
+    'interval' segundos de idade. Cada worker confere com frequência, mas a
+    idade vem de 'matview_refresh_log', então o deployment inteiro faz uma
+    atualização por intervalo. Entre duas atualizações, o fallback vê a
+    afinidade da última rodada (avaliações recentes entram na próxima).
+    """
+
+    # Conferências por intervalo: o atraso máximo além do intervalo é interval / CHECKS_PER_INTERVAL
+    CHECKS_PER_INTERVAL = 4
+
+    def __init__(self, get_connection, release_connection, interval, views=RATING_VIEWS):
+        self.get_connection = get_connection
+        self.release_connection = release_connection
+        self.interval = interval
+        self.views = tuple(views)
+        self.last_refresh = None
+        self.last_timings = {}
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_now(self, views=None, min_age=None):
+        conn = self.get_connection()
+        if not conn:
+            print("[VIEWS] Banco indisponível; views materializadas serão atualizadas depois.")
+            return
+        try:
+            timings = refresh_materialized_views(conn, views or self.views, wait=False, min_age=min_age)
+            if not timings:
+                return  # outro worker (ou a ingestão) está atualizando ou atualizou há pouco
+            self.last_refresh, self.last_timings, self.last_error = time.time(), timings, None
+        except psycopg2.Error as e:
+            self.last_error = str(e)
+            print(f"[VIEWS] Erro ao atualizar as views materializadas: {e}")
+        finally:
+            self.release_connection(conn)
+
+    def refresh_in_background(self, views=None):
+        threading.Thread(target=self.refresh_now, args=(views,), name="matview-refresh-now", daemon=True).start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval / self.CHECKS_PER_INTERVAL):
+            self.refresh_now(min_age=self.interval)
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name="matview-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {
+            "views": list(self.views),
+            "interval_seconds": self.interval,
+            "last_refresh": self.last_refresh,
+            "last_timings_ms": {view: round(s * 1000, 1) for view, s in self.last_timings.items()},
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,197 @@
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from psycopg2.extras import DictCursor
+from starlette.routing import Match
+
+# Com vários workers do uvicorn, cada processo grava suas métricas em arquivos
+# mmap nesse diretório (que deve existir e estar vazio antes de subir a API) e o
+# /metrics de qualquer worker soma todos. Sem a variável, só o processo atual.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+# Rótulo das requisições que não casam com nenhuma rota (evita um rótulo por URL)
+UNMATCHED_ROUTE = "unmatched"
+
+# Latências das rotas e do banco ficam quase todas abaixo de 1s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requisições HTTP por rota e status.", ("method", "route", "status"),
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Latência das requisições HTTP por rota.", ("method", "route"),
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requisições HTTP em andamento.", multiprocess_mode="livesum",
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Tempo de cada cursor.execute, por consulta.", ("query",),
+    buckets=LATENCY_BUCKETS,
+)
+DB_QUERY_ROWS = Counter(
+    "db_query_rows_total", "Linhas retornadas (ou afetadas) por consulta.", ("query",),
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors_total", "Consultas que terminaram em erro.", ("query",),
+)
+
+MODEL_PREDICTION_LATENCY = Histogram(
+    "recommendation_model_prediction_seconds", "Tempo de pontuação do catálogo pelo modelo SVD.",
+    buckets=LATENCY_BUCKETS,
+)
+RECOMMENDATIONS_SERVED = Counter(
+    "recommendations_served_total",
+    "Listas de recomendação servidas por origem (cache, precomputed, model, fallback).", ("source",),
+)
+RECOMMENDATION_FALLBACKS = Counter(
+    "recommendation_fallbacks_total", "Vezes em que o fallback por gênero foi usado, por motivo.", ("reason",),
+)
+
+
+class InstrumentedCursor(DictCursor):
+    """
+    DictCursor que mede cada execute. O rótulo vem do argumento 'name' ou, se
+    omitido, do atributo 'query_name' do cursor; nunca do texto SQL, para que o
+    número de séries continue fixo.
+    """
+
+    query_name = "unnamed"
+
+    def execute(self, query, vars=None, name=None):
+        name = name or self.query_name
+        start = time.perf_counter()
+        try:
+            result = super().execute(query, vars)
+        except Exception:
+            DB_QUERY_ERRORS.labels(name).inc()
+            raise
+        finally:
+            DB_QUERY_LATENCY.labels(name).observe(time.perf_counter() - start)
+        if self.rowcount > 0:
+            DB_QUERY_ROWS.labels(name).inc(self.rowcount)
+        return result
+
+
+class TimedConnection:
+    """
+    Mesmas métricas do InstrumentedCursor para consultas asyncpg:
+    timed(conn, "nome").fetch(...) mede a chamada e conta as linhas com o rótulo dado.
+    """
+
+    __slots__ = ("conn", "name")
+
+    def __init__(self, conn, name):
+        self.conn = conn
+        self.name = name
+
+    async def _observe(self, call, rows_of, query, args):
+        start = time.perf_counter()
+        try:
+            result = await call(query, *args)
+        except Exception:
+            DB_QUERY_ERRORS.labels(self.name).inc()
+            raise
+        finally:
+            DB_QUERY_LATENCY.labels(self.name).observe(time.perf_counter() - start)
+        rows = rows_of(result)
+        if rows > 0:
+            DB_QUERY_ROWS.labels(self.name).inc(rows)
+        return result
+
+    async def execute(self, query, *args):
+        return await self._observe(self.conn.execute, _status_rows, query, args)
+
+    async def fetch(self, query, *args):
+        return await self._observe(self.conn.fetch, len, query, args)
+
+    async def fetchrow(self, query, *args):
+        return await self._observe(self.conn.fetchrow, lambda row: int(row is not None), query, args)
+
+    async def fetchval(self, query, *args):
+        return await self._observe(self.conn.fetchval, lambda value: int(value is not None), query, args)
+
+
+def _status_rows(status):
+    """Linhas afetadas a partir do status do asyncpg (ex: 'INSERT 0 3', 'DELETE 2')."""
+    last = status.rsplit(" ", 1)[-1] if status else ""
+    return int(last) if last.isdigit() else 0
+
+
+def timed(conn, name):
+    return TimedConnection(conn, name)
+
+
+def route_label(scope):
+    """Caminho da rota (ex: /anime/{mal_id}) em vez da URL, para limitar as séries."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # Respostas que não passaram pelo roteador (ex: servidas pelo cache HTTP)
+    app = scope.get("app")
+    for candidate in getattr(app, "routes", ()):
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            return candidate.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI puro (sem o BaseHTTPMiddleware, que custa uma task por
+    requisição): latência e status por rota e requisições em andamento.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            method, route = scope["method"], route_label(scope)
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+
+
+def render_metrics():
+    """(corpo, content-type) no formato de exposição de texto do Prometheus."""
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    """No shutdown do worker: descarta os gauges 'live' dele dos arquivos compartilhados."""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+
+import numpy as np
+from surprise import dump
+
+from .recommender import ARTIFACT_ITEM_VECTORS, ARTIFACT_MANIFEST, SVDScorer, model_version_for
+from .similarity import ItemVectorIndex
+
+MODEL_FILENAME = "recommendation_ml.pkl"
+# O train_model.py grava cada treino em <model_dir>/versions/<AAAAMMDD-HHMMSS>/
+VERSIONS_DIRNAME = "versions"
+# Rótulo do modelo antigo, salvo direto em <model_dir>/recommendation_ml.pkl
+LEGACY_LABEL = "legacy"
+
+
+def _has_artifact(path):
+    return os.path.isfile(os.path.join(path, ARTIFACT_MANIFEST))
+
+
+def _pickle_path(path):
+    return os.path.join(path, MODEL_FILENAME) if os.path.isdir(path) else path
+
+
+def available_models(model_dir):
+    """
+    [(rótulo, caminho)] em ordem crescente; o último é o mais novo. O caminho é
+    o diretório da versão (com o .pkl e/ou o artefato) ou, no modelo antigo, o .pkl.
+    """
+    versions_dir = os.path.join(model_dir, VERSIONS_DIRNAME)
+    found = []
+    if os.path.isdir(versions_dir):
+        for label in sorted(os.listdir(versions_dir)):
+            path = os.path.join(versions_dir, label)
+            # Diretórios temporários (treino em andamento) começam com '.'
+            if not label.startswith(".") and (_has_artifact(path) or os.path.isfile(_pickle_path(path))):
+                found.append((label, path))
+    legacy_path = os.path.join(model_dir, MODEL_FILENAME)
+    if not found and os.path.isfile(legacy_path):
+        found.append((LEGACY_LABEL, legacy_path))
+    return found
+
+
+def latest_model_path(model_dir):
+    """Caminho do .pkl da versão mais nova (usado pelos jobs batch, que precisam do trainset)."""
+    models = available_models(model_dir)
+    return _pickle_path(models[-1][1]) if models else None
+
+
+class ModelBundle:
+    """Um modelo carregado e pronto para uso: scorer + índice de similares + metadados."""
+
+    def __init__(self, label, path, version, scorer, similar_index, load_seconds, storage):
+        self.label = label
+        self.storage = storage
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.version = version
+        self.scorer = scorer
+        self.similar_index = similar_index
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+    def _arrays(self):
+        arrays = [self.scorer.pu, self.scorer.qi, self.scorer._qi, self.scorer.bu, self.scorer.bi, self.scorer._item_base,
+                  self.scorer.user_raw_ids, self.scorer.item_raw_ids, self.similar_index.vectors]
+        if self.similar_index.centroids is not None:
+            arrays += [self.similar_index.centroids, self.similar_index._list_members]
+        # Evita contar duas vezes o mesmo array (ex: vetores do índice = qi)
+        return list({id(a): a for a in arrays}.values())
+
+    @property
+    def memory_bytes(self):
+        """Bytes das matrizes alocadas neste processo (as mapeadas do disco ficam de fora)."""
+        return int(sum(a.nbytes for a in self._arrays() if not isinstance(a, np.memmap)))
+
+    @property
+    def mapped_bytes(self):
+        """Bytes das matrizes mapeadas do artefato, compartilhadas entre os workers pelo SO."""
+        return int(sum(a.nbytes for a in self._arrays() if isinstance(a, np.memmap)))
+
+    def status(self):
+        return {
+            "label": self.label,
+            "version": self.version,
+            "path": self.path,
+            "n_users": len(self.scorer.user_raw_ids),
+            "n_items": self.scorer.n_items,
+            "similar_index": self.similar_index.kind,
+            "loaded_at": self.loaded_at,
+            "load_seconds": round(self.load_seconds, 3),
+            "storage": self.storage,
+            "memory_bytes": self.memory_bytes,
+            "mapped_bytes": self.mapped_bytes,
+        }
+
+
+class ModelRegistry:
+    """
+    Mantém o modelo de recomendação ativo e troca de versão sem reiniciar a API.
+
+    Uma thread observa o diretório de modelos; quando aparece uma versão nova,
+    ela é carregada e aquecida com algumas predições em segundo plano, e só então
+    a referência 'active' é trocada (uma atribuição, atômica para os leitores).
+    A versão anterior fica em 'previous' para rollback. Quem atende uma requisição
+    deve ler 'active' uma vez e usar esse mesmo objeto do começo ao fim.
+    """
+
+    def __init__(self, model_dir, poll_interval=60, exact_threshold=20000, warmup_samples=5, use_mmap=True):
+        self.model_dir = model_dir
+        # Com o artefato .npy disponível, abre com mmap em vez de desserializar o .pkl
+        self.use_mmap = use_mmap
+        self.poll_interval = poll_interval
+        self.exact_threshold = exact_threshold
+        self.warmup_samples = warmup_samples
+        self.active = None
+        self.previous = None
+        # Depois de um rollback ou de uma escolha manual, o observador não troca mais
+        # de versão sozinho até um reload sem versão
+        self.pinned = None
+        self.last_error = None
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self, label, path):
+        start = time.perf_counter()
+        if self.use_mmap and _has_artifact(path):
+            # Milissegundos: só mapeia os .npy; as páginas vêm do cache do SO, divididas entre workers
+            scorer, manifest = SVDScorer.load(path, mmap=True)
+            item_vectors = np.load(os.path.join(path, ARTIFACT_ITEM_VECTORS), mmap_mode="r")
+            similar_index = ItemVectorIndex(item_vectors, scorer.item_raw_ids,
+                                            exact_threshold=self.exact_threshold, normalized=True)
+            version, storage = manifest["model_version"], "mmap"
+        else:
+            pickle_path = _pickle_path(path)
+            _, algo = dump.load(pickle_path)
+            scorer = SVDScorer.from_surprise(algo)
+            # O objeto do Surprise (com o trainset) não é mais necessário depois da extração
+            del algo
+            similar_index = ItemVectorIndex(scorer.qi, scorer.item_raw_ids, exact_threshold=self.exact_threshold)
+            version, storage = model_version_for(pickle_path), "pickle"
+        bundle = ModelBundle(label, path, version, scorer, similar_index, time.perf_counter() - start, storage)
+        self._warmup(bundle)
+        bundle.load_seconds = time.perf_counter() - start
+        return bundle
+
+    def _warmup(self, bundle):
+        """Algumas predições antes da troca, para que a primeira requisição não pague o custo."""
+        for user_id in bundle.scorer.user_raw_ids[:self.warmup_samples]:
+            bundle.scorer.top_n(user_id, 20)
+        for item_id in bundle.scorer.item_raw_ids[:self.warmup_samples].tolist():
+            bundle.similar_index.similar_to(item_id, 10)
+
+    def _activate(self, bundle):
+        self.previous, self.active = self.active, bundle
+        print(f"Modelo '{bundle.label}' (versão {bundle.version}) ativo: {bundle.scorer.n_items} itens, "
+              f"carregado em {bundle.load_seconds:.2f}s, índice de similares {bundle.similar_index.kind}.")
+
+    def _is_current(self, label, path):
+        active = self.active
+        return active is not None and active.label == label and active.mtime == os.path.getmtime(path)
+
+    def poll(self):
+        """Carrega e ativa a versão desejada (fixada ou a mais nova), se ainda não estiver ativa."""
+        available = available_models(self.model_dir)
+        if not available:
+            return
+        models = dict(available)
+        label = self.pinned if self.pinned in models else available[-1][0]
+        path = models[label]
+        if self._is_current(label, path):
+            return
+        with self._load_lock:
+            if self._is_current(label, path):
+                return
+            try:
+                self._activate(self._load(label, path))
+                self.last_error = None
+            except Exception as e:
+                self.last_error = f"{label}: {e}"
+                print(f"Erro ao carregar o modelo '{label}': {e}")
+
+    def reload(self, label=None):
+        """Fixa 'label' (ou volta a seguir a versão mais nova, se None) e carrega."""
+        if label is not None and label not in dict(available_models(self.model_dir)):
+            raise KeyError(label)
+        self.pinned = label
+        self.poll()
+
+    def rollback(self):
+        """Volta para a versão anterior (já carregada) e a fixa."""
+        with self._load_lock:
+            if self.previous is None:
+                raise LookupError("nenhuma versão anterior carregada")
+            self.previous, self.active = self.active, self.previous
+            self.pinned = self.active.label
+        print(f"Rollback: modelo '{self.active.label}' (versão {self.active.version}) ativo novamente.")
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        active, previous = self.active, self.previous
+        return {
+            "active": active.status() if active else None,
+            "previous": previous.status() if previous else None,
+            "pinned": self.pinned,
+            "available": [label for label, _ in available_models(self.model_dir)],
+            "poll_interval_seconds": self.poll_interval,
+            "last_error": self.last_error,
+        }
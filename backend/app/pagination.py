@@ -0,0 +1,51 @@
+import base64
+import json
+import os
+
+# Teto do 'limit' das listagens paginadas: páginas maiores são cortadas nele
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def clamp_limit(limit):
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(kind, key):
+    """Cursor opaco: a chave de ordenação do último item + o tipo de listagem, em base64."""
+    raw = json.dumps({"k": kind, "v": list(key)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, kind, types):
+    """
+    Devolve a chave guardada no cursor, validando o tipo de listagem e o tipo de
+    cada componente ('types', ex.: (float, int) para (score, mal_id)).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        key = data["v"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("cursor malformado")
+    if data.get("k") != kind or not isinstance(key, list) or len(key) != len(types):
+        raise InvalidCursor("cursor de outra listagem")
+    for value, expected in zip(key, types):
+        if isinstance(value, bool) or not isinstance(value, (int, float) if expected is float else expected):
+            raise InvalidCursor("cursor com valores inválidos")
+    return tuple(key)
+
+
+def make_page(rows, limit, kind, key_of):
+    """
+    Monta {'items', 'next_cursor'} a partir de até limit+1 linhas: a linha extra
+    só indica que existe próxima página e não é devolvida.
+    """
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(kind, key_of(items[-1]))
+    return {"items": items, "next_cursor": next_cursor}
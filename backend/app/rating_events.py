@@ -0,0 +1,278 @@
+import threading
+import time
+from collections import namedtuple
+
+import psycopg2
+
+# Escritas com evento no mesmo comando (asyncpg): a nota e o evento entram ou
+# saem juntos, mesmo fora de um bloco de transação explícito
+UPSERT_RATING_SQL = """
+    WITH upserted AS (
+        INSERT INTO ratings (user_id, anime_id, rating) VALUES ($1, $2, $3)
+        ON CONFLICT (user_id, anime_id) DO UPDATE SET rating = EXCLUDED.rating
+        RETURNING user_id, anime_id, rating
+    )
+    INSERT INTO rating_events (user_id, anime_id, rating)
+    SELECT user_id, anime_id, rating FROM upserted
+"""
+# Só gera evento se a nota existia
+DELETE_RATING_SQL = """
+    WITH removed AS (
+        DELETE FROM ratings WHERE user_id = $1 AND anime_id = $2
+        RETURNING user_id, anime_id
+    )
+    INSERT INTO rating_events (user_id, anime_id, rating)
+    SELECT user_id, anime_id, NULL FROM removed
+"""
+
+# Eventos de transações já encerradas: tudo abaixo do xmin do snapshot atual
+# terminou, e qualquer transação futura terá txid maior que ele
+FETCH_EVENTS_SQL = """
+    SELECT event_id, txid, user_id, anime_id, rating, created_at
+    FROM rating_events
+    WHERE (txid, event_id) > (%s, %s)
+      AND txid < txid_snapshot_xmin(txid_current_snapshot())
+    ORDER BY txid, event_id
+    LIMIT %s;
+"""
+HEAD_POSITION_SQL = """
+    SELECT txid, event_id
+    FROM rating_events
+    WHERE txid < txid_snapshot_xmin(txid_current_snapshot())
+    ORDER BY txid DESC, event_id DESC
+    LIMIT 1;
+"""
+MIN_CONSUMER_POSITION_SQL = """
+    SELECT last_txid, last_event_id
+    FROM rating_event_consumers
+    ORDER BY last_txid, last_event_id
+    LIMIT 1;
+"""
+
+# Advisory lock da compactação: com vários workers, só um apaga por vez
+COMPACT_LOCK_KEY = 724_113_003
+
+# Posição anterior a qualquer evento
+START = (0, 0)
+
+RatingEvent = namedtuple("RatingEvent", "event_id txid user_id anime_id rating created_at")
+RatingEvent.__doc__ = "Mudança de nota; rating None = nota removida."
+
+
+def head_position(conn):
+    """Posição do último evento já visível para os consumidores."""
+    with conn.cursor() as cur:
+        cur.execute(HEAD_POSITION_SQL)
+        row = cur.fetchone()
+    conn.commit()
+    return (row[0], row[1]) if row else START
+
+
+class RatingEventConsumer:
+    """
+    Lê o log 'rating_events' a partir de um offset, em ordem de commit.
+
+    Com nome, o offset fica em 'rating_event_consumers' (sobrevive a reinícios
+    e segura a compactação até ser consumido). Sem nome, fica só em memória e
+    começa no fim do log: serve para caches do próprio processo, que nascem
+    vazios e só precisam das mudanças a partir dali.
+
+    poll() avança a posição lida; commit() grava essa posição como processada.
+    Reprocessar um evento é seguro: cada um traz o valor final da nota.
+    """
+
+    def __init__(self, name=None, batch_size=1000):
+        self.name = name
+        self.batch_size = batch_size
+        self.committed = None
+        self.position = None
+
+    @property
+    def durable(self):
+        return self.name is not None
+
+    def open(self, conn):
+        """Carrega (ou registra) o offset do consumidor."""
+        if not self.durable:
+            self.committed = self.position = head_position(conn)
+            return self
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO rating_event_consumers (name) VALUES (%s) ON CONFLICT (name) DO NOTHING;",
+                (self.name,),
+            )
+            cur.execute(
+                "SELECT last_txid, last_event_id FROM rating_event_consumers WHERE name = %s;",
+                (self.name,),
+            )
+            row = cur.fetchone()
+        conn.commit()
+        self.committed = self.position = (row[0], row[1])
+        return self
+
+    def poll(self, conn, limit=None):
+        """Próximos eventos depois da posição lida (lista vazia = em dia com o log)."""
+        with conn.cursor() as cur:
+            cur.execute(FETCH_EVENTS_SQL, (*self.position, limit or self.batch_size))
+            events = [RatingEvent(*row) for row in cur.fetchall()]
+        conn.commit()
+        if events:
+            self.position = (events[-1].txid, events[-1].event_id)
+        return events
+
+    def seek_to_head(self, conn):
+        """Pula para o fim do log (ex: antes de reler a tabela 'ratings' inteira)."""
+        self.position = head_position(conn)
+
+    def commit(self, conn):
+        """Marca como processado tudo até a posição lida."""
+        if self.durable and self.position != self.committed:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "UPDATE rating_event_consumers "
+                    "SET last_txid = %s, last_event_id = %s, updated_at = now() WHERE name = %s;",
+                    (*self.position, self.name),
+                )
+            conn.commit()
+        self.committed = self.position
+
+
+def list_consumers(conn):
+    """Offset e eventos pendentes de cada consumidor durável."""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.name, c.last_event_id, c.updated_at,
+                   (SELECT count(*) FROM rating_events e
+                    WHERE (e.txid, e.event_id) > (c.last_txid, c.last_event_id)) AS lag
+            FROM rating_event_consumers c
+            ORDER BY c.name;
+        """)
+        rows = cur.fetchall()
+    conn.commit()
+    return [{"name": name, "last_event_id": last_event_id,
+             "updated_at": updated_at.isoformat(), "lag": lag}
+            for name, last_event_id, updated_at, lag in rows]
+
+
+def compact_rating_events(conn, keep_seconds):
+    """
+    Apaga os eventos já processados por todos os consumidores duráveis e mais
+    velhos que 'keep_seconds' (folga para os consumidores em memória). Sem
+    consumidores duráveis, só a idade conta. Retorna o número de eventos
+    apagados, ou None se outro processo já estiver compactando.
+    """
+    conn.rollback()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s);", (COMPACT_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
+            cur.execute(MIN_CONSUMER_POSITION_SQL)
+            oldest = cur.fetchone()
+            if oldest is None:
+                cur.execute(
+                    "DELETE FROM rating_events WHERE created_at < now() - make_interval(secs => %s);",
+                    (keep_seconds,),
+                )
+            else:
+                cur.execute(
+                    "DELETE FROM rating_events "
+                    "WHERE created_at < now() - make_interval(secs => %s) AND (txid, event_id) <= (%s, %s);",
+                    (keep_seconds, oldest[0], oldest[1]),
+                )
+            deleted = cur.rowcount
+        conn.commit()
+        return deleted
+    except psycopg2.Error:
+        conn.rollback()
+        raise
+
+
+class RatingEventWatcher:
+    """
+    Acompanha o log de notas na API com um consumidor em memória e entrega cada
+    lote de eventos aos listeners (ex: invalidar o cache de recomendações dos
+    usuários que mudaram, inclusive por escritas feitas em outros workers).
+    A cada 'compact_interval' segundos também compacta o log.
+    """
+
+    def __init__(self, get_connection, release_connection, poll_interval,
+                 compact_interval=3600, keep_seconds=3600, listeners=()):
+        self.get_connection = get_connection
+        self.release_connection = release_connection
+        self.poll_interval = poll_interval
+        self.compact_interval = compact_interval
+        self.keep_seconds = keep_seconds
+        self.listeners = list(listeners)
+        self.consumer = RatingEventConsumer()
+        self.events_seen = 0
+        self.last_compaction = None
+        self.last_compacted = 0
+        self.last_error = None
+        self._warned = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def poll(self):
+        conn = self.get_connection()
+        if not conn:
+            return
+        try:
+            if self.consumer.position is None:
+                self.consumer.open(conn)
+            while True:
+                events = self.consumer.poll(conn)
+                if not events:
+                    break
+                self.events_seen += len(events)
+                for listener in self.listeners:
+                    listener(events)
+                self.consumer.commit(conn)
+            self._maybe_compact(conn)
+            self.last_error = None
+        except psycopg2.Error as e:
+            conn.rollback()
+            self.last_error = str(e)
+            if not self._warned:
+                print(f"[EVENTS] Não foi possível ler o log de notas: {e}")
+                self._warned = True
+        finally:
+            self.release_connection(conn)
+
+    def _maybe_compact(self, conn):
+        if self.compact_interval <= 0:
+            return
+        if self.last_compaction is not None and time.time() - self.last_compaction < self.compact_interval:
+            return
+        deleted = compact_rating_events(conn, self.keep_seconds)
+        self.last_compaction = time.time()
+        if deleted:
+            self.last_compacted = deleted
+            print(f"[EVENTS] Compactação: {deleted} eventos de nota apagados.")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll()
+            self._stop.wait(self.poll_interval)
+
+    def start(self):
+        if self._thread is None and self.poll_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="rating-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        position = self.consumer.position
+        return {
+            "poll_interval_seconds": self.poll_interval,
+            "position": {"txid": position[0], "event_id": position[1]} if position else None,
+            "events_seen": self.events_seen,
+            "compact_interval_seconds": self.compact_interval,
+            "keep_seconds": self.keep_seconds,
+            "last_compaction": self.last_compaction,
+            "last_compacted": self.last_compacted,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,253 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Artefato do modelo exportado pelo train_model.py: matrizes .npy + manifest.json,
+# abertas com np.load(mmap_mode='r') para que todos os workers dividam as mesmas páginas
+ARTIFACT_MANIFEST = "manifest.json"
+ARTIFACT_ARRAYS = ("pu", "qi", "bu", "bi", "user_ids", "item_ids")
+# Fatores de item já normalizados, usados direto pelo índice de similares
+ARTIFACT_ITEM_VECTORS = "item_vectors.npy"
+
+
+def model_version_for(file_path):
+    """Versão do modelo = hash do conteúdo do arquivo (igual na API e nos jobs batch)."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _normalize_raw_id(raw_id):
+    """O Surprise guarda os IDs como vieram do DataFrame (int ou str); usamos int sempre."""
+    try:
+        return int(raw_id)
+    except (TypeError, ValueError):
+        return raw_id
+
+
+def _as_id_array(raw_ids):
+    """IDs como array NumPy; arrays inteiros (ex: mmap do artefato) são usados sem cópia."""
+    if isinstance(raw_ids, np.ndarray) and np.issubdtype(raw_ids.dtype, np.integer):
+        return raw_ids
+    return np.asarray([_normalize_raw_id(r) for r in raw_ids])
+
+
+class _IdLookup:
+    """raw id -> inner id por busca binária, sem um dict com uma entrada por usuário."""
+
+    def __init__(self, ids):
+        self.n = len(ids)
+        if self.n < 2 or bool(np.all(ids[1:] > ids[:-1])):
+            # Já ordenado (caso do artefato exportado): a posição é o próprio inner id
+            self._order = None
+            self._sorted = ids
+        else:
+            self._order = np.argsort(ids, kind="stable")
+            self._sorted = ids[self._order]
+
+    def get(self, raw_id):
+        if not self.n:
+            return None
+        pos = int(np.searchsorted(self._sorted, raw_id))
+        if pos < self.n and self._sorted[pos] == raw_id:
+            return pos if self._order is None else int(self._order[pos])
+        return None
+
+    def __contains__(self, raw_id):
+        return self.get(raw_id) is not None
+
+
+class SVDScorer:
+    """
+    Caminho de predição vetorizado para o SVD do Surprise.
+
+    Em vez de chamar svd_model.predict() item a item, calcula a nota estimada
+    do usuário para o catálogo inteiro com um único produto matriz-vetor:
+
+        est = média_global + bu[u] + bi + qi @ pu[u]
+
+    e escolhe o Top-N com np.argpartition.
+    """
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_raw_ids, item_raw_ids,
+                 rating_scale=(0, 10), biased=True):
+        self.pu = pu
+        self.qi = qi
+        self.bu = bu
+        self.bi = bi
+        self.global_mean = float(global_mean)
+        self.rating_scale = rating_scale
+        self.biased = biased
+
+        # O produto escalar roda no dtype dos fatores, e o NumPy não tem BLAS
+        # para float16 (~20x mais lento que float32). O save() já grava qi em
+        # float32; só artefatos float16 antigos chegam aqui com qi em float16, e
+        # nesse caso ele é convertido uma vez (cópia própria do worker, fora do mmap).
+        self._compute_dtype = np.float32 if np.asarray(qi).dtype == np.float16 else None
+        self._qi = np.asarray(qi, dtype=np.float32) if self._compute_dtype else qi
+
+        # Mapeamentos raw id (ID do banco) <-> inner id (índice nas matrizes)
+        self.user_raw_ids = _as_id_array(user_raw_ids)
+        self.item_raw_ids = _as_id_array(item_raw_ids)
+        self._user_inner = _IdLookup(self.user_raw_ids)
+        self._item_inner = _IdLookup(self.item_raw_ids)
+
+        # Vetor constante (média + viés do item) reaproveitado em toda requisição
+        if biased:
+            self._item_base = self.global_mean + np.asarray(self.bi, dtype=np.float64)
+        else:
+            self._item_base = np.zeros(len(self.item_raw_ids), dtype=np.float64)
+
+    @classmethod
+    def from_surprise(cls, algo):
+        """Extrai pu, qi, bu, bi e a média global de um SVD treinado pelo Surprise."""
+        trainset = algo.trainset
+        user_raw_ids = [trainset.to_raw_uid(i) for i in range(trainset.n_users)]
+        item_raw_ids = [trainset.to_raw_iid(i) for i in range(trainset.n_items)]
+        return cls(
+            algo.pu, algo.qi, algo.bu, algo.bi, trainset.global_mean,
+            user_raw_ids, item_raw_ids,
+            rating_scale=trainset.rating_scale,
+            biased=getattr(algo, "biased", True),
+        )
+
+    def save(self, directory, dtype=np.float32, model_version=None):
+        """
+        Exporta o artefato em 'directory': usuários e itens reordenados por raw id
+        (o lookup vira busca binária sem índice extra), fatores/vieses em 'dtype'
+        e um manifest.json com a média global, escala e a versão do modelo.
+
+        Com float16, só os fatores e vieses dos usuários (a maior matriz) são
+        reduzidos: os dos itens entram em todo produto e ficam em float32, para
+        que a API os use direto do mmap, compartilhados entre os workers.
+        """
+        if not (np.issubdtype(self.user_raw_ids.dtype, np.integer)
+                and np.issubdtype(self.item_raw_ids.dtype, np.integer)):
+            raise ValueError("o artefato só suporta IDs inteiros")
+        os.makedirs(directory, exist_ok=True)
+        users = np.argsort(self.user_raw_ids, kind="stable")
+        items = np.argsort(self.item_raw_ids, kind="stable")
+
+        item_dtype = np.float32 if np.dtype(dtype) == np.float16 else dtype
+        qi = np.asarray(self.qi)[items]
+        norms = np.linalg.norm(qi, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        arrays = {
+            "pu": np.asarray(self.pu)[users].astype(dtype),
+            "qi": qi.astype(item_dtype),
+            "bu": np.asarray(self.bu)[users].astype(dtype),
+            "bi": np.asarray(self.bi)[items].astype(item_dtype),
+            "user_ids": self.user_raw_ids[users].astype(np.int64),
+            "item_ids": self.item_raw_ids[items].astype(np.int64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        np.save(os.path.join(directory, ARTIFACT_ITEM_VECTORS), (qi / norms).astype(item_dtype))
+
+        with open(os.path.join(directory, ARTIFACT_MANIFEST), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": 1,
+                "model_version": model_version,
+                "dtype": np.dtype(dtype).name,
+                "item_dtype": np.dtype(item_dtype).name,
+                "n_users": len(users),
+                "n_items": len(items),
+                "n_factors": int(qi.shape[1]),
+                "global_mean": self.global_mean,
+                "rating_scale": list(self.rating_scale),
+                "biased": bool(self.biased),
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Abre um artefato exportado por save(). Retorna (scorer, manifest)."""
+        with open(os.path.join(directory, ARTIFACT_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in ARTIFACT_ARRAYS}
+        scorer = cls(
+            arrays["pu"], arrays["qi"], arrays["bu"], arrays["bi"], manifest["global_mean"],
+            arrays["user_ids"], arrays["item_ids"],
+            rating_scale=tuple(manifest["rating_scale"]),
+            biased=manifest["biased"],
+        )
+        return scorer, manifest
+
+    def _user_factors(self, inner_ids):
+        pu = self.pu[inner_ids]
+        return pu.astype(self._compute_dtype) if self._compute_dtype else pu
+
+    @property
+    def n_items(self):
+        return len(self.item_raw_ids)
+
+    def knows_user(self, user_id):
+        return _normalize_raw_id(user_id) in self._user_inner
+
+    def score_user(self, user_id):
+        """Notas estimadas (já limitadas à escala) do usuário para todos os itens do modelo."""
+        u = self._user_inner.get(_normalize_raw_id(user_id))
+        # Produto em float32 (ou float64 com o modelo do Surprise); vieses somados em float64
+        est = np.asarray(self._qi @ self._user_factors(u), dtype=np.float64)
+        est += self._item_base
+        if self.biased:
+            est += self.bu[u]
+        lower, upper = self.rating_scale
+        return np.clip(est, lower, upper, out=est)
+
+    def top_n(self, user_id, n, exclude_ids=()):
+        """
+        Retorna [(anime_id, nota_estimada), ...] dos N melhores itens para o usuário,
+        ignorando os IDs em 'exclude_ids' (animes que ele já avaliou).
+        """
+        scores = self.score_user(user_id)
+
+        exclude_inner = [inner for inner in map(self._item_inner.get, exclude_ids) if inner is not None]
+        if exclude_inner:
+            scores[exclude_inner] = -np.inf
+
+        available = len(scores) - len(exclude_inner)
+        n = min(n, available)
+        if n <= 0:
+            return []
+
+        # argpartition é O(n_itens); só os N escolhidos são ordenados de fato
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(zip(self.item_raw_ids[top].tolist(), scores[top].tolist()))
+
+    def top_n_block(self, inner_user_ids, n, rated_inner=None, allowed_items=None):
+        """
+        Top-N para um bloco de usuários (inner ids) de uma só vez, usado pelo job batch.
+
+        'rated_inner' é uma lista (um item por usuário) de inner ids de itens já
+        avaliados; 'allowed_items' é uma máscara booleana dos itens que podem ser
+        recomendados (ex: existem na tabela 'animes').
+        Retorna (anime_ids, notas), ambos com shape (len(bloco), n).
+        """
+        inner_user_ids = np.asarray(inner_user_ids)
+        scores = np.asarray(self._user_factors(inner_user_ids) @ self._qi.T, dtype=np.float64)
+        scores += self._item_base
+        if self.biased:
+            scores += np.asarray(self.bu)[inner_user_ids][:, None]
+        lower, upper = self.rating_scale
+        np.clip(scores, lower, upper, out=scores)
+
+        if allowed_items is not None:
+            scores[:, ~allowed_items] = -np.inf
+        if rated_inner is not None:
+            for row, items in enumerate(rated_inner):
+                if len(items):
+                    scores[row, items] = -np.inf
+
+        n = min(n, scores.shape[1])
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return self.item_raw_ids[top], top_scores
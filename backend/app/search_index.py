@@ -0,0 +1,271 @@
+import bisect
+import threading
+import time
+import unicodedata
+
+from psycopg2.extras import DictCursor
+
+from .database import get_db_connection, release_db_connection
+
+# Qualidade do casamento (maior = melhor); o fuzzy fica sempre abaixo de 1.0
+MATCH_EXACT = 4.0
+MATCH_PREFIX = 3.0
+MATCH_WORD_PREFIX = 2.5
+MATCH_SUBSTRING = 2.0
+
+# Animes sem rank vão para o fim da ordenação
+RANK_MISSING = 2 ** 31 - 1
+
+# Fração mínima dos trigramas da consulta que um título precisa ter para o fuzzy
+FUZZY_THRESHOLD = 0.45
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e com espaços simples (mantém kana/kanji)."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = "".join(ch if ch.isalnum() else " " for ch in text)
+    return " ".join(text.split())
+
+
+def ngrams(text, n):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class _Doc:
+    __slots__ = ("mal_id", "title", "image_url", "score", "rank", "fields", "grams", "source")
+
+    def __init__(self, row):
+        self.mal_id = row["mal_id"]
+        self.title = row["title"]
+        self.image_url = row["image_url"]
+        self.score = row["score"]
+        self.rank = row["rank"]
+        self.fields = [f for f in (normalize(row["title"]), normalize(row["title_japanese"])) if f]
+        # Bordas com espaço para que prefixos/sufixos de palavra também virem trigramas
+        self.grams = set()
+        for field in self.fields:
+            padded = f" {field} "
+            self.grams |= ngrams(padded, 3) | ngrams(padded, 2)
+        # Usado pelo refresh para detectar mudanças
+        self.source = tuple(row[k] for k in ("title", "title_japanese", "image_url", "score", "rank"))
+
+    def sort_key(self):
+        # mal_id no fim deixa a ordem total (necessário para paginar por cursor)
+        return (-(self.score or 0), self.rank if self.rank is not None else RANK_MISSING, self.mal_id)
+
+
+class TrigramIndex:
+    """
+    Índice invertido de trigramas (e bigramas) sobre 'title' e 'title_japanese',
+    mantido em memória para responder /animes/search e /animes/autocomplete
+    sem o LIKE '%q%' (que não usa índice B-tree) no Postgres.
+    """
+
+    def __init__(self):
+        self._docs = {}       # mal_id -> _Doc
+        self._postings = {}   # n-grama -> set(mal_id)
+        self._lock = threading.RLock()
+        self.ready = False
+        self.last_refresh = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def upsert(self, row):
+        """Insere ou reindexa um anime (só os n-gramas dele são tocados)."""
+        doc = _Doc(row)
+        with self._lock:
+            old = self._docs.get(doc.mal_id)
+            if old is not None:
+                if old.source == doc.source:
+                    return False
+                self._unindex(old)
+            self._docs[doc.mal_id] = doc
+            for gram in doc.grams:
+                self._postings.setdefault(gram, set()).add(doc.mal_id)
+        return True
+
+    def remove(self, mal_id):
+        with self._lock:
+            doc = self._docs.pop(mal_id, None)
+            if doc is not None:
+                self._unindex(doc)
+
+    def _unindex(self, doc):
+        for gram in doc.grams:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(doc.mal_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def refresh(self, rows):
+        """Sincroniza com as linhas atuais da tabela 'animes'; retorna quantos docs mudaram."""
+        changed = 0
+        seen = set()
+        for row in rows:
+            seen.add(row["mal_id"])
+            if self.upsert(row):
+                changed += 1
+        with self._lock:
+            for mal_id in [m for m in self._docs if m not in seen]:
+                self.remove(mal_id)
+                changed += 1
+            self.ready = True
+            self.last_refresh = time.time()
+        return changed
+
+    def _candidates(self, grams):
+        """Interseção das posting lists, começando pela menor."""
+        postings = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if not ids:
+                return set()
+            postings.append(ids)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for ids in postings[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
+
+    @staticmethod
+    def _match_quality(doc, query):
+        best = 0.0
+        for field in doc.fields:
+            if field == query:
+                return MATCH_EXACT
+            if field.startswith(query):
+                best = max(best, MATCH_PREFIX)
+            elif f" {query}" in f" {field}":
+                best = max(best, MATCH_WORD_PREFIX)
+            elif query in field:
+                best = max(best, MATCH_SUBSTRING)
+        return best
+
+    def _ranked(self, q, limit, fuzzy, require_score):
+        """[(chave, doc)] ordenado por qualidade do casamento, score DESC, rank ASC e mal_id."""
+        query = normalize(q)
+        if not query:
+            return []
+
+        with self._lock:
+            if len(query) >= 3:
+                candidates = self._candidates(ngrams(query, 3))
+            elif len(query) == 2:
+                candidates = self._candidates({query})
+            else:
+                candidates = self._docs.keys()
+
+            matches = {}
+            for mal_id in candidates:
+                doc = self._docs[mal_id]
+                if require_score and doc.score is None:
+                    continue
+                quality = self._match_quality(doc, query)
+                if quality:
+                    matches[mal_id] = (quality, doc)
+
+            # Fuzzy: títulos que compartilham a maioria dos trigramas da consulta
+            if fuzzy and len(matches) < limit and len(query) >= 4:
+                query_grams = ngrams(f" {query} ", 3)
+                hits = {}
+                for gram in query_grams:
+                    for mal_id in self._postings.get(gram, ()):
+                        hits[mal_id] = hits.get(mal_id, 0) + 1
+                for mal_id, count in hits.items():
+                    similarity = count / len(query_grams)
+                    if mal_id in matches or similarity < FUZZY_THRESHOLD:
+                        continue
+                    doc = self._docs[mal_id]
+                    if require_score and doc.score is None:
+                        continue
+                    matches[mal_id] = (similarity, doc)
+
+            return sorted(((-quality, *doc.sort_key()), doc) for quality, doc in matches.values())
+
+    @staticmethod
+    def _item(doc):
+        return {"mal_id": doc.mal_id, "title": doc.title, "image_url": doc.image_url}
+
+    def search(self, q, limit=25, fuzzy=True, require_score=False):
+        """
+        Busca por substring (com tolerância a erros de digitação se 'fuzzy').
+        Ordena por qualidade do casamento, depois score DESC e rank ASC.
+        """
+        return [self._item(doc) for _, doc in self._ranked(q, limit, fuzzy, require_score)[:limit]]
+
+    def search_page(self, q, limit=25, after=None, fuzzy=True):
+        """
+        Uma página da busca: ([itens], chave_do_último | None). 'after' é a chave
+        do último item da página anterior; a próxima começa logo depois dela.
+        """
+        ranked = self._ranked(q, limit, fuzzy, require_score=False)
+        start = bisect.bisect_right([key for key, _ in ranked], tuple(after)) if after else 0
+        page = ranked[start:start + limit + 1]
+        next_key = page[limit - 1][0] if len(page) > limit else None
+        return [self._item(doc) for _, doc in page[:limit]], next_key
+
+
+def load_anime_rows():
+    """Lê da tabela 'animes' as colunas usadas pelos índices de busca."""
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        cur = conn.cursor(cursor_factory=DictCursor)
+        cur.execute("SELECT mal_id, title, title_japanese, image_url, score, rank FROM animes;")
+        return cur.fetchall()
+    finally:
+        release_db_connection(conn)
+
+
+class IndexRefresher:
+    """Thread em segundo plano que constrói o índice no startup e o atualiza periodicamente."""
+
+    def __init__(self, index, interval, listeners=()):
+        self.index = index
+        self.interval = interval
+        # Chamados com as linhas novas sempre que o catálogo muda (ex: reconstruir a trie)
+        self.listeners = list(listeners)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_now(self):
+        try:
+            rows = load_anime_rows()
+            if rows is None:
+                print("[BUSCA] Banco indisponível; o índice de títulos será atualizado depois.")
+                return
+            start = time.perf_counter()
+            changed = self.index.refresh(rows)
+            elapsed = (time.perf_counter() - start) * 1000
+            if changed:
+                print(f"[BUSCA] Índice de títulos atualizado: {changed} alterações, "
+                      f"{len(self.index)} animes ({elapsed:.0f} ms).")
+                for listener in self.listeners:
+                    listener(rows)
+        except Exception as e:
+            print(f"[BUSCA] Erro ao atualizar o índice de títulos: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_now()
+            self._stop.wait(self.interval)
+
+    def refresh_in_background(self):
+        """Força uma atualização fora do ciclo (ex: logo após rodar a ingestão)."""
+        threading.Thread(target=self.refresh_now, name="search-index-refresh-now", daemon=True).start()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="search-index-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
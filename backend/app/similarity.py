@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+
+# Catálogos até esse tamanho usam força bruta exata (um produto matriz-vetor é barato)
+DEFAULT_EXACT_THRESHOLD = 20000
+
+
+def _normalize_rows(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _spherical_kmeans(vectors, n_clusters, n_iter=10, sample_size=50000, seed=2025):
+    """K-means com similaridade de cosseno (vetores já normalizados), treinado numa amostra."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+
+    for _ in range(n_iter):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = sample[assign == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+            else:
+                # Cluster vazio: recomeça de um ponto aleatório
+                centroids[c] = sample[rng.integers(len(sample))]
+        centroids = _normalize_rows(centroids)
+    return centroids
+
+
+class ItemVectorIndex:
+    """
+    Índice de vizinhos mais próximos (cosseno) sobre os fatores de item 'qi' do SVD.
+
+    - Catálogo pequeno: força bruta exata.
+    - Catálogo grande: IVF (inverted file). Os vetores são agrupados por k-means e
+      a consulta só visita as 'nprobe' listas cujos centróides são mais parecidos,
+      parando antes se o orçamento de latência acabar.
+    """
+
+    def __init__(self, vectors, item_ids, exact_threshold=DEFAULT_EXACT_THRESHOLD,
+                 n_lists=None, nprobe=None, seed=2025, normalized=False):
+        start = time.perf_counter()
+        # 'normalized': vetores já normalizados (ex: mmap do artefato), usados sem cópia;
+        # artefatos float16 antigos viram float32 uma vez (o NumPy não tem produto BLAS em float16)
+        if normalized and vectors.dtype == np.float16:
+            vectors = vectors.astype(np.float32)
+        self.vectors = vectors if normalized else _normalize_rows(vectors)
+        self.item_ids = np.asarray(item_ids)
+        self._position = {item_id: i for i, item_id in enumerate(self.item_ids.tolist())}
+        self.exact = len(self.vectors) <= exact_threshold
+
+        self.centroids = None
+        self.nprobe = None
+        if not self.exact:
+            n_lists = n_lists or max(1, int(4 * np.sqrt(len(self.vectors))))
+            self.nprobe = nprobe or max(1, n_lists // 16)
+            self.centroids = _spherical_kmeans(self.vectors, n_lists, seed=seed)
+
+            # Listas invertidas guardadas de forma compacta: membros ordenados por lista + offsets
+            assign = np.argmax(self.vectors @ self.centroids.T, axis=1)
+            self._list_members = np.argsort(assign, kind="stable").astype(np.int32)
+            self._list_offsets = np.searchsorted(assign[self._list_members], np.arange(n_lists + 1))
+
+        self.build_seconds = time.perf_counter() - start
+
+    @property
+    def kind(self):
+        return "exact" if self.exact else "ivf"
+
+    def __contains__(self, item_id):
+        return item_id in self._position
+
+    def _top_k(self, candidates, sims, k, exclude):
+        if exclude is not None:
+            sims[candidates == exclude] = -np.inf
+        k = min(k, len(candidates) - (1 if exclude is not None else 0))
+        if k <= 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self.item_ids[candidates[i]].item(), float(sims[i])) for i in top if np.isfinite(sims[i])]
+
+    def search(self, query, k=10, nprobe=None, budget_ms=None, exclude_position=None):
+        """Top-k por cosseno para um vetor de consulta já normalizado."""
+        if self.exact:
+            candidates = np.arange(len(self.vectors))
+            return self._top_k(candidates, self.vectors @ query, k, exclude_position)
+
+        nprobe = nprobe or self.nprobe
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms else None
+        order = np.argsort(-(self.centroids @ query))[:nprobe]
+
+        candidate_chunks, sim_chunks = [], []
+        gathered = 0
+        for list_id in order:
+            members = self._list_members[self._list_offsets[list_id]:self._list_offsets[list_id + 1]]
+            if not len(members):
+                continue
+            candidate_chunks.append(members)
+            sim_chunks.append(self.vectors[members] @ query)
+            gathered += len(members)
+            # Listas em ordem de proximidade: se o orçamento acabar, fica com o que já viu
+            if deadline is not None and gathered > k and time.perf_counter() > deadline:
+                break
+        if not candidate_chunks:
+            return []
+        return self._top_k(np.concatenate(candidate_chunks), np.concatenate(sim_chunks), k, exclude_position)
+
+    def similar_to(self, item_id, k=10, nprobe=None, budget_ms=None):
+        """Itens mais parecidos com 'item_id' (o próprio item é excluído)."""
+        position = self._position[item_id]
+        return self.search(self.vectors[position], k, nprobe, budget_ms, exclude_position=position)
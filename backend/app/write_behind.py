@@ -0,0 +1,357 @@
+import asyncio
+import concurrent.futures
+import os
+import time
+
+import asyncpg
+
+from .async_db import async_connection
+from .metrics import timed
+
+# off: cada requisição grava direto (padrão)
+# async: responde na hora; as escritas vão para o banco no próximo flush
+# sync: a requisição espera o flush que contém sua escrita (group commit)
+WRITE_BEHIND_MODE = os.getenv("WRITE_BEHIND_MODE", "off")
+# Flush a cada N ms ou quando a fila juntar M chaves, o que vier primeiro
+WRITE_BEHIND_INTERVAL_MS = float(os.getenv("WRITE_BEHIND_INTERVAL_MS", "200"))
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "500"))
+# Limite de chaves na fila: acima dele, escritas de chaves novas são recusadas
+# (503) em vez de acumular em memória enquanto o banco está fora
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "10000"))
+# Com o banco fora, o intervalo entre tentativas dobra a cada falha até este teto
+WRITE_BEHIND_MAX_BACKOFF_MS = float(os.getenv("WRITE_BEHIND_MAX_BACKOFF_MS", "10000"))
+MODES = ("off", "async", "sync")
+
+# Erros causados pelos próprios valores: só esses justificam isolar e descartar
+# chaves. Os demais (conexão caída no meio do lote, InterfaceError, OSError,
+# erros transitórios do banco) fazem o lote inteiro voltar para a fila no modo
+# async e falhar para quem espera no modo sync
+DATA_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError)
+
+# Marca de "remover" para a nota ou para o item da lista (None = campo não mexido)
+DELETED = object()
+
+# Cada tipo de mutação vira um único comando por lote (arrays + unnest); as
+# notas gravam também o evento em 'rating_events' (só o valor final de cada par)
+UPSERT_RATINGS_SQL = """
+    WITH upserted AS (
+        INSERT INTO ratings (user_id, anime_id, rating)
+        SELECT * FROM unnest($1::int[], $2::int[], $3::int[])
+        ON CONFLICT (user_id, anime_id) DO UPDATE SET rating = EXCLUDED.rating
+        RETURNING user_id, anime_id, rating
+    )
+    INSERT INTO rating_events (user_id, anime_id, rating)
+    SELECT user_id, anime_id, rating FROM upserted
+"""
+DELETE_RATINGS_SQL = """
+    WITH removed AS (
+        DELETE FROM ratings r
+        USING unnest($1::int[], $2::int[]) AS d(user_id, anime_id)
+        WHERE r.user_id = d.user_id AND r.anime_id = d.anime_id
+        RETURNING r.user_id, r.anime_id
+    )
+    INSERT INTO rating_events (user_id, anime_id, rating)
+    SELECT user_id, anime_id, NULL FROM removed
+"""
+UPSERT_LIST_SQL = """
+    INSERT INTO anime_user (user_id, anime_id, status)
+    SELECT * FROM unnest($1::int[], $2::int[], $3::text[])
+    ON CONFLICT (user_id, anime_id) DO UPDATE SET status = EXCLUDED.status
+"""
+DELETE_LIST_SQL = """
+    DELETE FROM anime_user au
+    USING unnest($1::int[], $2::int[]) AS d(user_id, anime_id)
+    WHERE au.user_id = d.user_id AND au.anime_id = d.anime_id
+"""
+
+
+class WriteBehindFull(Exception):
+    """A fila chegou a WRITE_BEHIND_MAX_PENDING chaves: a escrita deve ser recusada (503)."""
+
+    def __init__(self, retry_after):
+        super().__init__("fila write-behind cheia")
+        self.retry_after = retry_after
+
+
+class PendingWrite:
+    """Último valor pendente de cada campo de um par (user_id, anime_id)."""
+
+    __slots__ = ("rating", "status")
+
+    def __init__(self, rating=None, status=None):
+        self.rating = rating
+        self.status = status
+
+    def merge(self, newer):
+        """Aplica uma mutação mais nova por cima desta (campos não mexidos ficam)."""
+        if newer.rating is not None:
+            self.rating = newer.rating
+        if newer.status is not None:
+            self.status = newer.status
+
+
+class WriteBehindQueue:
+    """
+    Fila write-behind das escritas de nota e lista. Mutações do mesmo
+    (user_id, anime_id) se fundem e só o último valor de cada campo vai para o
+    banco, em um lote com um comando por tipo de mutação numa única transação.
+
+    Leituras do próprio worker veem as escritas pendentes (pending/overlay); com
+    vários workers, cada um só enxerga a sua fila até o flush.
+    """
+
+    def __init__(self, mode="off", interval_ms=200, max_batch=500, max_pending=10000, max_backoff_ms=10000):
+        if mode not in MODES:
+            raise ValueError(f"WRITE_BEHIND_MODE inválido: {mode!r} (use {', '.join(MODES)})")
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_backoff = max_backoff_ms / 1000
+        self._failures = 0
+        self._retry_at = 0.0
+        self._pending = {}
+        self._inflight = {}
+        self._waiters = {}
+        self._wake = None
+        self._flush_lock = None
+        self._loop = None
+        self._task = None
+        self._closed = False
+        self._stats = {"submitted": 0, "coalesced": 0, "flushes": 0, "flushed": 0, "failed": 0,
+                       "requeued": 0, "rejected": 0, "outages": 0, "last_flush_ms": 0.0, "last_batch": 0}
+
+    @property
+    def enabled(self):
+        return self.mode != "off"
+
+    def start(self):
+        """Chamado no startup, dentro do event loop do uvicorn."""
+        if not self.enabled or self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = self._loop.create_task(self._run())
+        print(f"Write-behind '{self.mode}': flush a cada {self.interval * 1000:.0f} ms "
+              f"ou {self.max_batch} escritas.")
+
+    async def close(self):
+        """Para o flush periódico e grava o que ainda estiver na fila (shutdown)."""
+        if self._task is None:
+            return
+        self._closed = True
+        self._wake.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self._pending:
+            print(f"Write-behind: {len(self._pending)} escritas não puderam ser gravadas no shutdown.")
+
+    async def submit(self, user_id, anime_id, rating=None, status=None):
+        """
+        Enfileira uma mutação. No modo 'sync', só retorna depois do flush que a
+        contém e levanta a exceção se a escrita falhar. Com a fila cheia, chaves
+        novas levantam WriteBehindFull (as já pendentes continuam se fundindo).
+        """
+        key = (user_id, anime_id)
+        write = PendingWrite(rating, status)
+        current = self._pending.get(key)
+        if current is None and len(self._pending) >= self.max_pending:
+            self._stats["rejected"] += 1
+            raise WriteBehindFull(retry_after=max(1, round(self._backoff())))
+        if current is None:
+            self._pending[key] = write
+        else:
+            current.merge(write)
+            self._stats["coalesced"] += 1
+        self._stats["submitted"] += 1
+
+        waiter = None
+        if self.mode == "sync":
+            waiter = self._loop.create_future()
+            self._waiters.setdefault(key, []).append(waiter)
+        if waiter is not None or len(self._pending) >= self.max_batch:
+            self._wake.set()
+        if waiter is not None:
+            await waiter
+
+    def pending(self, user_id, anime_id):
+        """Escrita ainda não gravada do par (a da fila por cima da que está sendo gravada), ou None."""
+        key = (user_id, anime_id)
+        inflight, queued = self._inflight.get(key), self._pending.get(key)
+        if inflight is None:
+            return queued
+        merged = PendingWrite(inflight.rating, inflight.status)
+        if queued is not None:
+            merged.merge(queued)
+        return merged
+
+    def has_pending_for_user(self, user_id):
+        # Chamado também de threads do threadpool: list() copia as chaves de uma vez
+        keys = list(self._pending) + list(self._inflight)
+        return any(key[0] == user_id for key in keys)
+
+    def flush_user_blocking(self, user_id, timeout=5.0):
+        """
+        Para handlers síncronos (threadpool) que leem do banco coisas que a
+        fila ainda não gravou: força o flush antes da leitura.
+        """
+        if self._loop is None or not self.has_pending_for_user(user_id):
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.flush(), self._loop).result(timeout)
+        except concurrent.futures.TimeoutError:
+            # O flush continua no event loop; a leitura segue sem as escritas pendentes
+            print(f"Write-behind: flush do usuário {user_id} passou de {timeout}s; lendo mesmo assim.")
+        except Exception as e:
+            print(f"Write-behind: flush do usuário {user_id} falhou ({e}); lendo mesmo assim.")
+
+    def _backoff(self):
+        """Espera até a próxima tentativa: o intervalo normal, dobrando a cada falha seguida."""
+        if not self._failures:
+            return self.interval
+        return min(self.interval * 2 ** min(self._failures, 20), self.max_backoff)
+
+    async def _run(self):
+        while not self._closed:
+            timeout = self._retry_at - time.monotonic() if self._failures else self.interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=max(timeout, 0))
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            # Acordado por um lote cheio (ou pelo modo sync) durante o backoff: espera o resto
+            if self._failures and not self._closed and time.monotonic() < self._retry_at:
+                continue
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Write-behind: erro no flush: {e}")
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            waiters, self._waiters = self._waiters, {}
+            self._inflight = batch
+            start = time.perf_counter()
+            try:
+                failed = await self._write(batch)
+            except ConnectionError as e:
+                # No modo sync quem esperava recebe o erro, então o lote não volta para a fila
+                if self.mode == "async":
+                    self._requeue(batch)
+                for futures in waiters.values():
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                self._failures += 1
+                self._retry_at = time.monotonic() + self._backoff()
+                if self._failures == 1:
+                    self._stats["outages"] += 1
+                    print(f"Write-behind: banco indisponível ({e}); tentando de novo com backoff "
+                          f"de até {self.max_backoff:g}s.")
+                return
+            finally:
+                self._inflight = {}
+
+            if self._failures:
+                print(f"Write-behind: banco de volta depois de {self._failures} tentativas; "
+                      f"{len(batch)} escritas gravadas.")
+                self._failures = 0
+
+            for key, futures in waiters.items():
+                for future in futures:
+                    if future.done():
+                        continue
+                    if key in failed:
+                        future.set_exception(failed[key])
+                    else:
+                        future.set_result(None)
+            self._stats["flushes"] += 1
+            self._stats["flushed"] += len(batch) - len(failed)
+            self._stats["failed"] += len(failed)
+            self._stats["last_batch"] = len(batch)
+            self._stats["last_flush_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+    def _requeue(self, batch):
+        """Banco indisponível: devolve o lote à fila, por baixo das escritas que chegaram depois."""
+        for key, write in batch.items():
+            newer = self._pending.get(key)
+            if newer is not None:
+                write.merge(newer)
+            self._pending[key] = write
+        self._stats["requeued"] += len(batch)
+
+    async def _write(self, batch):
+        """
+        Grava o lote numa transação. Se o lote falhar por causa dos dados, grava
+        chave a chave para isolar e descartar só as ruins. Qualquer outra falha
+        (conexão caída, erro transitório do banco) vira ConnectionError e o lote
+        é tratado como não gravado; regravar as chaves que já foram é seguro,
+        porque as escritas são upserts e deletes do valor final.
+        """
+        try:
+            async with async_connection() as conn:
+                if conn is None:
+                    raise ConnectionError("banco de dados indisponível")
+                try:
+                    async with conn.transaction():
+                        await self._apply(conn, batch)
+                    return {}
+                except DATA_ERRORS as e:
+                    if len(batch) == 1:
+                        key = next(iter(batch))
+                        print(f"Write-behind: escrita {key} descartada: {e}")
+                        return {key: e}
+
+                failed = {}
+                for key, write in batch.items():
+                    try:
+                        async with conn.transaction():
+                            await self._apply(conn, {key: write})
+                    except DATA_ERRORS as e:
+                        print(f"Write-behind: escrita {key} descartada: {e}")
+                        failed[key] = e
+                return failed
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise ConnectionError(f"falha ao gravar o lote: {e}") from e
+
+    @staticmethod
+    async def _apply(conn, batch):
+        rating_upserts, rating_deletes, list_upserts, list_deletes = [], [], [], []
+        for (user_id, anime_id), write in batch.items():
+            if write.rating is DELETED:
+                rating_deletes.append((user_id, anime_id))
+            elif write.rating is not None:
+                rating_upserts.append((user_id, anime_id, write.rating))
+            if write.status is DELETED:
+                list_deletes.append((user_id, anime_id))
+            elif write.status is not None:
+                list_upserts.append((user_id, anime_id, write.status))
+
+        for name, sql, rows in (
+            ("write_behind_delete_ratings", DELETE_RATINGS_SQL, rating_deletes),
+            ("write_behind_upsert_ratings", UPSERT_RATINGS_SQL, rating_upserts),
+            ("write_behind_delete_list", DELETE_LIST_SQL, list_deletes),
+            ("write_behind_upsert_list", UPSERT_LIST_SQL, list_upserts),
+        ):
+            if rows:
+                await timed(conn, name).execute(sql, *map(list, zip(*rows)))
+
+    def stats(self):
+        return {
+            "mode": self.mode,
+            "interval_ms": self.interval * 1000,
+            "max_batch": self.max_batch,
+            "max_pending": self.max_pending,
+            "pending": len(self._pending),
+            "consecutive_failures": self._failures,
+            "retry_in_ms": round(max(self._retry_at - time.monotonic(), 0) * 1000) if self._failures else 0,
+            "inflight": len(self._inflight),
+            **self._stats,
+        }
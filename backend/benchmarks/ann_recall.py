@@ -0,0 +1,88 @@
+"""
+Benchmark de recall x latência do índice de similares (/anime/{mal_id}/similar).
+
+Compara o IVF com diferentes 'nprobe' contra a força bruta exata, usando os
+fatores de item de um modelo treinado (--model) ou vetores sintéticos.
+
+    python benchmarks/ann_recall.py --items 200000 --factors 160
+    python benchmarks/ann_recall.py --model model_machine_learning/recommendation_ml.pkl
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app.similarity import ItemVectorIndex  # noqa: E402
+
+
+def load_vectors(args):
+    if args.model:
+        from surprise import dump
+        _, algo = dump.load(args.model)
+        item_ids = [algo.trainset.to_raw_iid(i) for i in range(algo.trainset.n_items)]
+        return np.asarray(algo.qi, dtype=np.float32), np.asarray(item_ids)
+
+    # Vetores sintéticos com estrutura de clusters (parecido com fatores reais)
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(64, args.factors)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=args.items)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(args.items, args.factors)).astype(np.float32)
+    return vectors, np.arange(args.items)
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000)
+
+
+def run(args):
+    vectors, item_ids = load_vectors(args)
+    print(f"Itens: {len(vectors)} | Fatores: {vectors.shape[1]} | k={args.k} | consultas={args.queries}")
+
+    exact = ItemVectorIndex(vectors, item_ids, exact_threshold=len(vectors))
+    ivf = ItemVectorIndex(vectors, item_ids, exact_threshold=0, n_lists=args.lists)
+    print(f"IVF: {len(ivf.centroids)} listas, construído em {ivf.build_seconds:.2f}s\n")
+
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.choice(item_ids, size=min(args.queries, len(item_ids)), replace=False).tolist()
+
+    truth = {}
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        truth[q] = {i for i, _ in exact.similar_to(q, args.k)}
+        latencies.append(time.perf_counter() - start)
+
+    print(f"{'índice':<14}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'exato':<14}{1.0:>10.3f}{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 99):>10.3f}")
+
+    n_lists = len(ivf.centroids)
+    for nprobe in sorted({1, 2, 4, 8, 16, 32, 64, n_lists // 4}):
+        if nprobe < 1 or nprobe > n_lists:
+            continue
+        hits = 0
+        latencies = []
+        for q in queries:
+            start = time.perf_counter()
+            found = {i for i, _ in ivf.similar_to(q, args.k, nprobe=nprobe)}
+            latencies.append(time.perf_counter() - start)
+            hits += len(found & truth[q])
+        recall = hits / (len(queries) * args.k)
+        print(f"{'ivf/' + str(nprobe):<14}{recall:>10.3f}"
+              f"{percentile_ms(latencies, 50):>10.3f}{percentile_ms(latencies, 99):>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall x latência do índice de similares.")
+    parser.add_argument("--model", help="Modelo .pkl do Surprise (usa vetores sintéticos se omitido)")
+    parser.add_argument("--items", type=int, default=100000, help="Itens sintéticos")
+    parser.add_argument("--factors", type=int, default=160, help="Dimensão dos vetores sintéticos")
+    parser.add_argument("--lists", type=int, default=None, help="Listas do IVF (padrão: 4*sqrt(n))")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=2025)
+    run(parser.parse_args())
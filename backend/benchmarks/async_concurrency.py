@@ -0,0 +1,134 @@
+"""
+Benchmark de concorrência dos endpoints de estado do usuário (handlers assíncronos).
+
+Abre N clientes simultâneos (conexões HTTP/1.1 keep-alive, só biblioteca padrão)
+que ficam chamando /user-rating e /user-list-status por alguns segundos, e
+imprime requisições/s e latências de cada alvo. Para comparar antes/depois,
+suba uma API em cada versão e passe as duas:
+
+    python benchmarks/async_concurrency.py --concurrency 128 \\
+        --target antes=http://localhost:8001 --target depois=http://localhost:8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlsplit
+
+ENDPOINTS = (
+    "/user-rating/{user_id}/{anime_id}",
+    "/user-list-status/{user_id}/{anime_id}",
+)
+
+
+async def http_request(reader, writer, host, method, path, json_body=None):
+    """Requisição HTTP/1.1 simples com keep-alive; retorna o status HTTP."""
+    body = json.dumps(json_body).encode() if json_body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n"
+    if json_body is not None:
+        head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    writer.write(head.encode() + b"\r\n" + body)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("conexão fechada pelo servidor")
+    status = int(status_line.split()[1])
+
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return status
+
+
+async def http_get(reader, writer, host, path):
+    return await http_request(reader, writer, host, "GET", path)
+
+
+async def client(base_url, deadline, args, rng, latencies, errors):
+    url = urlsplit(base_url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(ENDPOINTS).format(
+                user_id=rng.randint(1, args.users), anime_id=rng.randint(1, args.animes)
+            )
+            start = time.perf_counter()
+            try:
+                status = await http_get(reader, writer, url.netloc, path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors.append(path)
+                writer.close()
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                continue
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(path)
+    finally:
+        writer.close()
+
+
+def percentile_ms(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] * 1000
+
+
+async def run_target(base_url, args):
+    latencies, errors = [], []
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        client(base_url, deadline, args, random.Random(rng.random()), latencies, errors)
+        for _ in range(args.concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile_ms(latencies, 50),
+        "p99": percentile_ms(latencies, 99),
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", default=[],
+                        help="nome=url (pode repetir); padrão: api=http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=128)
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos por alvo")
+    parser.add_argument("--users", type=int, default=1000, help="user_ids sorteados em 1..N")
+    parser.add_argument("--animes", type=int, default=20000, help="anime_ids sorteados em 1..N")
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args()
+
+    targets = [t.split("=", 1) for t in (args.target or ["api=http://localhost:8000"])]
+    print(f"Clientes simultâneos: {args.concurrency} | {args.duration:.0f}s por alvo\n")
+    print(f"{'alvo':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}")
+    for name, base_url in targets:
+        result = asyncio.run(run_target(base_url.rstrip("/"), args))
+        print(f"{name:<12}{result['rps']:>10.1f}{result['p50']:>10.1f}{result['p99']:>10.1f}{result['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
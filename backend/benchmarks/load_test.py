@@ -0,0 +1,366 @@
+"""
+Teste de carga HTTP da API com um mix de tráfego parecido com o do frontend.
+
+Cada cliente virtual escolhe um cenário pelo peso do --mix, executa as
+requisições dele em sequência (keep-alive, só biblioteca padrão) e recomeça:
+
+    home             /animes/top + /animes/genres + uma ou duas fileiras de gênero
+    autocomplete     uma rajada de /animes/autocomplete, uma por tecla digitada
+    detail           /anime/{id} + /user-state + /anime/{id}/similar
+    rating           POST /rate-anime
+    recommendations  /recommendations/{user_id}
+
+Imprime requisições/s e p50/p95/p99 por endpoint e grava tudo em JSON (--output)
+para comparar execuções entre commits. Com a mesma --seed, o mesmo banco e os
+mesmos parâmetros, a sequência de requisições de cada cliente é a mesma.
+
+Com --generate, o banco local é recriado antes com o gerador sintético
+(data_processing/generate_synthetic_data.py) na escala pedida e com --data-seed,
+e o JSON registra o dataset usado.
+
+    python benchmarks/load_test.py --output bench.json
+    python benchmarks/load_test.py --start-app --workers 2 --concurrency 64 --duration 60
+    python benchmarks/load_test.py --generate 1x --start-app --output bench-1x.json
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from async_concurrency import http_request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GENERATOR = os.path.join(BACKEND_DIR, "data_processing", "generate_synthetic_data.py")
+
+DEFAULT_MIX = "home=30,autocomplete=20,detail=30,rating=10,recommendations=10"
+# Animes carregados no início para sortear páginas de detalhe e títulos digitados
+CATALOG_SAMPLE = 500
+PERCENTILES = (50, 95, 99)
+# Pausa depois de uma falha de conexão (evita laço quente com o servidor fora do ar)
+RECONNECT_BACKOFF = 0.05
+
+
+# -----------------
+# Preparação (síncrona)
+# -----------------
+def get_json(url, path):
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise RuntimeError(f"GET {path} -> {response.status}: {body[:200]!r}")
+        return json.loads(body)
+    finally:
+        conn.close()
+
+
+def load_catalog(url, size):
+    """Gêneros e os primeiros 'size' animes de /animes/top (os mesmos para o mesmo banco)."""
+    genres = [g["name"] for g in get_json(url, "/animes/genres")]
+    animes, cursor = [], None
+    while len(animes) < size:
+        path = "/animes/top?limit=100" + (f"&cursor={quote(cursor)}" if cursor else "")
+        page = get_json(url, path)
+        animes += page["items"]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    if not genres or not animes:
+        raise RuntimeError("catálogo vazio: popule o banco antes de rodar o teste de carga")
+    return genres, animes[:size]
+
+
+def wait_until_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            get_json(url, "/")
+            return
+        except (OSError, RuntimeError, http.client.HTTPException):
+            time.sleep(0.5)
+    raise RuntimeError(f"a API não respondeu em {timeout:.0f}s")
+
+
+def db_env(args):
+    return {**os.environ, "DB_HOST": args.db_host, "DB_PORT": str(args.db_port), "DB_NAME": args.db_name}
+
+
+def generate_dataset(args):
+    """Recria o banco local com dados sintéticos (mesma escala e seed = mesmos dados)."""
+    sys.path.insert(0, os.path.dirname(GENERATOR))
+    from generate_synthetic_data import SCALES
+
+    command = [sys.executable, GENERATOR, "--scale", args.generate, "--seed", str(args.data_seed), "--truncate"]
+    print(f"Gerando dataset sintético '{args.generate}' (seed {args.data_seed})...")
+    subprocess.run(command, cwd=BACKEND_DIR, env=db_env(args), check=True)
+    return {"scale": args.generate, "seed": args.data_seed, **SCALES[args.generate]}
+
+
+def start_app(url, args):
+    """Sobe o uvicorn deste checkout apontando para o Postgres local."""
+    env = db_env(args)
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", url.hostname,
+               "--port", str(url.port or 80), "--workers", str(args.workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    try:
+        wait_until_ready(url, args.startup_timeout)
+    except Exception:
+        process.terminate()
+        raise
+    return process
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"cenário desconhecido em --mix: {name!r} (use {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# -----------------
+# Cenários: cada um recebe o contexto do cliente e faz suas requisições
+# -----------------
+async def scenario_home(client):
+    await client.get("/animes/top", "/animes/top?limit=20")
+    await client.get("/animes/genres", "/animes/genres")
+    for genre in client.rng.sample(client.genres, min(len(client.genres), client.rng.choice((1, 1, 2)))):
+        await client.get("/animes/genre/{genre_name}", f"/animes/genre/{quote(genre)}?limit=20")
+
+
+async def scenario_autocomplete(client):
+    # Digita o começo de um título: uma consulta por tecla a partir do 2º caractere
+    title = client.rng.choice(client.animes)["title"] or ""
+    typed = title[:client.rng.randint(3, 10)]
+    for end in range(2, len(typed) + 1):
+        await client.get("/animes/autocomplete", f"/animes/autocomplete?q={quote(typed[:end])}")
+
+
+async def scenario_detail(client):
+    mal_id = client.rng.choice(client.animes)["mal_id"]
+    user_id = client.random_user()
+    await client.get("/anime/{mal_id}", f"/anime/{mal_id}")
+    await client.get("/user-state/{user_id}", f"/user-state/{user_id}?anime_ids={mal_id}")
+    await client.get("/anime/{mal_id}/similar", f"/anime/{mal_id}/similar?limit=10")
+
+
+async def scenario_rating(client):
+    body = {
+        "user_id": client.random_user(),
+        "anime_id": client.rng.choice(client.animes)["mal_id"],
+        "rating": client.rng.randint(1, 10),
+    }
+    await client.request("/rate-anime", "POST", "/rate-anime", body)
+
+
+async def scenario_recommendations(client):
+    await client.get("/recommendations/{user_id}", f"/recommendations/{client.random_user()}?limit=20")
+
+
+SCENARIOS = {
+    "home": scenario_home,
+    "autocomplete": scenario_autocomplete,
+    "detail": scenario_detail,
+    "rating": scenario_rating,
+    "recommendations": scenario_recommendations,
+}
+
+
+class Stats:
+    def __init__(self, measure_from):
+        self.measure_from = measure_from
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, endpoint, started, seconds, ok):
+        # Requisições que começaram ainda no aquecimento ficam de fora
+        if started < self.measure_from:
+            return
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+class Client:
+    """Um cliente virtual: uma conexão keep-alive e um gerador aleatório próprio."""
+
+    def __init__(self, url, rng, genres, animes, users, stats):
+        self.url = url
+        self.rng = rng
+        self.genres = genres
+        self.animes = animes
+        self.users = users
+        self.stats = stats
+        self.reader = self.writer = None
+
+    def random_user(self):
+        return self.rng.randint(1, self.users)
+
+    async def connect(self):
+        self.close()
+        self.reader, self.writer = await asyncio.open_connection(self.url.hostname, self.url.port or 80)
+
+    async def request(self, endpoint, method, path, body=None):
+        start = time.perf_counter()
+        ok = False
+        try:
+            # Conexão aberta sob demanda: com o servidor fora do ar, a falha conta como erro
+            if self.writer is None:
+                await self.connect()
+            status = await http_request(self.reader, self.writer, self.url.netloc, method, path, body)
+            ok = status < 400 or status == 404
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            self.close()
+        self.stats.record(endpoint, start, time.perf_counter() - start, ok)
+        if self.writer is None:
+            await asyncio.sleep(RECONNECT_BACKOFF)
+
+    async def get(self, endpoint, path):
+        await self.request(endpoint, "GET", path)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def run_client(client, mix, deadline):
+    names, weights = list(mix), list(mix.values())
+    try:
+        while time.perf_counter() < deadline:
+            scenario = client.rng.choices(names, weights)[0]
+            await SCENARIOS[scenario](client)
+    finally:
+        client.close()
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))] if ordered else 0.0
+
+
+def summarize(samples, errors, elapsed):
+    ordered = sorted(samples)
+    result = {
+        "requests": len(ordered),
+        "errors": errors,
+        "rps": round(len(ordered) / elapsed, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+    }
+    for q in PERCENTILES:
+        result[f"p{q}_ms"] = round(percentile(ordered, q) * 1000, 3)
+    return result
+
+
+async def run(url, args, mix, genres, animes):
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.duration
+    stats = Stats(measure_from)
+    rng = random.Random(args.seed)
+    clients = [
+        Client(url, random.Random(rng.random()), genres, animes, args.users, stats)
+        for _ in range(args.concurrency)
+    ]
+
+    await asyncio.gather(*[run_client(c, mix, deadline) for c in clients])
+    elapsed = time.perf_counter() - measure_from
+
+    endpoints = {
+        endpoint: summarize(samples, stats.errors.get(endpoint, 0), elapsed)
+        for endpoint, samples in sorted(stats.latencies.items())
+    }
+    all_samples = [s for samples in stats.latencies.values() for s in samples]
+    return endpoints, summarize(all_samples, sum(stats.errors.values()), elapsed)
+
+
+def print_table(endpoints, total):
+    print(f"{'endpoint':<28}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'erros':>8}")
+    for name, row in [*endpoints.items(), ("TOTAL", total)]:
+        print(f"{name:<28}{row['rps']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="cenário=peso separados por vírgula")
+    parser.add_argument("--concurrency", type=int, default=64, help="clientes virtuais")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos medidos")
+    parser.add_argument("--warmup", type=float, default=5.0, help="segundos iniciais descartados")
+    parser.add_argument("--users", type=int, default=None,
+                        help="user_ids sorteados em 1..N (padrão: os do --generate, ou 1000)")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--label", default=None, help="nome desta execução no JSON")
+    parser.add_argument("--output", default=None, help="arquivo JSON com o resultado")
+    app_group = parser.add_argument_group("subir a API localmente")
+    app_group.add_argument("--start-app", action="store_true", help="sobe o uvicorn deste checkout")
+    app_group.add_argument("--workers", type=int, default=1)
+    app_group.add_argument("--startup-timeout", type=float, default=120.0)
+    app_group.add_argument("--db-host", default="localhost")
+    app_group.add_argument("--db-port", type=int, default=5432)
+    app_group.add_argument("--db-name", default="animesearch")
+    data_group = parser.add_argument_group("dataset sintético")
+    data_group.add_argument("--generate", metavar="ESCALA", default=None,
+                            help="recria o banco com o gerador sintético (small, 1x, 10x, max)")
+    data_group.add_argument("--data-seed", type=int, default=2025)
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url.rstrip("/"))
+    mix = parse_mix(args.mix)
+    dataset = generate_dataset(args) if args.generate else None
+    if args.users is None:
+        args.users = dataset["users"] if dataset else 1000
+    process = start_app(url, args) if args.start_app else None
+    try:
+        genres, animes = load_catalog(url, CATALOG_SAMPLE)
+        print(f"Mix: {args.mix} | {args.concurrency} clientes | {args.warmup:.0f}s aquecimento + "
+              f"{args.duration:.0f}s medidos | seed {args.seed}\n")
+        endpoints, total = asyncio.run(run(url, args, mix, genres, animes))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print_table(endpoints, total)
+    result = {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "base_url": args.base_url, "mix": mix, "concurrency": args.concurrency,
+            "duration": args.duration, "warmup": args.warmup, "users": args.users,
+            "seed": args.seed, "workers": args.workers if args.start_app else None,
+            "catalog_sample": len(animes), "genres": len(genres),
+        },
+        "dataset": dataset,
+        "total": total,
+        "endpoints": endpoints,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nResultado salvo em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark de tráfego misto: catálogo durante uma rajada de logins.
+
+Roda duas fases com o mesmo tráfego de catálogo (/animes/top, /anime/{id},
+/animes/genres): primeiro sozinho, depois junto com clientes que só fazem
+POST /login. Com o bcrypt num pool dedicado, o p99 do catálogo deve ficar
+praticamente igual nas duas fases; os logins acima da fila recebem 503.
+
+    python benchmarks/login_storm.py --catalog-clients 32 --login-clients 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+from async_concurrency import http_request, percentile_ms
+
+CATALOG_PATHS = ("/animes/top?limit=20", "/animes/genres", "/anime/{anime_id}")
+
+
+async def open_connection(url):
+    return await asyncio.open_connection(url.hostname, url.port or 80)
+
+
+async def catalog_client(url, deadline, args, rng, latencies, errors):
+    reader, writer = await open_connection(url)
+    try:
+        while time.perf_counter() < deadline:
+            path = rng.choice(CATALOG_PATHS).format(anime_id=rng.randint(1, args.animes))
+            start = time.perf_counter()
+            try:
+                status = await http_request(reader, writer, url.netloc, "GET", path)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                errors.append(path)
+                writer.close()
+                reader, writer = await open_connection(url)
+                continue
+            latencies.append(time.perf_counter() - start)
+            if status not in (200, 404):
+                errors.append(path)
+    finally:
+        writer.close()
+
+
+async def login_client(url, deadline, args, statuses):
+    reader, writer = await open_connection(url)
+    credentials = {"username": args.username, "password": args.password}
+    try:
+        while time.perf_counter() < deadline:
+            try:
+                status = await http_request(reader, writer, url.netloc, "POST", "/login", credentials)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                status = "erro"
+                writer.close()
+                reader, writer = await open_connection(url)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def ensure_user(url, args):
+    reader, writer = await open_connection(url)
+    try:
+        # 201 na primeira vez, 400 se o usuário do benchmark já existir
+        await http_request(reader, writer, url.netloc, "POST", "/register",
+                           {"username": args.username, "password": args.password})
+    finally:
+        writer.close()
+
+
+async def run_phase(url, args, with_logins):
+    latencies, errors, statuses = [], [], {}
+    rng = random.Random(args.seed)
+    deadline = time.perf_counter() + args.duration
+    tasks = [
+        catalog_client(url, deadline, args, random.Random(rng.random()), latencies, errors)
+        for _ in range(args.catalog_clients)
+    ]
+    if with_logins:
+        tasks += [login_client(url, deadline, args, statuses) for _ in range(args.login_clients)]
+    await asyncio.gather(*tasks)
+    return latencies, errors, statuses
+
+
+async def run(args):
+    url = urlsplit(args.base_url.rstrip("/"))
+    await ensure_user(url, args)
+
+    print(f"Catálogo: {args.catalog_clients} clientes | Logins: {args.login_clients} clientes | "
+          f"{args.duration:.0f}s por fase\n")
+    print(f"{'fase':<18}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'erros':>8}   logins por status")
+    for name, with_logins in (("só catálogo", False), ("catálogo + logins", True)):
+        latencies, errors, statuses = await run_phase(url, args, with_logins)
+        logins = ", ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)) or "-"
+        print(f"{name:<18}{len(latencies) / args.duration:>10.1f}{percentile_ms(latencies, 50):>10.1f}"
+              f"{percentile_ms(latencies, 99):>10.1f}{len(errors):>8}   {logins}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--catalog-clients", type=int, default=32)
+    parser.add_argument("--login-clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=15.0, help="segundos por fase")
+    parser.add_argument("--animes", type=int, default=20000, help="anime_ids sorteados em 1..N")
+    parser.add_argument("--username", default="benchmark_login_storm")
+    parser.add_argument("--password", default="benchmark-password")
+    parser.add_argument("--seed", type=int, default=2025)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark do estado do usuário para um carrossel de animes: um par
+/user-list-status + /user-rating por anime contra um único /user-state.
+
+Usa http.client com keep-alive (só biblioteca padrão) e compara, para cada
+tamanho de lote, o tempo total de montar o estado de todos os cards.
+
+    python benchmarks/user_state_bulk.py --base-url http://localhost:8000 --user-id 1
+    python benchmarks/user_state_bulk.py --sizes 10 50 200 --rounds 20
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+def get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    body = response.read()
+    if response.status != 200:
+        raise RuntimeError(f"GET {path} -> {response.status}: {body[:200]!r}")
+    return json.loads(body)
+
+
+def per_id(conn, user_id, anime_ids):
+    for anime_id in anime_ids:
+        get(conn, f"/user-list-status/{user_id}/{anime_id}")
+        get(conn, f"/user-rating/{user_id}/{anime_id}")
+
+
+def bulk(conn, user_id, anime_ids):
+    get(conn, f"/user-state/{user_id}?anime_ids={','.join(map(str, anime_ids))}")
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--animes", type=int, default=20000, help="anime_ids sorteados em 1..N")
+    parser.add_argument("--seed", type=int, default=2025)
+    args = parser.parse_args()
+
+    url = urlsplit(args.base_url)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    rng = random.Random(args.seed)
+
+    print(f"{'ids':>6}{'por id ms':>12}{'requisições':>13}{'bulk ms':>10}{'ganho':>8}")
+    for size in args.sizes:
+        per_id_ms, bulk_ms = [], []
+        for _ in range(args.rounds):
+            anime_ids = rng.sample(range(1, args.animes + 1), size)
+            per_id_ms.append(timed(per_id, conn, args.user_id, anime_ids))
+            bulk_ms.append(timed(bulk, conn, args.user_id, anime_ids))
+        a, b = statistics.median(per_id_ms), statistics.median(bulk_ms)
+        print(f"{size:>6}{a:>12.1f}{2 * size:>13}{b:>10.1f}{a / b:>7.1f}x")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
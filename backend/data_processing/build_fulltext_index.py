@@ -0,0 +1,77 @@
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+
+# Permite reutilizar o índice BM25 da API (backend/app)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from app.fulltext import FullTextIndex, load_fulltext_documents  # noqa: E402
+
+# Configurações do Banco de Dados
+DB_NAME = "animesearch"
+DB_USER = "user"
+DB_PASSWORD = "password"
+DB_HOST = "localhost"
+
+DEFAULT_OUTPUT = os.path.join(PARENT_DIR, "search_index/fulltext")
+
+
+def get_db_connection():
+    """Estabelece conexão com o banco de dados."""
+    try:
+        conn = psycopg2.connect(
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST
+        )
+        return conn
+    except psycopg2.Error as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        return None
+
+
+def read_catalog_generation(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT generation FROM catalog_state;")
+            row = cur.fetchone()
+        return row[0] if row else None
+    except psycopg2.Error:
+        conn.rollback()
+        return None
+
+
+def build_index(output_dir):
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+
+    try:
+        print("--- Lendo sinopses e biografias do banco ---")
+        start = time.perf_counter()
+        index = FullTextIndex.build(load_fulltext_documents(conn))
+        print(f"Índice construído: {index.n_docs} documentos, {len(index.vocab)} termos, "
+              f"{len(index.doc_ids)} postings ({time.perf_counter() - start:.1f}s)")
+
+        # Com a geração registrada, a API não reconstrói o índice para o mesmo catálogo
+        index.save(output_dir, catalog_generation=read_catalog_generation(conn))
+        print(f"Índice salvo em: {output_dir}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Constrói o índice BM25 usado por /search/fulltext.")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Diretório de saída do índice")
+    args = parser.parse_args()
+
+    try:
+        build_index(args.output)
+    except Exception as e:
+        print(f"Erro fatal no processo: {e}")
@@ -0,0 +1,492 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg2
+
+from migrate import get_db_connection, run_migrations
+
+# Permite reutilizar o refresh das views materializadas da API (backend/app)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from app.materialized_views import ALL_VIEWS, refresh_materialized_views  # noqa: E402
+
+# Tamanhos prontos. "1x" é a escala do dataset do Kaggle (rating.csv): ~12 mil
+# animes, ~73 mil usuários e ~7,8 milhões de avaliações.
+SCALES = {
+    "small": {"animes": 2_000, "users": 5_000, "ratings": 200_000},
+    "1x": {"animes": 12_000, "users": 73_000, "ratings": 7_800_000},
+    "10x": {"animes": 30_000, "users": 730_000, "ratings": 78_000_000},
+    "max": {"animes": 50_000, "users": 1_000_000, "ratings": 100_000_000},
+}
+DEFAULT_OUTPUT_DIR = os.path.join(PARENT_DIR, "data", "synthetic")
+
+# Cada tabela sorteia de um fluxo próprio, derivado de (seed, fluxo[, bloco]):
+# mudar o tamanho de uma tabela não muda o conteúdo das outras, e cada bloco de
+# avaliações sai igual em qualquer reexecução (o tamanho do bloco é fixo por isso).
+STREAM_ANIMES, STREAM_GENRES, STREAM_STUDIOS, STREAM_CHARACTERS = 1, 2, 3, 4
+STREAM_USERS, STREAM_RATINGS, STREAM_ANIME_USER = 5, 6, 7
+# Usuários por bloco de avaliações (faz parte da semente: não mude sem querer mudar os dados)
+BLOCK_USERS = 10_000
+# Sorteios extras por avaliação pedida, para repor os pares repetidos descartados
+OVERSAMPLE = 1.6
+
+GENRES = [
+    (1, "Action"), (2, "Adventure"), (4, "Comedy"), (8, "Drama"), (10, "Fantasy"),
+    (14, "Horror"), (7, "Mystery"), (22, "Romance"), (24, "Sci-Fi"), (36, "Slice of Life"),
+    (30, "Sports"), (37, "Supernatural"), (41, "Suspense"), (46, "Award Winning"),
+    (47, "Gourmet"), (5, "Avant Garde"), (9, "Ecchi"), (28, "Boys Love"), (26, "Girls Love"),
+]
+TITLE_WORDS = [
+    "Sora", "Yume", "Hikari", "Kaze", "Hoshi", "Tsuki", "Kokoro", "Sekai", "Mirai", "Kage",
+    "Hana", "Umi", "Yoru", "Asa", "Tenshi", "Akuma", "Ken", "Tamashii", "Kiseki", "Densetsu",
+    "Blade", "Chronicle", "Academy", "Knight", "Dragon", "Witch", "Galaxy", "Phantom", "Code", "Requiem",
+]
+TITLE_PARTICLES = ["no", "to", "wa", "ga", "of the", "and"]
+KATAKANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン"
+FIRST_NAMES = ["Haruto", "Yuki", "Sakura", "Ren", "Aoi", "Hinata", "Sota", "Mei", "Riku", "Yui",
+               "Kaito", "Rin", "Hana", "Daiki", "Akira", "Mio", "Takumi", "Nana", "Shun", "Emi"]
+LAST_NAMES = ["Sato", "Suzuki", "Takahashi", "Tanaka", "Watanabe", "Ito", "Yamamoto", "Nakamura",
+              "Kobayashi", "Kato", "Yoshida", "Yamada", "Sasaki", "Matsumoto", "Inoue", "Kimura"]
+STUDIO_WORDS = ["Sunrise", "Bones", "Madhouse", "Pierrot", "Gainax", "Shaft", "Trigger", "Kinema",
+                "Lerche", "Silver", "White", "Orange", "Blue", "Arc", "Pine", "Zero"]
+SYNOPSIS_WORDS = [
+    "a", "young", "hero", "must", "save", "the", "world", "from", "ancient", "evil", "while",
+    "school", "life", "friends", "rival", "journey", "mysterious", "power", "city", "war", "love",
+    "secret", "family", "dream", "team", "tournament", "magic", "space", "detective", "case", "past",
+]
+TYPES = ["TV", "Movie", "OVA", "ONA", "Special"]
+SOURCES = ["Manga", "Original", "Light novel", "Web manga", "Visual novel", "Novel", "Game"]
+SEASONS = ["winter", "spring", "summer", "fall"]
+LIST_STATUSES = ["Assistidos", "Assistindo", "Assistirá"]
+# Mesma senha para todos os usuários sintéticos ("synthetic"). O hash bcrypt é
+# fixo: um salt novo a cada execução quebraria a saída determinística
+SYNTHETIC_PASSWORD = "synthetic"
+SYNTHETIC_PASSWORD_HASH = "$2b$12$VR4MFgBk3Rb4tcVM.iE6A.n.b0Uwt4fgQLh4xshBaO8yXr0eJYoVy"
+
+# Ordem de carga: tabelas referenciadas antes das junções
+TABLE_COLUMNS = {
+    "genres": ("mal_id", "name"),
+    "studios": ("mal_id", "name"),
+    "animes": ("mal_id", "title", "title_japanese", "synopsis", "episodes", "status", "rank", "score",
+               "season", "year", "image_url", "trailer_embed_url", "type", "source", "duration", "favorites"),
+    "voice_actors": ("mal_id", "name", "image_url", "birthday", "about", "language"),
+    "characters": ("mal_id", "name", "name_kanji", "nicknames", "favorites", "about", "image_url"),
+    "animes_genres": ("anime_mal_id", "genre_mal_id"),
+    "animes_studios": ("anime_mal_id", "studio_mal_id"),
+    "animes_characters": ("anime_mal_id", "character_mal_id"),
+    "characters_voice_actors": ("character_mal_id", "voice_actor_mal_id"),
+    "users": ("user_id", "username", "hashed_password"),
+    "ratings": ("user_id", "anime_id", "rating"),
+    "anime_user": ("user_id", "anime_id", "status"),
+}
+# No modo CSV as avaliações seguem o formato do rating.csv do Kaggle (insert_data_into_postgres.py)
+CSV_FILENAMES = {"ratings": "rating.csv"}
+
+
+def rng_for(seed, *stream):
+    return np.random.default_rng(np.random.SeedSequence([seed, *stream]))
+
+
+def zipf_weights(n, exponent, offset=1.0):
+    """Pesos de uma lei de potência por posição (0 = mais popular), somando 1."""
+    weights = 1.0 / np.power(np.arange(n, dtype=np.float64) + offset, exponent)
+    return weights / weights.sum()
+
+
+# -----------------
+# Catálogo (cabe em memória: no máximo dezenas de milhares de animes)
+# -----------------
+class Catalog:
+    """Animes, gêneros, estúdios, personagens e dubladores sintéticos, mais o que as avaliações usam."""
+
+    def __init__(self, args):
+        self.args = args
+        n = args.animes
+        rng = rng_for(args.seed, STREAM_ANIMES)
+        self.anime_ids = np.arange(1, n + 1, dtype=np.int64)
+        # "Qualidade" de cada anime: média das notas que ele recebe
+        self.quality = np.clip(rng.normal(7.0, 0.9, n), 2.0, 9.6)
+        # Popularidade correlacionada com a qualidade, com bastante ruído
+        popularity_key = self.quality + rng.gumbel(0.0, 1.2, n)
+        self.popularity_order = np.argsort(-popularity_key, kind="stable")
+        self.popularity_cdf = np.cumsum(zipf_weights(n, args.zipf_exponent, offset=10.0))
+        self.popularity_cdf[-1] = 1.0
+        self._anime_rng = rng
+
+    # Cada método devolve as linhas de uma tabela, na ordem das colunas de TABLE_COLUMNS
+
+    def genres(self):
+        return list(GENRES)
+
+    def studios(self):
+        rng = rng_for(self.args.seed, STREAM_STUDIOS)
+        return [
+            (i, f"{STUDIO_WORDS[rng.integers(len(STUDIO_WORDS))]} Studio {i}")
+            for i in range(1, self.args.studios + 1)
+        ]
+
+    def animes(self):
+        rng, n = self._anime_rng, self.args.animes
+        score = np.round(np.clip(self.quality + rng.normal(0.0, 0.3, n), 1.5, 9.4), 2)
+        has_score = rng.random(n) > 0.05   # ~5% sem score (ainda não lançados)
+        rank = np.empty(n, dtype=np.int64)
+        scored = np.flatnonzero(has_score)
+        rank[scored[np.argsort(-score[scored], kind="stable")]] = np.arange(1, len(scored) + 1)
+        popularity_rank = np.empty(n, dtype=np.int64)
+        popularity_rank[self.popularity_order] = np.arange(n)
+        favorites = (200_000 / (popularity_rank + 5.0)).astype(np.int64)
+
+        rows = []
+        for i, mal_id in enumerate(self.anime_ids.tolist()):
+            words = rng.choice(TITLE_WORDS, size=rng.integers(1, 4)).tolist()
+            if len(words) > 1:
+                words.insert(1, TITLE_PARTICLES[rng.integers(len(TITLE_PARTICLES))])
+            title = " ".join(words) + (f" {rng.integers(2, 5)}" if rng.random() < 0.15 else "")
+            kind = TYPES[min(int(rng.exponential(0.8)), len(TYPES) - 1)]
+            year = int(rng.integers(1970, 2026))
+            rows.append((
+                mal_id, title,
+                "".join(rng.choice(list(KATAKANA), size=rng.integers(3, 9))),
+                " ".join(rng.choice(SYNOPSIS_WORDS, size=rng.integers(30, 90))).capitalize() + ".",
+                1 if kind == "Movie" else int(rng.choice((12, 13, 24, 25, 26, 50))),
+                "Finished Airing" if has_score[i] else "Not yet aired",
+                int(rank[i]) if has_score[i] else None,
+                float(score[i]) if has_score[i] else None,
+                SEASONS[rng.integers(4)], year,
+                f"https://placehold.co/225x320?text=Anime+{mal_id}",
+                None, kind, SOURCES[rng.integers(len(SOURCES))],
+                "1 hr 45 min" if kind == "Movie" else "24 min per ep",
+                int(favorites[i]),
+            ))
+        return rows
+
+    def animes_genres(self):
+        rng = rng_for(self.args.seed, STREAM_GENRES)
+        weights = zipf_weights(len(GENRES), 0.8)
+        rows = []
+        for mal_id in self.anime_ids.tolist():
+            picked = rng.choice(len(GENRES), size=rng.integers(1, 5), replace=False, p=weights)
+            rows += [(mal_id, GENRES[g][0]) for g in sorted(picked.tolist())]
+        return rows
+
+    def animes_studios(self):
+        rng = rng_for(self.args.seed, STREAM_STUDIOS, 1)
+        n_studios = self.args.studios
+        cdf = np.cumsum(zipf_weights(n_studios, 1.0))
+        rows = []
+        for mal_id in self.anime_ids.tolist():
+            picked = np.unique(np.searchsorted(cdf, rng.random(2 if rng.random() < 0.15 else 1) * cdf[-1]))
+            rows += [(mal_id, int(s) + 1) for s in picked.tolist()]
+        return rows
+
+    def characters_and_voice_actors(self):
+        """Personagens, dubladores e as junções anime-personagem e personagem-dublador."""
+        rng = rng_for(self.args.seed, STREAM_CHARACTERS)
+        per_anime = rng.poisson(self.args.characters_per_anime, self.args.animes)
+        n_characters = int(per_anime.sum())
+        n_voice_actors = max(50, n_characters // 8)
+        va_cdf = np.cumsum(zipf_weights(n_voice_actors, 0.9, offset=5.0))
+
+        voice_actors = []
+        for va_id in range(1, n_voice_actors + 1):
+            name = f"{LAST_NAMES[rng.integers(len(LAST_NAMES))]} {FIRST_NAMES[rng.integers(len(FIRST_NAMES))]}"
+            english = rng.random() < 0.2
+            voice_actors.append((
+                va_id, name, f"https://placehold.co/225x320?text=VA+{va_id}",
+                f"{rng.integers(1950, 2005)}-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}",
+                f"{name} is a voice actor.", "English" if english else "Japanese",
+            ))
+
+        characters, anime_characters, character_vas = [], [], []
+        character_id = 0
+        for mal_id, count in zip(self.anime_ids.tolist(), per_anime.tolist()):
+            for _ in range(count):
+                character_id += 1
+                name = f"{FIRST_NAMES[rng.integers(len(FIRST_NAMES))]} {LAST_NAMES[rng.integers(len(LAST_NAMES))]}"
+                characters.append((
+                    character_id, name, None, None, int(rng.pareto(1.5) * 100),
+                    f"{name} appears in anime {mal_id}.", f"https://placehold.co/225x320?text=Char+{character_id}",
+                ))
+                anime_characters.append((mal_id, character_id))
+                n_vas = 2 if rng.random() < 0.3 else 1
+                vas = np.unique(np.searchsorted(va_cdf, rng.random(n_vas) * va_cdf[-1]))
+                character_vas += [(character_id, int(va) + 1) for va in vas.tolist()]
+        return characters, voice_actors, anime_characters, character_vas
+
+
+# -----------------
+# Usuários e avaliações (gerados em blocos; não cabem em memória nas escalas grandes)
+# -----------------
+def user_activity(args):
+    """Avaliações por usuário: cauda longa (Pareto), somando aproximadamente args.ratings."""
+    rng = rng_for(args.seed, STREAM_USERS)
+    weights = rng.pareto(args.activity_exponent, args.users) + 1.0
+    counts = np.floor(weights / weights.sum() * args.ratings).astype(np.int64)
+    # Ninguém avalia mais da metade do catálogo; todo usuário tem ao menos uma avaliação
+    return np.clip(counts, 1, max(1, args.animes // 2)), rng.normal(0.0, 0.8, args.users)
+
+
+def rating_blocks(args, catalog, counts, user_bias):
+    """(user_ids, anime_ids, ratings) por bloco de usuários, sem pares repetidos."""
+    n_animes = args.animes
+    for start in range(0, args.users, BLOCK_USERS):
+        rng = rng_for(args.seed, STREAM_RATINGS, start)
+        block_counts = counts[start:start + BLOCK_USERS]
+        # Sorteia itens pela popularidade (lei de potência) com folga, descarta os
+        # pares repetidos e fica com 'count' itens de cada usuário, em ordem aleatória
+        users = np.repeat(np.arange(start, start + len(block_counts), dtype=np.int64),
+                          np.ceil(block_counts * OVERSAMPLE).astype(np.int64))
+        positions = np.searchsorted(catalog.popularity_cdf, rng.random(len(users)))
+        items = catalog.popularity_order[np.minimum(positions, n_animes - 1)]
+        keys = np.unique(users * n_animes + items)
+        users, items = keys // n_animes, keys % n_animes
+        order = np.lexsort((rng.random(len(keys)), users))
+        users, items = users[order], items[order]
+        first = np.searchsorted(users, users)
+        keep = np.arange(len(users)) - first < counts[users]
+        users, items = users[keep], items[keep]
+        noise = rng.normal(0.0, 1.3, len(users))
+        ratings = np.clip(np.rint(catalog.quality[items] + user_bias[users] + noise), 1, 10).astype(np.int64)
+        yield users + 1, catalog.anime_ids[items], ratings
+
+
+def user_rows(args):
+    for start in range(1, args.users + 1, BLOCK_USERS):
+        yield [(user_id, f"synthetic_{user_id}", SYNTHETIC_PASSWORD_HASH)
+               for user_id in range(start, min(start + BLOCK_USERS, args.users + 1))]
+
+
+def anime_user_rows(args, catalog, counts, user_bias):
+    """Parte das avaliações também vai para a lista do usuário (mesmos blocos, fluxo próprio)."""
+    for index, (users, animes, _) in enumerate(rating_blocks(args, catalog, counts, user_bias)):
+        rng = rng_for(args.seed, STREAM_ANIME_USER, index)
+        keep = rng.random(len(users)) < args.list_fraction
+        statuses = rng.choice(len(LIST_STATUSES), size=int(keep.sum()), p=(0.7, 0.2, 0.1))
+        yield [(u, a, LIST_STATUSES[s]) for u, a, s in zip(users[keep].tolist(), animes[keep].tolist(), statuses.tolist())]
+
+
+# -----------------
+# Formatação e destino (COPY ou CSV)
+# -----------------
+def format_rows(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def format_int_columns(columns):
+    """Bloco numérico direto para CSV, bem mais rápido que o módulo csv."""
+    return "".join(",".join(map(str, row)) + "\n" for row in zip(*(c.tolist() for c in columns)))
+
+
+def format_block(block):
+    """Blocos são listas de tuplas ou, para as avaliações, uma tupla de colunas numpy."""
+    return format_int_columns(block) if isinstance(block, tuple) else format_rows(block)
+
+
+def block_len(block):
+    return len(block[0]) if isinstance(block, tuple) else len(block)
+
+
+class CopyStream:
+    """Arquivo somente-leitura que gera o CSV sob demanda para o copy_expert (sem materializar tudo)."""
+
+    def __init__(self, blocks):
+        self._blocks = iter(blocks)
+        self._buffer = b""
+        self._offset = 0
+        self.rows = 0
+
+    def read(self, size=-1):
+        while len(self._buffer) - self._offset < max(size, 1):
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            self.rows += block_len(block)
+            self._buffer = self._buffer[self._offset:] + format_block(block).encode("utf-8")
+            self._offset = 0
+        if size is None or size < 0:
+            size = len(self._buffer) - self._offset
+        chunk = self._buffer[self._offset:self._offset + size]
+        self._offset += len(chunk)
+        return chunk
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+class PostgresSink:
+    """Carrega cada tabela com COPY ... FROM STDIN, em streaming."""
+
+    def __init__(self, conn, defer_indexes):
+        self.conn = conn
+        self.defer_indexes = defer_indexes
+
+    def _drop_indexes(self, cur, table):
+        """Remove PK e índices da tabela antes de um COPY grande; devolve como recriá-los."""
+        cur.execute("""
+            SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'p';
+        """, (table,))
+        constraints = cur.fetchall()
+        cur.execute("""
+            SELECT indexname, indexdef FROM pg_indexes
+            WHERE schemaname = current_schema() AND tablename = %s
+            AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass);
+        """, (table, table))
+        indexes = cur.fetchall()
+        for name, _ in indexes:
+            cur.execute(f'DROP INDEX "{name}";')
+        for name, _ in constraints:
+            cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}";')
+        return ([f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition};' for name, definition in constraints]
+                + [definition + ";" for _, definition in indexes])
+
+    def write(self, table, blocks):
+        columns = ", ".join(TABLE_COLUMNS[table])
+        stream = CopyStream(blocks)
+        start = time.perf_counter()
+        with self.conn.cursor() as cur:
+            recreate = self._drop_indexes(cur, table) if table in self.defer_indexes else []
+            cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", stream, size=1 << 20)
+            for statement in recreate:
+                cur.execute(statement)
+        self.conn.commit()
+        print(f"[SYNTH] {table}: {stream.rows} linhas em {time.perf_counter() - start:.1f}s")
+        return stream.rows
+
+
+class CsvSink:
+    """Grava um CSV com cabeçalho por tabela em 'output_dir'."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, table, blocks):
+        path = os.path.join(self.output_dir, CSV_FILENAMES.get(table, f"{table}.csv"))
+        start, rows = time.perf_counter(), 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(TABLE_COLUMNS[table]) + "\n")
+            for block in blocks:
+                rows += block_len(block)
+                f.write(format_block(block))
+        print(f"[SYNTH] {path}: {rows} linhas em {time.perf_counter() - start:.1f}s")
+        return rows
+
+
+# -----------------
+# Main
+# -----------------
+def prepare_database(conn, truncate):
+    run_migrations(conn)
+    with conn.cursor() as cur:
+        if truncate:
+            cur.execute(f"TRUNCATE {', '.join(TABLE_COLUMNS)}, user_recommendations CASCADE;")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM animes) OR EXISTS (SELECT 1 FROM ratings);")
+            if cur.fetchone()[0]:
+                raise SystemExit("O banco já tem dados. Use --truncate para substituí-los pelos sintéticos.")
+    conn.commit()
+
+
+def finish_database(conn):
+    """Sequência de users, estatísticas, views materializadas e aviso de catálogo novo para a API."""
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("SELECT setval(pg_get_serial_sequence('users', 'user_id'), "
+                    "COALESCE((SELECT MAX(user_id) FROM users), 0) + 1, false);")
+        cur.execute("ANALYZE;")
+    conn.autocommit = False
+    try:
+        refresh_materialized_views(conn, ALL_VIEWS)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"[SYNTH] Views materializadas não atualizadas: {e}")
+    with conn.cursor() as cur:
+        cur.execute("UPDATE catalog_state SET generation = generation + 1, updated_at = now();")
+    conn.commit()
+
+
+def generate(args, sink):
+    start = time.perf_counter()
+    catalog = Catalog(args)
+    characters, voice_actors, anime_characters, character_vas = catalog.characters_and_voice_actors()
+    counts, user_bias = user_activity(args)
+
+    totals = {}
+    totals["genres"] = sink.write("genres", [catalog.genres()])
+    totals["studios"] = sink.write("studios", [catalog.studios()])
+    totals["animes"] = sink.write("animes", [catalog.animes()])
+    totals["voice_actors"] = sink.write("voice_actors", [voice_actors])
+    totals["characters"] = sink.write("characters", [characters])
+    totals["animes_genres"] = sink.write("animes_genres", [catalog.animes_genres()])
+    totals["animes_studios"] = sink.write("animes_studios", [catalog.animes_studios()])
+    totals["animes_characters"] = sink.write("animes_characters", [anime_characters])
+    totals["characters_voice_actors"] = sink.write("characters_voice_actors", [character_vas])
+    totals["users"] = sink.write("users", user_rows(args))
+    totals["ratings"] = sink.write("ratings", rating_blocks(args, catalog, counts, user_bias))
+    totals["anime_user"] = sink.write("anime_user", anime_user_rows(args, catalog, counts, user_bias))
+    print(f"[SYNTH] Concluído em {time.perf_counter() - start:.1f}s")
+    return totals
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Gera catálogo, usuários e avaliações sintéticos (lei de potência) para testes de escala."
+    )
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Tamanho pronto (sobrescrito pelos abaixo)")
+    parser.add_argument("--animes", type=int, help="Quantidade de animes")
+    parser.add_argument("--users", type=int, help="Quantidade de usuários")
+    parser.add_argument("--ratings", type=int, help="Avaliações aproximadas (até 100 milhões)")
+    parser.add_argument("--studios", type=int, default=300)
+    parser.add_argument("--characters-per-anime", type=float, default=6.0)
+    parser.add_argument("--zipf-exponent", type=float, default=1.05, help="Concentração da popularidade dos animes")
+    parser.add_argument("--activity-exponent", type=float, default=1.3, help="Cauda da atividade dos usuários (Pareto)")
+    parser.add_argument("--list-fraction", type=float, default=0.15, help="Fração das avaliações que vai para anime_user")
+    parser.add_argument("--seed", type=int, default=2025)
+    parser.add_argument("--csv", metavar="DIR", nargs="?", const=DEFAULT_OUTPUT_DIR,
+                        help="Grava CSVs em DIR em vez de carregar no Postgres")
+    parser.add_argument("--truncate", action="store_true", help="Apaga os dados atuais antes da carga")
+    parser.add_argument("--keep-rating-indexes", action="store_true",
+                        help="Não remove os índices de 'ratings' durante o COPY (mais lento em cargas grandes)")
+    args = parser.parse_args(argv)
+    for key, value in SCALES[args.scale].items():
+        if getattr(args, key) is None:
+            setattr(args, key, value)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = {k: v for k, v in vars(args).items() if k not in ("csv", "truncate", "keep_rating_indexes")}
+    print(f"[SYNTH] {json.dumps(config)}")
+
+    if args.csv:
+        totals = generate(args, CsvSink(args.csv))
+        with open(os.path.join(args.csv, "dataset.json"), "w", encoding="utf-8") as f:
+            json.dump({"config": config, "rows": totals}, f, indent=2)
+        return
+
+    conn = get_db_connection()
+    if not conn:
+        sys.exit(1)
+    try:
+        prepare_database(conn, args.truncate)
+        defer = () if args.keep_rating_indexes else ("ratings",)
+        generate(args, PostgresSink(conn, defer_indexes=defer))
+        finish_database(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
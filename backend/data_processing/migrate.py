@@ -0,0 +1,196 @@
+import argparse
+import hashlib
+import os
+import re
+
+import psycopg2
+
+# Configurações do Banco de Dados (variáveis de ambiente permitem apontar para outro banco)
+DB_NAME = os.getenv("DB_NAME", "animesearch")
+DB_USER = os.getenv("DB_USER", "user")
+DB_PASSWORD = os.getenv("DB_PASS", "password")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(SCRIPT_DIR, "migrations")
+
+# Primeira linha de uma migração que precisa rodar fora de transação
+# (ex: CREATE INDEX CONCURRENTLY)
+NO_TRANSACTION_DIRECTIVE = "-- migrate: no-transaction"
+
+# Chave do advisory lock: impede dois runners aplicando migrações ao mesmo tempo
+MIGRATION_LOCK_KEY = 724_113_001
+
+MIGRATION_FILE_RE = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+
+def get_db_connection():
+    """Estabelece conexão com o banco de dados."""
+    try:
+        conn = psycopg2.connect(
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST,
+            port=DB_PORT
+        )
+        return conn
+    except psycopg2.Error as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        return None
+
+
+class Migration:
+    def __init__(self, path):
+        match = MIGRATION_FILE_RE.match(os.path.basename(path))
+        self.version = match.group(1)
+        self.name = match.group(2)
+        self.path = path
+        with open(path, "r", encoding="utf-8") as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha1(self.sql.encode("utf-8")).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION_DIRECTIVE)
+
+    def statements(self):
+        """Divide o arquivo em comandos (necessário fora de transação: um comando por execute)."""
+        lines = [line for line in self.sql.splitlines() if not line.strip().startswith("--")]
+        return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+def discover_migrations(directory=MIGRATIONS_DIR):
+    migrations = [
+        Migration(os.path.join(directory, filename))
+        for filename in sorted(os.listdir(directory))
+        if MIGRATION_FILE_RE.match(filename)
+    ]
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Versões de migração duplicadas em {directory}")
+    return migrations
+
+
+def ensure_migrations_table(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version VARCHAR(16) PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum VARCHAR(40) NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            );
+        """)
+
+
+def applied_migrations(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM schema_migrations;")
+        return dict(cur.fetchall())
+
+
+def record_migration(cur, migration):
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s);",
+        (migration.version, migration.name, migration.checksum)
+    )
+
+
+def check_invalid_indexes(cur):
+    """Um CREATE INDEX CONCURRENTLY que falha deixa um índice INVALID para trás."""
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema();
+    """)
+    invalid = [row[0] for row in cur.fetchall()]
+    if invalid:
+        raise RuntimeError(
+            f"Índices inválidos encontrados: {', '.join(invalid)}. "
+            "Remova-os com DROP INDEX CONCURRENTLY e rode as migrações de novo."
+        )
+
+
+def apply_migration(conn, migration):
+    print(f"[MIGRATE] Aplicando {migration.version}_{migration.name}...")
+    if migration.transactional:
+        # Arquivo inteiro + registro da versão na mesma transação
+        with conn.cursor() as cur:
+            cur.execute(migration.sql)
+            record_migration(cur, migration)
+        conn.commit()
+    else:
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                for statement in migration.statements():
+                    cur.execute(statement)
+                check_invalid_indexes(cur)
+                record_migration(cur, migration)
+        finally:
+            conn.autocommit = False
+
+
+def run_migrations(conn, target=None, dry_run=False):
+    """Aplica, em ordem, as migrações ainda não registradas em schema_migrations."""
+    migrations = discover_migrations()
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_KEY,))
+    try:
+        ensure_migrations_table(conn)
+        conn.commit()
+        applied = applied_migrations(conn)
+        conn.commit()
+
+        pending = []
+        for migration in migrations:
+            if target is not None and migration.version > target:
+                break
+            if migration.version in applied:
+                if applied[migration.version] != migration.checksum:
+                    print(f"[MIGRATE] Aviso: {migration.version}_{migration.name} foi alterada "
+                          "depois de aplicada (checksum diferente).")
+                continue
+            pending.append(migration)
+
+        if not pending:
+            print("[MIGRATE] Banco já está na versão mais recente.")
+            return []
+
+        for migration in pending:
+            if dry_run:
+                print(f"[MIGRATE] Pendente: {migration.version}_{migration.name}")
+            else:
+                apply_migration(conn, migration)
+        return pending
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aplica as migrações de esquema do banco animesearch.")
+    parser.add_argument("--target", help="Para na versão indicada (ex: 0002)")
+    parser.add_argument("--dry-run", action="store_true", help="Só lista as migrações pendentes")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    if not conn:
+        return
+
+    try:
+        applied = run_migrations(conn, target=args.target, dry_run=args.dry_run)
+        if applied and not args.dry_run:
+            print(f"[MIGRATE] {len(applied)} migração(ões) aplicada(s) com sucesso!")
+    except (psycopg2.Error, RuntimeError, ValueError) as e:
+        print(f"[MIGRATE] Erro ao aplicar migrações: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+-- migrate: no-transaction
+-- Índices para as buscas "ao contrário" nas tabelas de junção e para o ORDER BY score.
+-- CONCURRENTLY não trava escritas em bancos já em produção, mas não pode rodar
+-- dentro de uma transação; por isso esta migração roda em autocommit.
+
+-- /voice-actor/{mal_id}: personagens de um dublador
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_characters_voice_actors_voice_actor
+    ON characters_voice_actors (voice_actor_mal_id);
+
+-- /character/{mal_id}/animes: animes de um personagem
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_characters_character
+    ON animes_characters (character_mal_id);
+
+-- /animes/genre/{genre_name} e fallback: animes de um gênero
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_genres_genre
+    ON animes_genres (genre_mal_id);
+
+-- Avaliações de um anime (treino, popularidade)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_ratings_anime
+    ON ratings (anime_id);
+
+-- /animes/top, fallback e candidatos: só animes com nota, do maior para o menor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_score_desc
+    ON animes (score DESC) WHERE score IS NOT NULL;
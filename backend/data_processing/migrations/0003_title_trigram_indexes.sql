@@ -0,0 +1,12 @@
+-- migrate: no-transaction
+-- Índices GIN de trigramas para o LIKE '%q%' dos títulos (usado enquanto o
+-- índice em memória da API ainda não está pronto e por consultas administrativas).
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- As consultas usam LOWER(title) LIKE ..., então o índice é sobre a expressão
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_title_trgm
+    ON animes USING gin (LOWER(title) gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_title_japanese_trgm
+    ON animes USING gin (title_japanese gin_trgm_ops);
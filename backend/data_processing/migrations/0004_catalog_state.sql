@@ -0,0 +1,9 @@
+-- Contador de geração do catálogo. O populate_db.py incrementa ao terminar uma
+-- ingestão e a API usa a mudança para invalidar caches e reconstruir índices.
+CREATE TABLE IF NOT EXISTS catalog_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    generation BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+INSERT INTO catalog_state (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,10 @@
+-- migrate: no-transaction
+-- Paginação por cursor (keyset) das listagens: a ordem (score DESC, mal_id DESC)
+-- precisa vir inteira do índice para que "a próxima página depois de (score, mal_id)"
+-- seja uma descida no B-tree, sem ordenar nem pular as páginas anteriores.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_animes_score_mal_id
+    ON animes (score DESC, mal_id DESC) WHERE score IS NOT NULL;
+
+-- Substituído pelo índice acima (mesmo prefixo)
+DROP INDEX CONCURRENTLY IF EXISTS idx_animes_score_desc;
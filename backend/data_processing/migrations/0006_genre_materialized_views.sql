@@ -0,0 +1,39 @@
+-- Views materializadas das leituras por gênero. As consultas de /animes/genre/{nome}
+-- e do fallback de recomendação deixam de juntar animes x animes_genres x genres
+-- e ordenar por score a cada chamada. Os índices únicos permitem
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY (leitores não são bloqueados); quem
+-- atualiza é o populate_db.py, ao fim da ingestão, e o agendador da API.
+
+-- Ranking de cada gênero por score (só animes com score, como nas listagens)
+CREATE MATERIALIZED VIEW IF NOT EXISTS genre_anime_rankings AS
+SELECT g.mal_id AS genre_mal_id,
+       g.name AS genre_name,
+       a.mal_id,
+       a.title,
+       a.image_url,
+       a.score
+FROM animes a
+JOIN animes_genres ag ON a.mal_id = ag.anime_mal_id
+JOIN genres g ON ag.genre_mal_id = g.mal_id
+WHERE a.score IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_genre_anime_rankings
+    ON genre_anime_rankings (genre_mal_id, mal_id);
+
+-- Paginação por cursor dentro do gênero: (score, mal_id) < (...) descendo o índice
+CREATE INDEX IF NOT EXISTS idx_genre_anime_rankings_name_score
+    ON genre_anime_rankings (genre_name, score DESC, mal_id DESC);
+
+-- Afinidade usuário x gênero: quantos animes do gênero o usuário avaliou com nota >= 7
+CREATE MATERIALIZED VIEW IF NOT EXISTS user_genre_affinity AS
+SELECT r.user_id,
+       g.name AS genre_name,
+       COUNT(*) AS likes
+FROM ratings r
+JOIN animes_genres ag ON r.anime_id = ag.anime_mal_id
+JOIN genres g ON ag.genre_mal_id = g.mal_id
+WHERE r.rating >= 7
+GROUP BY r.user_id, g.name;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_genre_affinity
+    ON user_genre_affinity (user_id, genre_name);
@@ -0,0 +1,28 @@
+-- Log append-only das mudanças de nota. /rate-anime, /remove-rating e
+-- /remove-from-list (e o flush do write-behind) gravam um evento na mesma
+-- transação da escrita em 'ratings'; treino, caches e contadores leem só o que
+-- mudou desde o último offset em vez de reler a tabela inteira.
+
+CREATE TABLE IF NOT EXISTS rating_events (
+    event_id BIGSERIAL PRIMARY KEY,
+    -- Transação que gravou o evento: os consumidores só leem eventos de
+    -- transações já encerradas, então um event_id menor que chega atrasado
+    -- (commit depois de um maior) nunca é pulado
+    txid BIGINT NOT NULL DEFAULT txid_current(),
+    user_id INT NOT NULL,
+    anime_id INT NOT NULL,
+    rating INT,  -- NULL = nota removida
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Ordem de leitura dos consumidores
+CREATE INDEX IF NOT EXISTS idx_rating_events_position
+    ON rating_events (txid, event_id);
+
+-- Offset de cada consumidor durável (posição do último evento processado)
+CREATE TABLE IF NOT EXISTS rating_event_consumers (
+    name VARCHAR(100) PRIMARY KEY,
+    last_txid BIGINT NOT NULL DEFAULT 0,
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,8 @@
+-- Última atualização de cada view materializada. Com vários workers da API,
+-- quem pega o advisory lock confere a idade aqui e só atualiza se a última
+-- rodada (de qualquer worker ou da ingestão) for mais antiga que o intervalo.
+CREATE TABLE IF NOT EXISTS matview_refresh_log (
+    view_name VARCHAR(100) PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL,
+    duration_ms DOUBLE PRECISION NOT NULL
+);
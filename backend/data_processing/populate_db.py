@@ -4,6 +4,12 @@ import psycopg2
 from psycopg2.extras import execute_values
 import json
 import os
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(SCRIPT_DIR))
+
+from app.materialized_views import ALL_VIEWS, refresh_materialized_views  # noqa: E402
 
 # -----------------
 # Configurações do Banco de Dados
@@ -368,6 +374,29 @@ def process_anime(cursor, anime_id):
                 # Cria a relação personagem - dublador
                 insert_junction(cursor, 'characters_voice_actors', character_id=char_id, related_id=va_id)
 
+def bump_catalog_generation(conn):
+    """Avisa a API (caches HTTP, índices de busca) que o catálogo mudou."""
+    try:
+        conn.rollback()  # descarta um anime que ficou pela metade
+        with conn.cursor() as cur:
+            cur.execute("UPDATE catalog_state SET generation = generation + 1, updated_at = now() RETURNING generation;")
+            row = cur.fetchone()
+        conn.commit()
+        if row:
+            print(f"[MAIN] Geração do catálogo: {row[0]}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"[MAIN] Não foi possível atualizar a geração do catálogo: {e}")
+
+def refresh_views(conn):
+    """Atualiza as views materializadas (rankings por gênero, afinidade) com o catálogo novo."""
+    try:
+        timings = refresh_materialized_views(conn, ALL_VIEWS)
+        for view, seconds in timings.items():
+            print(f"[MAIN] View {view} atualizada em {seconds:.1f}s")
+    except psycopg2.Error as e:
+        print(f"[MAIN] Não foi possível atualizar as views materializadas: {e}")
+
 # -----------------
 # Main
 # -----------------
@@ -409,6 +438,10 @@ def main():
     finally:
         if conn:
             cursor.close()
+            # Mesmo se a ingestão for interrompida, o que já foi gravado precisa aparecer na API.
+            # As views vêm antes da geração: a API reconstrói os rankings lendo delas.
+            refresh_views(conn)
+            bump_catalog_generation(conn)
             conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,157 @@
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import psycopg2
+from surprise import dump
+
+# Permite reutilizar o SVDScorer da API (backend/app)
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from app.recommender import SVDScorer, model_version_for  # noqa: E402
+from app.model_registry import latest_model_path  # noqa: E402
+
+# Configurações do Banco de Dados
+DB_NAME = "animesearch"
+DB_USER = "user"
+DB_PASSWORD = "password"
+DB_HOST = "localhost"
+
+# Mesma versão que a API carrega: a mais nova de model_machine_learning/versions/
+DEFAULT_MODEL = latest_model_path(os.path.join(PARENT_DIR, "model_machine_learning"))
+
+# Estado compartilhado com os processos filhos (herdado via fork, sem re-pickle)
+_scorer = None
+_rated_inner = None
+_allowed_items = None
+_top_n = None
+
+
+def get_db_connection():
+    """Estabelece conexão com o banco de dados."""
+    try:
+        conn = psycopg2.connect(
+            dbname=DB_NAME,
+            user=DB_USER,
+            password=DB_PASSWORD,
+            host=DB_HOST
+        )
+        return conn
+    except psycopg2.Error as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        return None
+
+
+def load_catalog_ids(conn):
+    """IDs de todos os animes do catálogo (só eles podem ser recomendados)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT mal_id FROM animes;")
+        return {row[0] for row in cur.fetchall()}
+
+
+def score_block(inner_user_ids):
+    """Calcula o Top-N de um bloco de usuários (roda nos processos filhos)."""
+    anime_ids, scores = _scorer.top_n_block(
+        inner_user_ids,
+        _top_n,
+        rated_inner=[_rated_inner[u] for u in inner_user_ids],
+        allowed_items=_allowed_items,
+    )
+
+    # Serializa já no formato do COPY para aliviar o processo principal
+    buf = io.StringIO()
+    for row, inner_uid in enumerate(inner_user_ids):
+        raw_uid = _scorer.user_raw_ids[inner_uid]
+        rank = 0
+        for anime_id, est in zip(anime_ids[row], scores[row]):
+            if not np.isfinite(est):
+                break
+            rank += 1
+            buf.write(f"{raw_uid}\t{anime_id}\t{rank}\t{est:.4f}\n")
+    return len(inner_user_ids), buf.getvalue()
+
+
+def precompute(model_path, top_n, block_size, workers):
+    global _scorer, _rated_inner, _allowed_items, _top_n
+
+    print(f"--- Carregando modelo: {model_path} ---")
+    _, algo = dump.load(model_path)
+    model_version = model_version_for(model_path)
+    trainset = algo.trainset
+
+    _scorer = SVDScorer.from_surprise(algo)
+    _rated_inner = [np.fromiter((iid for iid, _ in trainset.ur[u]), dtype=np.int64)
+                    for u in range(trainset.n_users)]
+    _top_n = top_n
+
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+
+    try:
+        catalog_ids = load_catalog_ids(conn)
+        _allowed_items = np.isin(_scorer.item_raw_ids, list(catalog_ids))
+        print(f"Versão do modelo: {model_version} | Usuários: {trainset.n_users} | "
+              f"Itens no catálogo: {int(_allowed_items.sum())}/{_scorer.n_items}")
+
+        cur = conn.cursor()
+        # Regera a versão do zero (o job pode ser rodado de novo com o mesmo modelo)
+        cur.execute("DELETE FROM user_recommendations WHERE model_version = %s;", (model_version,))
+
+        blocks = [list(range(start, min(start + block_size, trainset.n_users)))
+                  for start in range(0, trainset.n_users, block_size)]
+
+        copy_sql = (
+            "COPY user_recommendations (user_id, anime_id, rank, predicted_rating, model_version) "
+            "FROM STDIN WITH (FORMAT text)"
+        )
+
+        start_time = time.perf_counter()
+        users_done = 0
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(processes=workers) as pool:
+            for n_users, payload in pool.imap_unordered(score_block, blocks):
+                # model_version é constante; adiciona a coluna aqui para não repetir nos filhos
+                lines = payload.replace("\n", f"\t{model_version}\n")
+                cur.copy_expert(copy_sql, io.StringIO(lines))
+
+                users_done += n_users
+                elapsed = time.perf_counter() - start_time
+                print(f"[BATCH] {users_done}/{trainset.n_users} usuários "
+                      f"({users_done / elapsed:.1f} usuários/s)")
+
+        # Remove recomendações de modelos antigos só depois que a nova versão está completa
+        cur.execute("DELETE FROM user_recommendations WHERE model_version <> %s;", (model_version,))
+        conn.commit()
+
+        elapsed = time.perf_counter() - start_time
+        print("------------------------------------------------")
+        print(f"SUCESSO! {users_done} usuários em {elapsed:.1f}s "
+              f"({users_done / elapsed:.1f} usuários/s), Top-{top_n} por usuário.")
+        print("------------------------------------------------")
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pré-calcula o Top-N de recomendações de todos os usuários do modelo SVD.")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Caminho do modelo .pkl")
+    parser.add_argument("--top-n", type=int, default=100, help="Recomendações guardadas por usuário")
+    parser.add_argument("--block-size", type=int, default=512, help="Usuários pontuados por bloco")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processos de cálculo")
+    args = parser.parse_args()
+
+    try:
+        precompute(args.model, args.top_n, args.block_size, args.workers)
+    except Exception as e:
+        print(f"Erro fatal no processo: {e}")
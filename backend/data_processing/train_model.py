@@ -1,8 +1,21 @@
+import argparse
 import os
+import sys
+import time
+
+import numpy as np
 import pandas as pd
 import psycopg2
 from surprise import Reader, Dataset, SVD, dump
 
+# Permite reutilizar o SVDScorer da API (backend/app) para exportar o artefato
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PARENT_DIR = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PARENT_DIR)
+
+from app.recommender import SVDScorer, model_version_for  # noqa: E402
+from app.rating_events import RatingEventConsumer  # noqa: E402
+
 # Configurações do Banco de Dados
 # (Mesmas credenciais que você usou nos outros scripts)
 DB_NAME = "animesearch"
@@ -24,12 +37,13 @@ def get_db_connection():
         print(f"Erro ao conectar ao banco de dados: {e}")
         return None
 
-def load_data_from_db():
-    print("--- Conectando ao Banco de Dados para buscar Ratings ---")
-    conn = get_db_connection()
-    if not conn:
-        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+# Consumidor do log 'rating_events' usado no modo --incremental
+EVENT_CONSUMER_NAME = "train_model"
+# Cópia local das avaliações usadas no último treino (atualizada pelos eventos)
+RATINGS_SNAPSHOT = "ratings_snapshot.pkl"
 
+def load_data_from_db(conn):
+    print("--- Conectando ao Banco de Dados para buscar Ratings ---")
     try:
         # Query otimizada: Já filtramos os ratings -1 aqui mesmo no SQL
         # Isso economiza memória e processamento no Python
@@ -48,6 +62,74 @@ def load_data_from_db():
     except Exception as e:
         print(f"Erro ao executar a query: {e}")
         raise e
+
+def load_full_ratings():
+    """Relê a tabela 'ratings' inteira (sem cópia local nem consumidor do log)."""
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+    try:
+        return load_data_from_db(conn)
+    finally:
+        conn.close()
+
+def apply_rating_events(df_ratings, events):
+    """Aplica ao DataFrame o valor final de cada par (user_id, anime_id) que mudou."""
+    changes = pd.DataFrame([(e.user_id, e.anime_id, e.rating) for e in events],
+                           columns=["user_id", "anime_id", "rating"])
+    changes = changes.drop_duplicates(["user_id", "anime_id"], keep="last")
+
+    keys = ["user_id", "anime_id"]
+    changed = pd.MultiIndex.from_frame(df_ratings[keys]).isin(pd.MultiIndex.from_frame(changes[keys]))
+    # Notas removidas (None) e -1 ficam de fora, como na query completa
+    upserts = changes[changes["rating"].notna() & (changes["rating"] != -1)]
+    upserts = upserts.astype(df_ratings.dtypes.to_dict())
+    return pd.concat([df_ratings[~changed], upserts], ignore_index=True)
+
+def load_ratings_incremental(snapshot_path):
+    """
+    Avaliações para o treino no modo --incremental: parte da cópia salva no
+    último treino e aplica só os eventos de 'rating_events' desde então. Sem
+    cópia, relê a tabela inteira e marca o fim do log como ponto de partida da
+    próxima rodada. Retorna (DataFrame, consumidor com a posição ainda não confirmada).
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+
+    try:
+        consumer = RatingEventConsumer(EVENT_CONSUMER_NAME, batch_size=50_000).open(conn)
+        if os.path.exists(snapshot_path):
+            df_ratings = pd.read_pickle(snapshot_path)
+            applied = 0
+            while True:
+                events = consumer.poll(conn)
+                if not events:
+                    break
+                df_ratings = apply_rating_events(df_ratings, events)
+                applied += len(events)
+            print(f"Cópia local + {applied} eventos de nota. Total de avaliações: {len(df_ratings)}")
+        else:
+            print(f"Cópia '{snapshot_path}' não encontrada; lendo a tabela inteira.")
+            # Posição antes da leitura: eventos que chegarem durante ela são
+            # reaplicados na próxima rodada, o que não muda o resultado
+            consumer.seek_to_head(conn)
+            df_ratings = load_data_from_db(conn)
+        return df_ratings, consumer
+    finally:
+        conn.close()
+
+def save_ratings_snapshot(df_ratings, consumer, snapshot_path):
+    """Grava a cópia local e só então confirma o offset do consumidor."""
+    tmp_path = snapshot_path + ".tmp"
+    df_ratings.to_pickle(tmp_path)
+    os.replace(tmp_path, snapshot_path)
+
+    conn = get_db_connection()
+    if not conn:
+        raise ConnectionError("Não foi possível conectar ao banco de dados.")
+    try:
+        consumer.commit(conn)
     finally:
         conn.close()
 
@@ -78,31 +160,60 @@ def train_model(rating_df):
     
     return algo
 
-def save_model(algo, output_path):
-    print(f"--- Salvando modelo em: {output_path} ---")
-    
-    # Garante que a pasta existe
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    dump.dump(output_path, predictions=None, algo=algo)
-    print("Modelo salvo com sucesso!")
+def save_model(algo, model_dir, float16=False):
+    """
+    Grava o modelo numa pasta nova em <model_dir>/versions/<AAAAMMDD-HHMMSS>/:
+    o .pkl do Surprise (usado pelos jobs batch) e o artefato .npy + manifest.json
+    que a API abre com mmap. A API observa essa pasta e troca para a versão nova
+    sem reiniciar; a gravação acontece num diretório temporário ('.' no início)
+    renomeado só no fim, para que a API nunca veja um modelo pela metade.
+    """
+    label = time.strftime("%Y%m%d-%H%M%S")
+    versions_dir = os.path.join(model_dir, "versions")
+    tmp_dir = os.path.join(versions_dir, f".{label}.tmp")
+    final_dir = os.path.join(versions_dir, label)
+    print(f"--- Salvando modelo em: {final_dir} ---")
+
+    os.makedirs(tmp_dir, exist_ok=True)
+    pickle_path = os.path.join(tmp_dir, "recommendation_ml.pkl")
+    dump.dump(pickle_path, predictions=None, algo=algo)
+
+    # Mesma versão (hash do .pkl) que o job de pré-cálculo grava em 'user_recommendations'
+    dtype = np.float16 if float16 else np.float32
+    SVDScorer.from_surprise(algo).save(tmp_dir, dtype=dtype, model_version=model_version_for(pickle_path))
+    print(f"Artefato mmap exportado ({np.dtype(dtype).name}).")
+
+    os.rename(tmp_dir, final_dir)
+    print(f"Modelo salvo com sucesso! (versão {label})")
+    return final_dir
 
 if __name__ == "__main__":
-    # 1. Pega o diretório onde este script está (ex: .../backend/scripts)
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    
-    # 2. Sobe um nível para o diretório pai (ex: .../backend)
-    PARENT_DIR = os.path.dirname(SCRIPT_DIR)
-    
-    # 3. Aponta para a pasta irmã (ex: .../backend/model_machine_learning/...)
-    MODEL_OUTPUT = os.path.join(PARENT_DIR, "model_machine_learning/recommendation_ml.pkl")
+    parser = argparse.ArgumentParser(description="Treina o SVD com as avaliações do banco e publica uma nova versão do modelo.")
+    parser.add_argument("--float16", action="store_true",
+                        help="Exporta os fatores e vieses dos usuários em float16 (menos disco e memória "
+                             "mapeada, menos precisão); os fatores dos itens continuam em float32")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Atualiza a cópia local das avaliações com o log 'rating_events' "
+                             "em vez de reler a tabela inteira (grava a cópia em disco e registra "
+                             "o consumidor 'train_model', que segura a compactação do log)")
+    args = parser.parse_args()
 
-    print(f"--- O modelo será salvo em: {MODEL_OUTPUT} ---")
+    # Aponta para a pasta irmã (ex: .../backend/model_machine_learning/versions/...)
+    MODEL_DIR = os.path.join(PARENT_DIR, "model_machine_learning")
+
+    print(f"--- O modelo será salvo em: {MODEL_DIR}/versions/ ---")
+
+    snapshot_path = os.path.join(MODEL_DIR, RATINGS_SNAPSHOT)
 
     try:
-        # 1. Carregar dados do Postgres
-        df_ratings = load_data_from_db()
-        
+        # 1. Carregar dados do Postgres (inteiros ou só as mudanças desde o último treino)
+        if args.incremental:
+            df_ratings, consumer = load_ratings_incremental(snapshot_path)
+            os.makedirs(MODEL_DIR, exist_ok=True)
+            save_ratings_snapshot(df_ratings, consumer, snapshot_path)
+        else:
+            df_ratings = load_full_ratings()
+
         if df_ratings.empty:
             print("Aviso: A tabela 'ratings' está vazia ou só tem ratings -1. O treino foi abortado.")
         else:
@@ -110,7 +221,7 @@ if __name__ == "__main__":
             model = train_model(df_ratings)
             
             # 3. Salvar
-            save_model(model, MODEL_OUTPUT)
+            save_model(model, MODEL_DIR, float16=args.float16)
         
     except Exception as e:
         print(f"Erro fatal no processo: {e}")
\ No newline at end of file
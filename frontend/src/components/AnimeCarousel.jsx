@@ -5,8 +5,9 @@ import '../styles/animeCarousel.css';
 /**
  * AnimeCarousel
  * Agora com persistência de posição usando localStorage
+ * e carregamento da próxima página (onLoadMore) ao chegar perto do fim
  */
-const AnimeCarousel = ({ animes, storageKey }) => { 
+const AnimeCarousel = ({ animes, storageKey, hasMore = false, onLoadMore }) => { 
   const viewportRef = useRef(null);
   const trackRef = useRef(null);
   
@@ -50,6 +51,11 @@ const AnimeCarousel = ({ animes, storageKey }) => {
       const fullItem = itemWidth + GAP_PX;
       const itemsPerPage = Math.max(1, Math.floor(vp.clientWidth / fullItem));
       setPageScrollWidth(itemsPerPage * fullItem);
+
+      // Falta menos de uma tela para o fim: pede a próxima página
+      if (hasMore && onLoadMore && vp.scrollLeft + 2 * vp.clientWidth >= track.scrollWidth) {
+        onLoadMore();
+      }
     };
 
     // Roda update inicial
@@ -80,7 +86,7 @@ const AnimeCarousel = ({ animes, storageKey }) => {
       vp.removeEventListener('scroll', onScroll);
       if (saveTimeoutRef.current) clearTimeout(saveTimeoutRef.current);
     };
-  }, [animes, storageKey]);
+  }, [animes, storageKey, hasMore, onLoadMore]);
 
   const scrollByPage = (dir = 1) => {
     const vp = viewportRef.current;
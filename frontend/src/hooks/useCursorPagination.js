@@ -0,0 +1,59 @@
+import { useState, useEffect, useRef, useCallback } from 'react';
+
+const withCursor = (url, cursor) =>
+    cursor ? `${url}${url.includes('?') ? '&' : '?'}cursor=${encodeURIComponent(cursor)}` : url;
+
+/**
+ * useCursorPagination
+ * Carrega uma listagem paginada por cursor ({ items, next_cursor }) e acumula as
+ * páginas seguintes a cada loadMore(). Quando a URL muda, recomeça da primeira
+ * página; com url nula a lista fica vazia.
+ */
+const useCursorPagination = (url) => {
+    const [items, setItems] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loading, setLoading] = useState(false);
+    const loadingRef = useRef(false);
+    const urlRef = useRef(url);
+
+    const fetchPage = useCallback(async (cursor) => {
+        const requestUrl = urlRef.current;
+        if (!requestUrl) return;
+        loadingRef.current = true;
+        setLoading(true);
+        try {
+            const res = await fetch(withCursor(requestUrl, cursor));
+            if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
+            const page = await res.json();
+            // A listagem mudou enquanto a página carregava: descarta
+            if (urlRef.current !== requestUrl) return;
+            setItems(prev => (cursor ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.next_cursor);
+        } catch (error) {
+            console.error('Erro ao carregar a listagem:', error);
+            if (!cursor) setItems([]);
+            setNextCursor(null);
+        } finally {
+            loadingRef.current = false;
+            setLoading(false);
+        }
+    }, []);
+
+    useEffect(() => {
+        urlRef.current = url;
+        setNextCursor(null);
+        if (url) {
+            fetchPage(null);
+        } else {
+            setItems([]);
+        }
+    }, [url, fetchPage]);
+
+    const loadMore = useCallback(() => {
+        if (nextCursor && !loadingRef.current) fetchPage(nextCursor);
+    }, [nextCursor, fetchPage]);
+
+    return { items, hasMore: Boolean(nextCursor), loading, loadMore };
+};
+
+export default useCursorPagination;
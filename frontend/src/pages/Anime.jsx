@@ -33,16 +33,14 @@ const Anime = () => {
                 }
 
                 if (userId) {
-                    const listStatusRes = await fetch(`${API_BASE_URL}/user-list-status/${userId}/${id}`);
-                    if (listStatusRes.ok) {
-                        const listData = await listStatusRes.json();
-                        setIsAddedToList(listData.is_in_list);
-                    }
-
-                    const ratingRes = await fetch(`${API_BASE_URL}/user-rating/${userId}/${id}`);
-                    if (ratingRes.ok) {
-                        const ratingData = await ratingRes.json();
-                        setUserRating(ratingData.rating);
+                    // Lista e nota do usuário em uma só requisição
+                    const stateRes = await fetch(`${API_BASE_URL}/user-state/${userId}?anime_ids=${id}`);
+                    if (stateRes.ok) {
+                        const [state] = await stateRes.json();
+                        if (state) {
+                            setIsAddedToList(state.is_in_list);
+                            setUserRating(state.rating);
+                        }
                     }
                 }
             } catch (error) {
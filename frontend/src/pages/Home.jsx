@@ -4,6 +4,7 @@ import SearchBar from '../components/SearchBar';
 import AnimeCarousel from '../components/AnimeCarousel';
 import GenreSelect from '../components/GenreSelect';
 import LimitInput from '../components/LimitInput';
+import useCursorPagination from '../hooks/useCursorPagination';
 import '../styles/categorie.css';
 import '../styles/limitInput.css';
 
@@ -20,10 +21,6 @@ const loadLimit = (key, defaultValue) => {
 const Home = () => {
     const API_BASE_URL = 'http://localhost:8000';
 
-    const [bestAnimes, setBestAnimes] = useState([]);
-    const [genreAnimes, setGenreAnimes] = useState([]);
-    const [searchResults, setSearchResults] = useState([]);
-    
     // Estado inicial da busca
     const [search, setSearch] = useState(() => localStorage.getItem('animeSearch') || '');
     const [searchTerm, setSearchTerm] = useState(() => localStorage.getItem('animeSearch') || '');
@@ -41,13 +38,20 @@ const Home = () => {
     useEffect(() => { localStorage.setItem('genreAnimesLimit', genreAnimesLimit.toString()); }, [genreAnimesLimit]);
     useEffect(() => { localStorage.setItem('searchResultsLimit', searchResultsLimit.toString()); }, [searchResultsLimit]);
 
-    // Carregamento inicial (Top Animes + Generos + Busca Salva)
+    // Listagens paginadas por cursor: o limite é o tamanho de cada página e
+    // os carrosséis pedem a próxima ao chegar perto do fim
+    const bestAnimes = useCursorPagination(`${API_BASE_URL}/animes/top?limit=${topAnimesLimit}`);
+    const genreAnimes = useCursorPagination(
+        selectedGenre ? `${API_BASE_URL}/animes/genre/${encodeURIComponent(selectedGenre)}?limit=${genreAnimesLimit}` : null
+    );
+    const searchResults = useCursorPagination(
+        searchTerm.trim() ? `${API_BASE_URL}/animes/search?q=${encodeURIComponent(searchTerm.trim())}&limit=${searchResultsLimit}` : null
+    );
+
+    // Carregamento inicial (Generos + Busca Salva)
     useEffect(() => {
         const fetchInitialData = async () => {
             try {
-                const resTop = await fetch(`${API_BASE_URL}/animes/top?limit=${topAnimesLimit}`);
-                setBestAnimes(await resTop.json());
-                
                 const resGenres = await fetch(`${API_BASE_URL}/animes/genres`);
                 const jsonGenres = await resGenres.json();
                 setGenres(jsonGenres);
@@ -63,8 +67,6 @@ const Home = () => {
                 if (savedSearch) {
                     setSearchTerm(savedSearch);
                     setSearch(savedSearch);
-                    // Não chamamos handleSearch aqui para evitar loop ou dupla chamada, 
-                    // o useEffect de [searchTerm] cuidará disso se necessário ou chamada direta.
                 }
                 
             } catch (error) {
@@ -72,59 +74,23 @@ const Home = () => {
             }
         };
         fetchInitialData();
-    }, [topAnimesLimit]); // Dependência apenas do limite para recarregar se ele mudar
+    }, []);
     
     // Persistência do gênero
     useEffect(() => { if (selectedGenre) localStorage.setItem('selectedGenre', selectedGenre); }, [selectedGenre]);
     
-    // Executa a busca quando searchTerm ou limite mudam
-    useEffect(() => {
-        const fetchSearchResults = async () => {
-            const searchValue = searchTerm.trim();
-            if (searchValue) {
-                try {
-                    const res = await fetch(`${API_BASE_URL}/animes/search?q=${encodeURIComponent(searchValue)}&limit=${searchResultsLimit}`);
-                    if (!res.ok) throw new Error(`HTTP error! status: ${res.status}`);
-                    
-                    const json = await res.json();
-                    setSearchResults(json);
-                    localStorage.setItem('animeSearch', searchValue);
-                } catch (error) {
-                    console.error('Erro ao buscar animes:', error);
-                    setSearchResults([]);
-                }
-            } else {
-                setSearchResults([]);
-                localStorage.removeItem('animeSearch');
-            }
-        };
-
-        // Só busca se houver termo (evita buscar vazio na montagem se não tiver nada salvo)
-        if (searchTerm) fetchSearchResults();
-
-    }, [searchTerm, searchResultsLimit]);
-
-    // Busca por Gênero
+    // Persistência da busca
     useEffect(() => {
-        if (!selectedGenre) return;
-        const fetchGenreAnimes = async () => {
-            try {
-                const res = await fetch(`${API_BASE_URL}/animes/genre/${encodeURIComponent(selectedGenre)}?limit=${genreAnimesLimit}`);
-                setGenreAnimes(await res.json());
-            } catch (error) {
-                console.error('Erro ao buscar animes por gênero:', error);
-            }
-        };
-        fetchGenreAnimes();
-    }, [selectedGenre, genreAnimesLimit]);
-
-    const handleSearch = (term) => {
-        const searchValue = term.trim();
-        setSearchTerm(searchValue); // Isso disparará o useEffect da busca
-        if (!searchValue) {
-            setSearchResults([]);
+        const searchValue = searchTerm.trim();
+        if (searchValue) {
+            localStorage.setItem('animeSearch', searchValue);
+        } else {
             localStorage.removeItem('animeSearch');
         }
+    }, [searchTerm]);
+
+    const handleSearch = (term) => {
+        setSearchTerm(term.trim()); // Isso trocará a URL da busca paginada
     };
 
     return (
@@ -136,15 +102,17 @@ const Home = () => {
                 onSearch={handleSearch}
             />
 
-            {searchResults.length > 0 ? (
+            {searchResults.items.length > 0 ? (
                 <>
                     <div className="title-container">
                         <h2 className="title">Search Results for: '{searchTerm}'</h2>
                         <LimitInput label="Show" value={searchResultsLimit} onChange={setSearchResultsLimit} />
                     </div>
                     <AnimeCarousel 
-                        animes={searchResults} 
+                        animes={searchResults.items} 
                         storageKey="carousel-search-results" 
+                        hasMore={searchResults.hasMore}
+                        onLoadMore={searchResults.loadMore}
                     />
 
                     <div className="title-container">
@@ -152,8 +120,10 @@ const Home = () => {
                         <LimitInput label="Show" value={topAnimesLimit} onChange={setTopAnimesLimit} />
                     </div>
                     <AnimeCarousel 
-                        animes={bestAnimes} 
+                        animes={bestAnimes.items} 
                         storageKey="carousel-best-animes" 
+                        hasMore={bestAnimes.hasMore}
+                        onLoadMore={bestAnimes.loadMore}
                     />
 
                     <GenreSelect
@@ -167,8 +137,10 @@ const Home = () => {
                         <LimitInput label="Show" value={genreAnimesLimit} onChange={setGenreAnimesLimit} />
                     </div>
                     <AnimeCarousel 
-                        animes={genreAnimes} 
+                        animes={genreAnimes.items} 
                         storageKey={`carousel-genre-${selectedGenre}`} 
+                        hasMore={genreAnimes.hasMore}
+                        onLoadMore={genreAnimes.loadMore}
                     />
                 </>
             ) : (
@@ -178,8 +150,10 @@ const Home = () => {
                         <LimitInput label="Show" value={topAnimesLimit} onChange={setTopAnimesLimit} />
                     </div>
                     <AnimeCarousel 
-                        animes={bestAnimes} 
+                        animes={bestAnimes.items} 
                         storageKey="carousel-best-animes" 
+                        hasMore={bestAnimes.hasMore}
+                        onLoadMore={bestAnimes.loadMore}
                     />
 
                     <GenreSelect
@@ -193,8 +167,10 @@ const Home = () => {
                         <LimitInput label="Show" value={genreAnimesLimit} onChange={setGenreAnimesLimit} />
                     </div>
                     <AnimeCarousel 
-                        animes={genreAnimes} 
+                        animes={genreAnimes.items} 
                         storageKey={`carousel-genre-${selectedGenre}`} 
+                        hasMore={genreAnimes.hasMore}
+                        onLoadMore={genreAnimes.loadMore}
                     />
                 </>
             )}
@@ -5,6 +5,7 @@ import SearchBar from '../components/SearchBar';
 import AnimeCarousel from '../components/AnimeCarousel';
 import LimitInput from '../components/LimitInput';
 import { useAuth } from '../context/AuthProvider';
+import useCursorPagination from '../hooks/useCursorPagination';
 import '../styles/categorie.css';
 
 // Função auxiliar para carregar o valor do localStorage
@@ -22,9 +23,7 @@ const Profile = () => {
     const { userId } = useAuth();
     const API_BASE_URL = "http://localhost:8000";
 
-    const [myAnimes, setMyAnimes] = useState([]);
     const [recommendedAnimes, setRecommendedAnimes] = useState([]);
-    const [loadingMyList, setLoadingMyList] = useState(true);
     const [loadingRecommendations, setLoadingRecommendations] = useState(true);
     const [recommendationsLimit, setRecommendationsLimit] = useState(() => loadLimit('recommendationsLimit', 20));
 
@@ -33,34 +32,8 @@ const Profile = () => {
         localStorage.setItem('recommendationsLimit', recommendationsLimit.toString());
     }, [recommendationsLimit]);
 
-    // useEffect para buscar a lista do usuário (não precisa de limite)
-    useEffect(() => {
-        const fetchMyAnimes = async () => {
-            if (userId) {
-                setLoadingMyList(true);
-                try {
-                    const response = await fetch(`${API_BASE_URL}/my-animes/${userId}`);
-                    if (response.ok) {
-                        const data = await response.json();
-                        setMyAnimes(data);
-                    } else {
-                        console.error(`Erro ao buscar sua lista: ${response.status} ${response.statusText}`);
-                        setMyAnimes([]);
-                    }
-                } catch (error) {
-                    console.error("Erro de rede ao buscar sua lista:", error);
-                    setMyAnimes([]);
-                } finally {
-                    setLoadingMyList(false);
-                }
-            } else {
-                setMyAnimes([]);
-                setLoadingMyList(false);
-            }
-        };
-
-        fetchMyAnimes();
-    }, [userId]);
+    // Lista do usuário, paginada por cursor (o carrossel pede mais ao chegar no fim)
+    const myAnimes = useCursorPagination(userId ? `${API_BASE_URL}/my-animes/${userId}?limit=50` : null);
 
     // useEffect para buscar as recomendações
     useEffect(() => {
@@ -102,10 +75,15 @@ const Profile = () => {
             <div className="categorie">
                 <h2 className="title">Your List</h2>
             </div>
-            {loadingMyList ? (
+            {myAnimes.loading && myAnimes.items.length === 0 ? (
                 <h3 className='loading'>Carregando sua lista...</h3>
             ) : (
-                <AnimeCarousel animes={myAnimes} storageKey={`carousel-my-list-${userId}`} />
+                <AnimeCarousel
+                    animes={myAnimes.items}
+                    storageKey={`carousel-my-list-${userId}`}
+                    hasMore={myAnimes.hasMore}
+                    onLoadMore={myAnimes.loadMore}
+                />
             )}
             
             <div className="categorie">